@@ -4,11 +4,25 @@ Beautiful Streamlit UI with Real-Time Thought Trace Visualization
 """
 
 import streamlit as st
-from backend import DiligenceEngine, ScientificAsset
+from backend import (DiligenceEngine, ScientificAsset, SourceDocument, extract_pages_from_pdf,
+                     load_environment, normalize_page_texts)
+from jobs import DONE, FAILED, Job, JobQueue
+from keypool import configured_keys
+from store import ResultsStore, StoredAnalysis, source_record
+from trace_view import LEVELS, TraceLog, page_count, render_page
+import html
 import time
+import uuid
 from datetime import datetime
+from typing import List, Optional
 import os
 
+# Load environment variables
+load_environment()
+
+# Seconds between status polls while a job is queued or running
+JOB_POLL_SECONDS = 1.0
+
 # Page configuration
 st.set_page_config(
     page_title="Diligence-Zero | Agentic Biotech Analysis",
@@ -51,6 +65,18 @@ st.markdown("""
     .thought-agent-b { color: #7c3aed; font-weight: 600; }
     .thought-supervisor { color: #059669; font-weight: 600; }
     .thought-system { color: #d97706; font-weight: 600; }
+    .thought-agent-other { color: #0891b2; font-weight: 600; }
+    
+    /* Evidence passage with the quoted span highlighted */
+    .evidence-passage {
+        background: #f8fafc;
+        border-left: 3px solid #4f46e5;
+        padding: 0.75rem 1rem;
+        font-size: 0.9rem;
+        color: #334155;
+        white-space: pre-wrap;
+    }
+    .evidence-passage mark { background: #fde68a; padding: 0 2px; }
     
     /* Button styling */
     .stButton button {
@@ -74,12 +100,28 @@ if 'analysis_result' not in st.session_state:
     st.session_state.analysis_result = None
 if 'thought_trace' not in st.session_state:
     st.session_state.thought_trace = []
+if 'trace_source' not in st.session_state:
+    st.session_state.trace_source = None
+if 'loaded_from_history' not in st.session_state:
+    st.session_state.loaded_from_history = None
+if 'seen_jobs' not in st.session_state:
+    st.session_state.seen_jobs = set()
+if 'trace_logs' not in st.session_state:
+    st.session_state.trace_logs = {}
+if 'parsed_uploads' not in st.session_state:
+    st.session_state.parsed_uploads = {}
+
+# Stable client id in the URL, so queued jobs are found again after a reconnect
+if 'client' not in st.query_params:
+    st.query_params['client'] = uuid.uuid4().hex[:12]
+client_id = st.query_params['client']
+# A key pool (GROQ_API_KEYS) counts as a configured key too
+api_key_env = os.getenv("GROQ_API_KEY") or next(iter(configured_keys()), None)
 if 'api_key' not in st.session_state:
-    st.session_state.api_key = os.getenv("GROQ_API_KEY", "")
+    st.session_state.api_key = api_key_env or ""
 
 # Sidebar Configuration
 # Only show API key config if not set in environment or if explicitly requested
-api_key_env = os.getenv("GROQ_API_KEY")
 if not api_key_env:
     with st.sidebar:
         st.markdown("## ⚙️ Setup")
@@ -105,17 +147,132 @@ st.markdown("*Reduces manual asset diligence from hours to seconds by identifyin
 
 st.markdown("---")
 
-from backend import DiligenceEngine, ScientificAsset, extract_text_from_pdf
+@st.cache_resource
+def get_results_store() -> ResultsStore:
+    """One SQLite results store shared by every session"""
+    return ResultsStore()
+
+def parse_upload(uploaded_file, slot: str, relevant_only: bool):
+    """
+    Pages, normalized page texts and normalization report of an uploaded PDF
+    
+    Parsed once per file and page-selection setting and kept per upload slot:
+    the page reruns every second while a job runs, and must not parse again.
+    """
+    key = (uploaded_file.file_id, relevant_only)
+    cached = st.session_state.parsed_uploads.get(slot)
+    if cached is None or cached[0] != key:
+        pages = extract_pages_from_pdf(uploaded_file, relevant_only=relevant_only)
+        content, report = normalize_page_texts(pages)
+        cached = (key, (pages, content, report))
+        st.session_state.parsed_uploads[slot] = cached
+    return cached[1]
+
+def show_stored_analysis(stored: StoredAnalysis):
+    """Load a past analysis into the session instead of re-running the pipeline"""
+    st.session_state.analysis_result = stored.asset
+    st.session_state.thought_trace = stored.thought_trace
+    st.session_state.trace_source = f"analysis_{stored.id}"
+    st.session_state.analysis_time = stored.metrics.get("analysis_time", 0.0)
+    st.session_state.loaded_from_history = stored.created_at
 
-# ... (rest of imports) ...
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """One worker pool shared by every session; jobs outlive reruns and reconnects"""
+    return JobQueue(get_results_store())
 
-# ... (omitted config and styling code) ...
+def show_job(job: Job):
+    """Load a finished job into the session"""
+    st.session_state.analysis_result = job.result
+    st.session_state.thought_trace = job.thought_trace
+    st.session_state.trace_source = f"job_{job.id}"
+    st.session_state.analysis_time = job.elapsed
+    st.session_state.loaded_from_history = None
+
+def show_trace(trace: List[str], key: str, follow: bool = False, source: Optional[str] = None):
+    """
+    Paginated thought trace with agent and level filters
+    
+    The trace is parsed incrementally (only entries added since the last
+    rerun) and only the selected page is rendered; follow pins the view to
+    the newest page for a trace that is still growing. source names the
+    analysis or job shown, so loading another one starts the parse over.
+    """
+    trace_log = st.session_state.trace_logs.setdefault(key, TraceLog())
+    trace_log.extend(trace, source)
+    
+    # A newly loaded trace may not have the agents selected for the previous one
+    if any(agent not in trace_log.agents for agent in st.session_state.get(f"{key}_agents", [])):
+        st.session_state[f"{key}_agents"] = []
+    
+    filter_col1, filter_col2 = st.columns(2)
+    with filter_col1:
+        agents = st.multiselect("Agents", trace_log.agents, key=f"{key}_agents", placeholder="All agents")
+    with filter_col2:
+        levels = st.multiselect("Levels", LEVELS, key=f"{key}_levels", placeholder="All levels")
+    events = trace_log.filter(agents, levels)
+    
+    pages = page_count(len(events))
+    if follow:
+        page = pages
+    else:
+        # The filters may leave fewer pages than the one selected
+        if st.session_state.get(f"{key}_page", 1) > pages:
+            st.session_state[f"{key}_page"] = pages
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    
+    st.markdown(render_page(events, page), unsafe_allow_html=True)
+    shown = f"{len(events):,} of {len(trace_log.events):,}" if len(events) != len(trace_log.events) else f"{len(events):,}"
+    st.caption(f"Page {page} of {pages} · {shown} events")
+
+results_store = get_results_store()
+job_queue = get_job_queue()
+
+# Analysis History (Sidebar)
+with st.sidebar:
+    st.markdown("## 🗂️ Analysis History")
+    history_drug = st.text_input("Drug name", key="history_drug", placeholder="e.g. BTX-501")
+    history_phase = st.selectbox("Clinical phase", ["All"] + results_store.phases(), key="history_phase")
+    history_confidence = st.slider("Minimum confidence", 0.0, 1.0, 0.0, 0.05, key="history_confidence")
+    
+    past_analyses = results_store.history(
+        drug_name=history_drug or None,
+        clinical_phase=None if history_phase == "All" else history_phase,
+        min_confidence=history_confidence or None,
+        limit=20
+    )
+    if not past_analyses:
+        st.caption("No stored analyses match")
+    for entry in past_analyses:
+        label = f"{entry.drug_name} · {entry.clinical_phase} · {entry.confidence:.0%}"
+        if st.button(label, key=f"history_{entry.id}", help=f"Analyzed {entry.created_at}", use_container_width=True):
+            show_stored_analysis(results_store.get(entry.id))
 
 # Document Input Section (Main Page)
 doc1_content = None
 doc2_content = None
+doc1_id = None
+doc2_id = None
 
 with st.expander("📄 Source Documents (Upload PDFs)", expanded=not st.session_state.analysis_result):
+    relevant_only = st.checkbox(
+        "Relevant pages only",
+        value=True,
+        help="For large submissions, only extract sections covering product description, clinical phase and safety"
+    )
+    reuse_stored = st.checkbox(
+        "Reuse stored analysis of identical documents",
+        value=True,
+        help="Load the saved result instead of re-running the agents when the same documents were analyzed before"
+    )
+    deadline = st.number_input(
+        "⏱️ Deadline (seconds, 0 = none)",
+        min_value=0,
+        max_value=300,
+        value=0,
+        help="Plan shortcuts (skip the Supervisor on agreement, shorter reasoning, passage filtering, "
+             "smaller model) so the analysis finishes within this time"
+    )
     col1, col2 = st.columns(2)
     
     with col1:
@@ -128,8 +285,13 @@ with st.expander("📄 Source Documents (Upload PDFs)", expanded=not st.session_
         uploaded_file1 = st.file_uploader("Upload PDF", type=['pdf'], key="doc1_upload")
         if uploaded_file1:
             try:
-                doc1_content = extract_text_from_pdf(uploaded_file1)
+                doc1_pages, doc1_content, doc1_report = parse_upload(uploaded_file1, "doc1_upload", relevant_only)
+                doc1_id = uploaded_file1.name
                 st.success(f"✅ Loaded: {uploaded_file1.name}")
+                kept = sum(1 for page in doc1_pages if page)
+                if kept < len(doc1_pages):
+                    st.caption(f"📑 Extracted {kept} of {len(doc1_pages)} pages (relevant sections only)")
+                st.caption(f"🧹 Normalized: {doc1_report.summary()}")
             except Exception as e:
                 st.error(f"Error reading PDF: {e}")
     
@@ -143,8 +305,13 @@ with st.expander("📄 Source Documents (Upload PDFs)", expanded=not st.session_
         uploaded_file2 = st.file_uploader("Upload PDF", type=['pdf'], key="doc2_upload")
         if uploaded_file2:
             try:
-                doc2_content = extract_text_from_pdf(uploaded_file2)
+                doc2_pages, doc2_content, doc2_report = parse_upload(uploaded_file2, "doc2_upload", relevant_only)
+                doc2_id = uploaded_file2.name
                 st.success(f"✅ Loaded: {uploaded_file2.name}")
+                kept = sum(1 for page in doc2_pages if page)
+                if kept < len(doc2_pages):
+                    st.caption(f"📑 Extracted {kept} of {len(doc2_pages)} pages (relevant sections only)")
+                st.caption(f"🧹 Normalized: {doc2_report.summary()}")
             except Exception as e:
                 st.error(f"Error reading PDF: {e}")
     
@@ -162,41 +329,84 @@ if analyze_button:
     elif not doc1_content or not doc2_content:
         st.error("❌ Please upload both PDF documents to proceed.")
     else:
-        # Initialize or get engine
-        if st.session_state.engine is None:
-            try:
-                st.session_state.engine = DiligenceEngine(api_key=st.session_state.api_key)
-                st.toast("✅ Diligence Engine initialized!", icon="🚀")
-            except Exception as e:
-                st.error(f"❌ Failed to initialize engine: {str(e)}")
-                st.stop()
-        
-        # Progress indicator
-        with st.spinner("🔄 Reading PDFs and initializing multi-agent debate..."):
-            try:
-                # Run the analysis using extracted content
-                start_time = time.time()
-                asset, trace = st.session_state.engine.process_dual_documents(
-                    doc1_content, doc1_type,
-                    doc2_content, doc2_type
-                )
+        sources = [
+            source_record(doc1_content, doc1_type, doc1_id),
+            source_record(doc2_content, doc2_type, doc2_id)
+        ]
+        stored = results_store.find_by_sources(sources) if reuse_stored else None
+        if stored is not None:
+            show_stored_analysis(stored)
+            st.success(f"⚡ Loaded stored analysis of these documents from {stored.created_at}")
+        else:
+            # Initialize or get engine
+            if st.session_state.engine is None:
+                try:
+                    st.session_state.engine = DiligenceEngine(api_key=st.session_state.api_key)
+                    st.toast("✅ Diligence Engine initialized!", icon="🚀")
+                except Exception as e:
+                    st.error(f"❌ Failed to initialize engine: {str(e)}")
+                    st.stop()
+            
+            # Queue the analysis; a background worker runs it while the UI polls
+            documents = [
+                SourceDocument(content=doc1_content, source_type=doc1_type, doc_id=doc1_id),
+                SourceDocument(content=doc2_content, source_type=doc2_type, doc_id=doc2_id)
+            ]
+            job = job_queue.submit(
+                client_id, st.session_state.engine, documents, sources,
+                label=f"{doc1_id or doc1_type} vs {doc2_id or doc2_type}",
+                deadline=deadline or None
+            )
+            st.toast(f"⏳ Analysis queued: {job.label}", icon="🧬")
 
-                end_time = time.time()
-                
-                st.session_state.analysis_result = asset
-                st.session_state.thought_trace = trace
-                st.session_state.analysis_time = end_time - start_time
-                
-                st.success(f"✅ Analysis complete in {st.session_state.analysis_time:.2f} seconds!")
-                
-            except Exception as e:
-                st.error(f"❌ Analysis failed: {str(e)}")
-                st.stop()
+# Analysis Jobs (queued, running and finished for this client)
+user_jobs = job_queue.jobs(client_id)
+finished = [job for job in user_jobs if job.status == DONE]
+if finished and finished[0].id not in st.session_state.seen_jobs:
+    show_job(finished[0])
+    st.success(f"✅ Analysis complete in {finished[0].elapsed:.2f} seconds!")
+st.session_state.seen_jobs.update(job.id for job in user_jobs if not job.active)
+for job in user_jobs:
+    if not job.active:
+        st.session_state.trace_logs.pop(f"job_{job.id}", None)
+
+if user_jobs:
+    with st.expander("⏳ Analysis Jobs", expanded=any(job.active for job in user_jobs)):
+        for job in user_jobs:
+            job_col1, job_col2 = st.columns([5, 1])
+            with job_col1:
+                if job.active:
+                    st.markdown(f"🔄 **{job.label}** · {job.status} · step {job.steps}")
+                    st.caption(job.progress)
+                    if st.toggle("Live trace", key=f"live_{job.id}"):
+                        show_trace(job.thought_trace, key=f"job_{job.id}", follow=True)
+                elif job.status == FAILED:
+                    st.markdown(f"❌ **{job.label}** · failed")
+                    st.caption(job.error)
+                else:
+                    st.markdown(f"✅ **{job.label}** · {job.result.drug_name} · {job.result.confidence_score:.0%}")
+            with job_col2:
+                if job.status == DONE and st.button("Show", key=f"job_{job.id}", use_container_width=True):
+                    show_job(job)
 
 # Display results if available
 if st.session_state.analysis_result:
     asset = st.session_state.analysis_result
     
+    if st.session_state.loaded_from_history:
+        st.caption(f"🗂️ Loaded from history (analyzed {st.session_state.loaded_from_history})")
+    
+    if asset.degraded:
+        st.warning(
+            "⚠️ **Degraded result:** the Groq API was unavailable, so fields come from cached and rule-based "
+            "extraction and sources were reconciled locally. Conflicts are listed but not resolved; re-run once "
+            "the provider recovers."
+        )
+    if asset.degradations_applied:
+        st.caption(f"⏱️ Deadline shortcuts taken: {', '.join(asset.degradations_applied)}")
+    if asset.debate_rounds:
+        st.caption(f"🔁 Conflicts debated for {asset.debate_rounds} round(s) before the final ruling")
+    
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
     
@@ -268,6 +478,23 @@ if st.session_state.analysis_result:
             st.markdown("### 📝 Reconciliation Summary")
             st.markdown(asset.source_summary)
         
+        # Evidence: jump to the passage behind each source's field values
+        if asset.evidence:
+            st.markdown("### 🔎 Evidence")
+            labels = [
+                f"{span.field.replace('_', ' ').title()} · {span.source} · page {span.page}" for span in asset.evidence
+            ]
+            chosen = st.selectbox("Jump to passage", range(len(labels)), format_func=labels.__getitem__,
+                                  key="evidence_span")
+            span = asset.evidence[chosen]
+            st.markdown(
+                f'<div class="evidence-passage">…{html.escape(span.before)}<mark>{html.escape(span.text)}</mark>'
+                f'{html.escape(span.after)}…</div>',
+                unsafe_allow_html=True
+            )
+            if not span.exact:
+                st.caption("Matched after normalizing case, spacing and punctuation of the agent's quote")
+        
         # Raw JSON export
         with st.expander("🔧 View Raw JSON"):
             st.json(asset.model_dump())
@@ -276,25 +503,8 @@ if st.session_state.analysis_result:
         st.markdown("## 🧠 Agent Thought Trace")
         st.markdown("**Live reasoning process** for observability")
         
-        # Display thought trace with color coding
-        trace_html = '<div class="thought-trace">'
-        
-        for thought in st.session_state.thought_trace:
-            # Color code based on agent
-            if "[Agent A]" in thought:
-                trace_html += f'<div><span class="thought-agent-a">[Agent A]</span>{thought.split("]", 1)[1]}</div>'
-            elif "[Agent B]" in thought:
-                trace_html += f'<div><span class="thought-agent-b">[Agent B]</span>{thought.split("]", 1)[1]}</div>'
-            elif "[Supervisor]" in thought:
-                trace_html += f'<div><span class="thought-supervisor">[Supervisor]</span>{thought.split("]", 1)[1]}</div>'
-            elif "[System]" in thought:
-                trace_html += f'<div><span class="thought-system">[System]</span>{thought.split("]", 1)[1]}</div>'
-            else:
-                trace_html += f'<div>{thought}</div>'
-        
-        trace_html += '</div>'
-        
-        st.markdown(trace_html, unsafe_allow_html=True)
+        # Color-coded trace, one filtered page at a time
+        show_trace(st.session_state.thought_trace, key="trace", source=st.session_state.trace_source)
         
         # Download trace button
         trace_text = "\n".join(st.session_state.thought_trace)
@@ -306,4 +516,7 @@ if st.session_state.analysis_result:
             use_container_width=True
         )
 
-
+# Poll job status until this client's analyses have finished
+if any(job.active for job in user_jobs):
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -4,38 +4,127 @@ Implements the debate pattern with Agent A, Agent B, and Supervisor Agent C
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from groq import Groq
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import os
-from dotenv import load_dotenv
+import copy
+from concurrent.futures import ThreadPoolExecutor
 import json
 
-from pypdf import PdfReader
-import io
+from budget import TokenBudget, chunk_pages, estimate_tokens, filter_passages
+from cache import IN_FLIGHT, ExtractionCache, SingleFlight, content_hash, page_hashes
+from clustering import AssetDictionary, AssetGroup, cluster_documents, find_entities
+from deadline import (PASSAGE_FILTER, RECONCILIATION_COMPLETION_TOKENS, SHORT_REASONING, SKIP_SUPERVISOR,
+                      SMALLER_MODEL, SUPERVISOR_SKIPPED_AT_DEADLINE, DeadlinePlan, call_seconds, plan_deadline)
+from dedup import DEFAULT_THRESHOLD, NearDuplicateIndex
+from evidence import EvidenceSpan, locate_evidence
+from keypool import KeyPool, configured_keys, shared_key_pool
+from normalize import normalize_page_texts, normalize_pages
+from page_select import select_relevant_pages
+from resilience import CircuitBreaker, CircuitOpenError, HedgePolicy, provider_breaker
+from rules import FIELDS as RULE_FIELDS, describe, extract_rules
+from scoring import ConflictReport, disagrees, field_similarity, score_sources
 
-# Load environment variables
-load_dotenv()
+# groq, pypdf and python-dotenv are imported on first use: tools that never call
+# the API or parse a PDF (history, scoring, batch planning) skip their import cost.
+_environment_loaded = False
 
-def extract_text_from_pdf(pdf_file) -> str:
+
+def load_environment():
+    """Load variables from .env once (the engine does this on construction)"""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+# Completion tokens reserved for each Groq call
+EXTRACTION_MAX_TOKENS = 1000
+RECONCILIATION_MAX_TOKENS = 1500
+
+EXTRACTION_SYSTEM_PROMPT = "You are a scientific data extraction expert. Respond only with valid JSON."
+RECONCILIATION_SYSTEM_PROMPT = "You are a scientific reconciliation expert. Respond only with valid JSON."
+
+# Confidence reported for an asset profile backed by a single document
+SINGLE_SOURCE_CONFIDENCE = 0.5
+
+# Sources that agree on every field at this local confidence skip the Supervisor call
+LOCAL_RECONCILIATION_CONFIDENCE = 0.85
+
+# Supervisor and local confidence further apart than this are flagged in the trace
+CONFIDENCE_TOLERANCE = 0.25
+
+# Agent reasoning is cut to this many characters when a reconciliation prompt is over the limit
+MIN_REASONING_CHARS = 300
+
+# Fields the rule pass reads cheaply; a near-duplicate's extraction is only reused when they match
+NEAR_DUPLICATE_CHECK_FIELDS = ["drug_name", "molecule_type", "clinical_phase"]
+
+# Documents at most this long are packed together into one extraction call (batch runs only, see extract_runs)
+PACK_MAX_DOCUMENT_TOKENS = 800
+
+# Most documents packed into a single extraction call
+PACK_MAX_DOCUMENTS = 6
+
+# Rebuttal rounds after the Supervisor's first ruling (0 = single pass)
+DEFAULT_DEBATE_ROUNDS = 0
+
+# A debate round must raise the Supervisor's confidence by this much for another round to be held
+DEBATE_MIN_GAIN = 0.02
+
+# Completion tokens reserved for an agent's rebuttal
+DEBATE_MAX_TOKENS = 600
+
+# Document passages an agent may quote from in a rebuttal
+DEBATE_EVIDENCE_TOKENS = 1200
+
+DEBATE_SYSTEM_PROMPT = "You are a scientific extraction agent defending your findings. Respond only with valid JSON."
+
+def extract_pages_from_pdf(pdf_file, relevant_only: bool = False) -> List[str]:
     """
-    Extract text content from an uploaded PDF file
+    Extract the text of each page of an uploaded PDF file
     
     Args:
         pdf_file: Uploaded file object (bytes)
+        relevant_only: Only extract pages in sections covering product description,
+            clinical phase and safety (see page_select.select_relevant_pages).
+            Skipped pages come back as empty strings so page numbers stay aligned.
         
     Returns:
-        str: Extracted text content
+        List[str]: Text content of each page
     """
     try:
+        from pypdf import PdfReader
+        
         reader = PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        if not relevant_only:
+            return [page.extract_text() for page in reader.pages]
+        
+        selected = set(select_relevant_pages(reader).selected)
+        return [page.extract_text() if index in selected else "" for index, page in enumerate(reader.pages)]
     except Exception as e:
         raise RuntimeError(f"Failed to read PDF: {str(e)}")
 
 
+def extract_text_from_pdf(pdf_file, normalize: bool = False, relevant_only: bool = False) -> str:
+    """
+    Extract text content from an uploaded PDF file
+    
+    Args:
+        pdf_file: Uploaded file object (bytes)
+        normalize: Strip running headers/footers, page numbers, hyphenation
+            and legal boilerplate (see normalize.normalize_pages)
+        relevant_only: Skip sections irrelevant to the extraction in large submissions
+        
+    Returns:
+        str: Extracted text content
+    """
+    pages = extract_pages_from_pdf(pdf_file, relevant_only=relevant_only)
+    if normalize:
+        text, _ = normalize_pages(pages)
+        return text
+    return "".join(page + "\n" for page in pages if page or not relevant_only)
+
+
 class ScientificAsset(BaseModel):
     """Ground Truth structure for scientific asset profile"""
     drug_name: str = Field(description="Name of the drug or therapeutic asset")
@@ -45,6 +134,17 @@ class ScientificAsset(BaseModel):
     confidence_score: float = Field(description="Confidence score 0-1 for the accuracy of data", ge=0.0, le=1.0)
     conflicts_found: List[str] = Field(default_factory=list, description="List of conflicts detected between sources")
     source_summary: Optional[str] = Field(default=None, description="Summary of data sources used")
+    local_confidence_score: Optional[float] = Field(
+        default=None, description="Agreement-based confidence computed locally across sources", ge=0.0, le=1.0
+    )
+    degraded: bool = Field(default=False, description="Built without the LLM while the provider was unavailable")
+    degradations_applied: List[str] = Field(
+        default_factory=list, description="Shortcuts taken to meet the run's deadline"
+    )
+    debate_rounds: int = Field(default=0, description="Rebuttal rounds held after the Supervisor's first ruling")
+    evidence: List[EvidenceSpan] = Field(
+        default_factory=list, description="Where each source's field values are stated (page and offset)"
+    )
 
 
 class AgentResponse(BaseModel):
@@ -55,6 +155,135 @@ class AgentResponse(BaseModel):
     primary_toxicity_finding: Optional[str] = None
     reasoning: str = Field(description="Agent's reasoning process")
     source_type: str = Field(description="Type of source document analyzed")
+    degraded: bool = Field(default=False, description="Rule-based only, the provider was unavailable")
+    evidence: Dict[str, str] = Field(default_factory=dict, description="Verbatim quote supporting each field")
+    evidence_spans: List[EvidenceSpan] = Field(
+        default_factory=list, description="Where each quote was found in the source document"
+    )
+
+
+def evidence_quotes(data: dict) -> Dict[str, str]:
+    """Field -> quote pairs from an extraction reply, ignoring anything malformed"""
+    evidence = data.get("evidence") if isinstance(data, dict) else None
+    if not isinstance(evidence, dict):
+        return {}
+    return {
+        field: quote for field, quote in evidence.items()
+        if field in RULE_FIELDS and isinstance(quote, str) and quote
+    }
+
+
+def merge_agent_responses(responses: List[AgentResponse], source_type: str) -> AgentResponse:
+    """
+    Merge extractions from several chunks of the same document into one response
+    
+    The first chunk that states a field wins; distinct toxicity findings are combined.
+    """
+    if len(responses) == 1:
+        return responses[0]
+    
+    def first(field):
+        for response in responses:
+            value = getattr(response, field)
+            if value:
+                return value
+        return None
+    
+    findings = []
+    for response in responses:
+        finding = response.primary_toxicity_finding
+        if finding and finding not in findings:
+            findings.append(finding)
+    
+    evidence = {}
+    for response in responses:
+        for field, quote in response.evidence.items():
+            evidence.setdefault(field, quote)
+    
+    return AgentResponse(
+        drug_name=first("drug_name"),
+        molecule_type=first("molecule_type"),
+        clinical_phase=first("clinical_phase"),
+        primary_toxicity_finding="; ".join(findings) if findings else None,
+        reasoning=" | ".join(f"Chunk {i}: {r.reasoning}" for i, r in enumerate(responses, 1)),
+        source_type=source_type,
+        degraded=any(response.degraded for response in responses),
+        evidence=evidence
+    )
+
+
+class SourceDocument(BaseModel):
+    """One input document: plain text or a list of page texts"""
+    content: Union[str, List[str]]
+    source_type: str
+    doc_id: Optional[str] = None
+    
+    @property
+    def text(self) -> str:
+        if isinstance(self.content, list):
+            return "\n".join(self.content)
+        return self.content
+
+
+class CorpusResult(BaseModel):
+    """Outcome of reconciling one asset group of a corpus"""
+    group: AssetGroup
+    asset: Optional[ScientificAsset] = None
+    thought_trace: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
+
+
+class KnownSource(BaseModel):
+    """A source already reconciled into an asset's knowledge"""
+    sha: str = Field(description="SHA-256 of the document text")
+    source_type: str
+    doc_id: Optional[str] = None
+    extraction: AgentResponse
+
+
+class AssetKnowledge(BaseModel):
+    """Current reconciled profile of one asset and the per-source extractions behind it"""
+    asset_key: str
+    profile: ScientificAsset
+    sources: List[KnownSource] = Field(default_factory=list)
+    
+    def has_source(self, sha: str) -> bool:
+        return any(source.sha == sha for source in self.sources)
+    
+    def add_source(self, source: KnownSource):
+        """Record a source, replacing an earlier revision of the same document"""
+        if source.doc_id:
+            self.sources = [known for known in self.sources if known.doc_id != source.doc_id]
+        self.sources.append(source)
+    
+    def as_response(self) -> AgentResponse:
+        """The reconciled profile, presented to the Supervisor as one source"""
+        profile = self.profile
+        open_conflicts = "; ".join(profile.conflicts_found) or "none"
+        types = {}
+        for source in self.sources:
+            types[source.source_type] = types.get(source.source_type, 0) + 1
+        return AgentResponse(
+            drug_name=profile.drug_name,
+            molecule_type=profile.molecule_type,
+            clinical_phase=profile.clinical_phase,
+            primary_toxicity_finding=profile.primary_toxicity_finding,
+            reasoning=(
+                f"Reconciled profile of {len(self.sources)} earlier source(s) "
+                f"({', '.join(f'{count} x {source_type}' for source_type, count in types.items())}), "
+                f"confidence {profile.confidence_score:.2f}. {profile.source_summary or ''} "
+                f"Open conflicts (list again in conflicts_found unless the new source resolves them): {open_conflicts}"
+            ),
+            source_type=f"Knowledge Base ({len(self.sources)} sources)"
+        )
+
+
+def agent_name(index: int) -> str:
+    """Extraction agent for the index-th document: A, B, then D, E, ... (C is the Supervisor)"""
+    letter = chr(ord("A") + index)
+    if letter >= "C":
+        letter = chr(ord(letter) + 1)
+    return f"Agent {letter}"
 
 
 class DiligenceEngine:
@@ -63,44 +292,181 @@ class DiligenceEngine:
     Implements debate pattern for cross-document reasoning
     """
     
-    def __init__(self, api_key: str = None):
-        """Initialize Groq client with API key"""
-        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+    def __init__(self, api_key: str = None, token_budget: Optional[int] = None,
+                 cache: Optional[ExtractionCache] = None, near_duplicates: Optional[NearDuplicateIndex] = None):
+        """
+        Initialize Groq client with API key
+        
+        Args:
+            api_key: Groq API key (defaults to GROQ_API_KEY, or the first of GROQ_API_KEYS);
+                when GROQ_API_KEYS lists several keys, calls are spread over that pool
+            token_budget: Maximum tokens a single analysis run may spend
+                (defaults to DILIGENCE_RUN_TOKEN_BUDGET, unlimited when unset)
+            cache: Shared extraction cache (defaults to one persisted at
+                DILIGENCE_CACHE_PATH, in-memory when unset)
+            near_duplicates: Shared near-duplicate index (defaults to a new one with
+                the DILIGENCE_NEAR_DUP_THRESHOLD similarity threshold)
+        """
+        load_environment()
+        pool_keys = configured_keys()
+        self.api_key = api_key or os.getenv("GROQ_API_KEY") or next(iter(pool_keys), None)
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found. Please set it in .env file")
+        # Several keys: least-loaded key per call, shared process-wide since rate limits are per account
+        self.key_pool: Optional[KeyPool] = shared_key_pool(pool_keys) if len(pool_keys) > 1 else None
         
-        self.client = Groq(api_key=self.api_key)
+        self._client = None
         self.model = "llama-3.3-70b-versatile"
+        self.budget = TokenBudget(self.model, run_budget=token_budget)
+        self.cache = cache if cache is not None else ExtractionCache(os.getenv("DILIGENCE_CACHE_PATH"))
+        if near_duplicates is None:
+            threshold = float(os.getenv("DILIGENCE_NEAR_DUP_THRESHOLD", DEFAULT_THRESHOLD))
+            near_duplicates = NearDuplicateIndex(threshold=threshold)
+        self.near_duplicates = near_duplicates
+        # Near-duplicate keys of the current run's documents, which never stand in for each other
+        self.run_documents: set = set()
+        # Identical concurrent LLM calls (same cache key) are coalesced process-wide
+        self.in_flight: SingleFlight = IN_FLIGHT
+        self.rule_extraction = os.getenv("DILIGENCE_RULE_EXTRACTION", "1") != "0"
+        self.local_reconciliation = os.getenv("DILIGENCE_LOCAL_RECONCILIATION", "1") != "0"
+        # Batch runs may pack short documents of different items into shared calls (opt-in)
+        self.pack_extraction = os.getenv("DILIGENCE_PACK_EXTRACTION", "0") == "1"
+        # Agents may rebut the Supervisor's ruling for up to this many rounds (see _debate)
+        self.debate_rounds = int(os.getenv("DILIGENCE_DEBATE_ROUNDS", DEFAULT_DEBATE_ROUNDS))
+        # Slow calls get a duplicate request when DILIGENCE_HEDGE_PERCENTILE is set
+        self.hedging: Optional[HedgePolicy] = HedgePolicy.from_env()
+        # Provider outages trip a process-wide breaker; calls then fail fast and runs degrade to local results
+        self.breaker: CircuitBreaker = provider_breaker()
+        # Shortcuts chosen for the current run's deadline (None when the run has no deadline)
+        self.run_plan: Optional[DeadlinePlan] = None
         self.thought_trace = []
+        # Called with every thought trace entry (progress reporting for background jobs)
+        self.on_thought: Optional[Callable[[str], None]] = None
+    
+    @property
+    def client(self):
+        """Groq client, created (and groq imported) on the first API call"""
+        if self._client is None:
+            from groq import Groq
+            
+            self._client = Groq(api_key=self.api_key)
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
+    @property
+    def active_model(self) -> str:
+        """Model for the current run: the deadline plan may switch to a smaller one"""
+        return self.run_plan.model if self.run_plan is not None else self.model
+    
+    def _plan_run(self, deadline: Optional[float], texts: List[str]):
+        """Start a run: pick shortcuts for its deadline, if it has one"""
+        self.run_plan = None
+        if deadline is not None:
+            self.run_plan = plan_deadline(deadline, texts, self.model)
+            self.log_thought("System", f"⏱️ Deadline plan: {self.run_plan.summary()}")
+    
+    def _finish_run(self, asset: ScientificAsset):
+        """Record the deadline shortcuts the run actually took on its result"""
+        if self.run_plan is None:
+            return
+        asset.degradations_applied = list(self.run_plan.applied)
+        elapsed = self.run_plan.deadline_seconds - self.run_plan.remaining
+        met = "met" if self.run_plan.remaining >= 0 else "missed"
+        self.log_thought("System", f"⏱️ Deadline {met} ({elapsed:.1f}s of {self.run_plan.deadline_seconds:g}s)")
     
     def log_thought(self, agent: str, message: str):
         """Add entry to thought trace for observability"""
         entry = f"[{agent}] {message}"
         self.thought_trace.append(entry)
+        if self.on_thought is not None:
+            self.on_thought(entry)
         return entry
     
-    def extract_from_document(self, document_text: str, source_type: str, agent_name: str) -> AgentResponse:
+    def _chat(self, system: str, prompt: str, temperature: float, max_tokens: int) -> str:
         """
-        Agent A or B: Extract scientific parameters from a single document
+        Send one chat completion and record its token spend against the run budget
         
-        Args:
-            document_text: Raw text from the source document
-            source_type: Type of document (e.g., "Press Release", "FDA Report")
-            agent_name: Name of the agent for logging
-        
-        Returns:
-            AgentResponse with extracted data and reasoning
+        Raises:
+            CircuitOpenError: If the provider is unavailable (see resilience.CircuitBreaker)
         """
-        self.log_thought(agent_name, f"Starting extraction from {source_type}...")
+        estimated = self.budget.check(system + prompt, max_tokens)
+        model = self.active_model
+        if self.run_plan is not None and model != self.model:
+            self.run_plan.record(SMALLER_MODEL)
+        
+        def call(client=None):
+            response = (client or self.client).chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            content = (response.choices[0].message.content or "").strip()
+            if not content:
+                raise ValueError("Empty completion")
+            usage = getattr(response, "usage", None)
+            return content, getattr(usage, "total_tokens", None) or estimated
+        
+        request = call
+        if self.key_pool is not None:
+            def request():
+                return self.key_pool.call(call, estimated)
         
-        prompt = f"""You are a scientific diligence analyst reviewing a {source_type}.
+        if self.hedging is None:
+            content, tokens = self.breaker.call(request)
+        else:
+            # A duplicate request is only affordable if the run budget covers both
+            remaining = self.budget.remaining
+            allow_hedge = remaining is None or remaining >= 2 * estimated
+            
+            def discard(result):
+                self.budget.record(result[1])
+                self.hedging.record_extra_tokens(result[1])
+            
+            content, tokens = self.breaker.call(
+                lambda: self.hedging.run(request, allow_hedge=allow_hedge, on_discard=discard)
+            )
+        
+        self.budget.record(tokens)
+        return content
+    
+    @staticmethod
+    def _parse_json(content: str) -> dict:
+        """Parse a JSON reply, handling markdown code blocks if present"""
+        if content.startswith("```"):
+            content = content.split("```")[1]
+            if content.startswith("json"):
+                content = content[4:].strip()
+        return json.loads(content)
+    
+    def _extraction_prompt(self, document_text: str, source_type: str,
+                           known: Optional[Dict[str, str]] = None) -> str:
+        """Build the Agent A/B extraction prompt for one document (or chunk)"""
+        resolved = ""
+        if known:
+            listed = "\n".join(f"- {field}: {value}" for field, value in known.items())
+            resolved = f"""
+These fields were already resolved from explicit statements in the document. Copy them
+unchanged and focus your analysis on the remaining fields:
+{listed}
+"""
+        reasoning = "explain your extraction process and any uncertainties"
+        if self.run_plan is not None and self.run_plan.reasoning_words:
+            reasoning += f", in at most {self.run_plan.reasoning_words} words"
+        return f"""You are a scientific diligence analyst reviewing a {source_type}.
 
 Extract the following information from this document:
 1. Drug/Asset Name
 2. Molecule Type (small molecule, antibody, peptide, etc.)
 3. Clinical Development Phase (Preclinical, Phase 1, Phase 2, Phase 3, Approved)
 4. Primary Toxicity Finding (any safety concerns or adverse events mentioned)
-
+{resolved}
 Document Text:
 {document_text}
 
@@ -109,83 +475,293 @@ Provide your analysis in JSON format with these fields:
 - molecule_type
 - clinical_phase
 - primary_toxicity_finding
-- reasoning (explain your extraction process and any uncertainties)
+- reasoning ({reasoning})
+- evidence (object mapping each field above to the sentence of the document it was taken from, copied verbatim;
+  omit fields the document does not state)
 
 Be precise and only extract information explicitly stated. If something is unclear or missing, state that in your reasoning.
 """
+    
+    def _extract_parts(self, parts: List[str], source_type: str, known: Optional[Dict[str, str]] = None,
+                       agent_name: str = "Agent") -> Tuple[List[AgentResponse], int]:
+        """
+        Extract each part (document or chunk), reusing cached results for unchanged parts
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a scientific data extraction expert. Respond only with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,  # Lower temperature for more consistent extraction
-                max_tokens=1000
-            )
-            
-            content = response.choices[0].message.content.strip()
+        Fields in known (resolved by the rule-based extractor) override the LLM's values.
+        A part whose identical extraction is already running for another session
+        waits for that call instead of sending its own.
+        
+        Returns:
+            Tuple of (one AgentResponse per part, number of parts served from cache)
+        """
+        responses = []
+        reused = 0
+        for part in parts:
+            prompt = self._extraction_prompt(part, source_type, known)
+            key = content_hash(self.active_model, EXTRACTION_SYSTEM_PROMPT, prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                responses.append(AgentResponse(**cached))
+                reused += 1
+                continue
             
-            # Parse JSON response
-            # Handle markdown code blocks if present
-            if content.startswith("```"):
-                content = content.split("```")[1]
-                if content.startswith("json"):
-                    content = content[4:].strip()
+            max_tokens = EXTRACTION_MAX_TOKENS
+            if self.run_plan is not None and self.run_plan.extraction_max_tokens:
+                max_tokens = self.run_plan.extraction_max_tokens
+                self.run_plan.record(SHORT_REASONING)
             
-            data = json.loads(content)
+            def extract():
+                content = self._chat(
+                    EXTRACTION_SYSTEM_PROMPT,
+                    prompt,
+                    temperature=0.2,  # Lower temperature for more consistent extraction
+                    max_tokens=max_tokens
+                )
+                data = {**self._parse_json(content), **(known or {})}
+                
+                return AgentResponse(
+                    drug_name=data.get("drug_name"),
+                    molecule_type=data.get("molecule_type"),
+                    clinical_phase=data.get("clinical_phase"),
+                    primary_toxicity_finding=data.get("primary_toxicity_finding"),
+                    reasoning=data.get("reasoning", "No reasoning provided"),
+                    source_type=source_type,
+                    evidence=evidence_quotes(data)
+                )
             
-            agent_response = AgentResponse(
-                drug_name=data.get("drug_name"),
-                molecule_type=data.get("molecule_type"),
-                clinical_phase=data.get("clinical_phase"),
-                primary_toxicity_finding=data.get("primary_toxicity_finding"),
-                reasoning=data.get("reasoning", "No reasoning provided"),
-                source_type=source_type
+            try:
+                response, shared = self.in_flight.do(key, extract)
+            except CircuitOpenError as e:
+                self.log_thought(agent_name, f"⚠️ {e}. Degraded mode: rule-based extraction only")
+                responses.append(self._degraded_extraction(part, source_type, known))
+                continue
+            if shared:
+                self.log_thought(agent_name, "⏳ Identical extraction already in flight, shared its result")
+            self.cache.put(key, response.model_dump())
+            responses.append(response)
+        return responses, reused
+    
+    @staticmethod
+    def _degraded_extraction(document_text: str, source_type: str,
+                             known: Optional[Dict[str, str]] = None) -> AgentResponse:
+        """Fallback while the provider is unavailable: every field the rules can resolve, at any confidence"""
+        rules = extract_rules(document_text)
+        fields = rules.resolved(min_confidence=0.0)
+        return AgentResponse(
+            **{**fields, **(known or {})},
+            reasoning=f"Degraded: LLM unavailable, rule-based extraction only. {describe(rules, list(fields))}",
+            source_type=source_type,
+            degraded=True,
+            evidence={field: getattr(rules, field).evidence for field in fields}
+        )
+    
+    def _reuse_near_duplicate(self, document_text: str, doc_key: str, source_type: str,
+                              agent_name: str) -> Optional[AgentResponse]:
+        """
+        Return the extraction of an already-ingested near-duplicate, if there is one
+        
+        The document joins the duplicate's cluster in the index. Earlier revisions of
+        the same doc_key are skipped so they go through page-level re-extraction instead,
+        and so are the other documents of the current run: sources being reconciled must
+        be extracted independently, or a conflict between two near-identical reports
+        ("Phase 2" vs "Phase 3") would never reach the Supervisor. A duplicate whose
+        extraction contradicts the rule-based fields of the new text is not reused either.
+        """
+        signature = self.near_duplicates.signature(document_text)
+        rules = None
+        for other, score, payload in self.near_duplicates.query(document_text, signature):
+            if other == doc_key or other in self.run_documents or payload is None:
+                continue
+            rules = rules or extract_rules(document_text).resolved(min_confidence=0.0)
+            mismatched = [
+                field for field in NEAR_DUPLICATE_CHECK_FIELDS
+                if field in rules and field_similarity(field, rules[field], payload.get(field)) not in (None, 1.0)
+            ]
+            if mismatched:
+                self.log_thought(
+                    agent_name,
+                    f"Near-duplicate of {other} ({score:.0%} similar) differs on {', '.join(mismatched)}, extracting anyway"
+                )
+                continue
+            self.run_documents.add(doc_key)
+            self.near_duplicates.add(doc_key, document_text, payload, signature)
+            cluster = self.near_duplicates.cluster(doc_key)
+            self.log_thought(
+                agent_name,
+                f"♻️ Near-duplicate of {other} ({score:.0%} similar), reusing its extraction. "
+                f"Duplicate cluster: {', '.join(cluster)}"
+            )
+            return AgentResponse(**{**payload, "source_type": source_type})
+        return None
+    
+    def _apply_rules(self, document_text: str, source_type: str,
+                     agent_name: str) -> Tuple[Optional[AgentResponse], Dict[str, str]]:
+        """
+        Tier-0 pass: resolve regularly-phrased fields locally before calling the LLM
+        
+        Returns:
+            Tuple of (complete AgentResponse if every field was resolved with high
+            confidence, otherwise None; the fields that were resolved)
+        """
+        if not self.rule_extraction:
+            return None, {}
+        
+        rules = extract_rules(document_text)
+        known = rules.resolved()
+        if len(known) == len(RULE_FIELDS):
+            self.log_thought(agent_name, "⚡ All fields resolved by rule-based extractor, skipping LLM call")
+            response = AgentResponse(
+                **known,
+                reasoning=f"Resolved locally by rule-based extractor: {describe(rules, RULE_FIELDS)}",
+                source_type=source_type,
+                evidence={field: getattr(rules, field).evidence for field in RULE_FIELDS}
             )
+            return response, known
+        if known:
+            resolved = ", ".join(f"{field}={value}" for field, value in known.items())
+            self.log_thought(agent_name, f"⚡ Rule-based pre-pass resolved: {resolved}")
+        return None, known
+    
+    def _finish_extraction(self, responses: List[AgentResponse], reused: int, source_type: str,
+                           agent_name: str, document_text: str, doc_key: str) -> AgentResponse:
+        """Merge part extractions, index the document for near-duplicate reuse and log the outcome"""
+        if reused:
+            self.log_thought(agent_name, f"♻️ Reused {reused} of {len(responses)} cached extraction(s)")
+        
+        agent_response = merge_agent_responses(responses, source_type)
+        self.run_documents.add(doc_key)
+        if not agent_response.degraded:
+            # A degraded extraction must not stand in for near-duplicates once the provider is back
+            self.near_duplicates.add(doc_key, document_text, agent_response.model_dump())
+        
+        self.log_thought(agent_name, f"✓ Extraction complete. Found drug: {agent_response.drug_name}")
+        self.log_thought(agent_name, f"Reasoning: {agent_response.reasoning[:100]}...")
+        
+        return agent_response
+    
+    def extract_from_document(self, document_text: str, source_type: str, agent_name: str) -> AgentResponse:
+        """
+        Agent A or B: Extract scientific parameters from a single document
+        
+        The token planner runs first and may compress, passage-filter or chunk the
+        document so every call fits the model context and the run's token budget.
+        
+        Args:
+            document_text: Raw text from the source document
+            source_type: Type of document (e.g., "Press Release", "FDA Report")
+            agent_name: Name of the agent for logging
+        
+        Returns:
+            AgentResponse with extracted data and reasoning
+        """
+        self.log_thought(agent_name, f"Starting extraction from {source_type}...")
+        
+        try:
+            doc_key = f"sha:{content_hash(document_text)[:16]}"
+            duplicate = self._reuse_near_duplicate(document_text, doc_key, source_type, agent_name)
+            if duplicate is not None:
+                return duplicate
             
-            self.log_thought(agent_name, f"✓ Extraction complete. Found drug: {agent_response.drug_name}")
-            self.log_thought(agent_name, f"Reasoning: {agent_response.reasoning[:100]}...")
+            local, known = self._apply_rules(document_text, source_type, agent_name)
+            if local is not None:
+                return self._finish_extraction([local], 0, source_type, agent_name, document_text, doc_key)
             
-            return agent_response
+            overhead = estimate_tokens(EXTRACTION_SYSTEM_PROMPT + self._extraction_prompt("", source_type, known))
+            plan, parts = self.budget.plan_document(document_text, overhead, EXTRACTION_MAX_TOKENS)
+            if plan.action != "send":
+                self.log_thought(
+                    agent_name,
+                    f"Token plan: {plan.action} (~{plan.estimated_tokens:,} → ~{plan.planned_tokens:,} tokens). {plan.reason}"
+                )
+            
+            responses, reused = self._extract_parts(parts, source_type, known, agent_name)
+            return self._finish_extraction(responses, reused, source_type, agent_name, document_text, doc_key)
             
         except Exception as e:
             error_msg = f"Error during extraction: {str(e)}"
             self.log_thought(agent_name, f"✗ {error_msg}")
             raise RuntimeError(error_msg)
     
-    def reconcile_sources(self, agent_a_response: AgentResponse, agent_b_response: AgentResponse) -> ScientificAsset:
+    def extract_from_pages(self, pages: List[str], source_type: str, agent_name: str,
+                           doc_id: Optional[str] = None) -> AgentResponse:
         """
-        Supervisor Agent C: Reconcile conflicts between two document extractions
+        Agent A or B: Extract from a paged document, one content-defined page chunk per call
+        
+        Chunk results are cached by content, so when a new revision of a document
+        arrives only the chunks holding changed pages are sent to the LLM again.
         
         Args:
-            agent_a_response: Extraction from first document
-            agent_b_response: Extraction from second document
+            pages: Text of each page
+            source_type: Type of document (e.g., "Press Release", "FDA Report")
+            agent_name: Name of the agent for logging
+            doc_id: Stable document identifier used to report changes between revisions
         
         Returns:
-            ScientificAsset with unified ground truth and conflicts
+            AgentResponse merged across chunks
         """
-        self.log_thought("Supervisor", "Starting reconciliation of sources...")
+        self.log_thought(agent_name, f"Starting extraction from {source_type}...")
         
-        prompt = f"""You are a scientific supervisor reconciling data from two different sources.
-
-SOURCE 1 ({agent_a_response.source_type}):
-- Drug Name: {agent_a_response.drug_name}
-- Molecule Type: {agent_a_response.molecule_type}
-- Clinical Phase: {agent_a_response.clinical_phase}
-- Toxicity: {agent_a_response.primary_toxicity_finding}
-- Reasoning: {agent_a_response.reasoning}
-
-SOURCE 2 ({agent_b_response.source_type}):
-- Drug Name: {agent_b_response.drug_name}
-- Molecule Type: {agent_b_response.molecule_type}
-- Clinical Phase: {agent_b_response.clinical_phase}
-- Toxicity: {agent_b_response.primary_toxicity_finding}
-- Reasoning: {agent_b_response.reasoning}
+        try:
+            document_text = "\n".join(pages)
+            doc_key = doc_id or f"sha:{content_hash(document_text)[:16]}"
+            if doc_id:
+                diff = self.cache.diff_revision(doc_id, pages)
+                self.log_thought(agent_name, f"Revision check: {diff.summary()}")
+            
+            duplicate = self._reuse_near_duplicate(document_text, doc_key, source_type, agent_name)
+            if duplicate is not None:
+                return duplicate
+            
+            local, known = self._apply_rules(document_text, source_type, agent_name)
+            if local is not None:
+                return self._finish_extraction([local], 0, source_type, agent_name, document_text, doc_key)
+            
+            overhead = estimate_tokens(EXTRACTION_SYSTEM_PROMPT + self._extraction_prompt("", source_type, known))
+            chunk_limit = self.budget.prompt_limit(EXTRACTION_MAX_TOKENS) - overhead
+            groups = chunk_pages(pages, page_hashes(pages), chunk_limit)
+            parts = ["\n".join(pages[index] for index in group) for group in groups] or [""]
+            
+            # Oversized pages or a tight run budget: let the planner decide for the whole document
+            needed = sum(estimate_tokens(part) for part in parts) + len(parts) * (overhead + EXTRACTION_MAX_TOKENS)
+            oversized = any(estimate_tokens(part) > chunk_limit for part in parts)
+            if oversized or (self.budget.remaining is not None and needed > self.budget.remaining):
+                plan, parts = self.budget.plan_document("\n".join(parts), overhead, EXTRACTION_MAX_TOKENS)
+                self.log_thought(agent_name, f"Token plan: {plan.action}. {plan.reason}")
+            elif len(parts) > 1:
+                self.log_thought(agent_name, f"Page plan: {len(parts)} content-defined chunks over {len(pages)} pages")
+            
+            responses, reused = self._extract_parts(parts, source_type, known, agent_name)
+            return self._finish_extraction(responses, reused, source_type, agent_name, document_text, doc_key)
+            
+        except Exception as e:
+            error_msg = f"Error during extraction: {str(e)}"
+            self.log_thought(agent_name, f"✗ {error_msg}")
+            raise RuntimeError(error_msg)
+    
+    def _reconciliation_prompt(self, responses: List[AgentResponse], reasoning_chars: Optional[int] = None) -> str:
+        """Build the Supervisor prompt over N sources, optionally clipping each agent's reasoning"""
+        def clip(reasoning):
+            if reasoning_chars is None or len(reasoning) <= reasoning_chars:
+                return reasoning
+            return reasoning[:reasoning_chars] + "..."
+        
+        count = "two" if len(responses) == 2 else str(len(responses))
+        sources = "\n".join(
+            f"""SOURCE {i} ({response.source_type}):
+- Drug Name: {response.drug_name}
+- Molecule Type: {response.molecule_type}
+- Clinical Phase: {response.clinical_phase}
+- Toxicity: {response.primary_toxicity_finding}
+- Reasoning: {clip(response.reasoning)}
+"""
+            for i, response in enumerate(responses, 1)
+        )
+        
+        return f"""You are a scientific supervisor reconciling data from {count} different sources.
 
+{sources}
 Your task:
-1. Identify any CONFLICTS between the two sources
+1. Identify any CONFLICTS between the {count} sources
 2. Determine the most reliable "ground truth" for each parameter
 3. Assign a confidence score (0.0 to 1.0) based on agreement between sources
 4. List all conflicts found
@@ -202,27 +778,99 @@ Respond in JSON format with these fields:
 If sources perfectly agree, confidence_score should be 1.0 and conflicts_found should be empty.
 If there are major discrepancies, confidence_score should be lower and conflicts should be detailed.
 """
+    
+    def reconcile_sources(self, agent_a_response: AgentResponse, agent_b_response: AgentResponse,
+                          documents: Optional[List[Optional[SourceDocument]]] = None) -> ScientificAsset:
+        """
+        Supervisor Agent C: Reconcile conflicts between two document extractions
+        
+        Args:
+            agent_a_response: Extraction from first document
+            agent_b_response: Extraction from second document
+            documents: The two source documents, quoted by the agents in a debate
+        
+        Returns:
+            ScientificAsset with unified ground truth and conflicts
+        """
+        return self.reconcile_multiple([agent_a_response, agent_b_response], documents)
+    
+    def reconcile_multiple(self, responses: List[AgentResponse],
+                           documents: Optional[List[Optional[SourceDocument]]] = None,
+                           agreement_shortcut: bool = True) -> ScientificAsset:
+        """
+        Supervisor Agent C: Reconcile conflicts between any number of document extractions
+        
+        With debate_rounds set, agents whose values were overruled may rebut the
+        ruling with evidence before it is final (see _debate).
+        
+        Args:
+            responses: One extraction per source document
+            documents: Source document behind each response (None where unavailable),
+                quoted by the agents in a debate
+            agreement_shortcut: Reconcile sources that agree on every field locally,
+                without the Supervisor
+        
+        Returns:
+            ScientificAsset with unified ground truth and conflicts, and the
+            located evidence of every source
+        """
+        asset = self._reconcile(responses, documents, agreement_shortcut)
+        asset.evidence = [span for response in responses for span in response.evidence_spans]
+        return asset
+    
+    def _reconcile(self, responses: List[AgentResponse], documents: Optional[List[Optional[SourceDocument]]],
+                   agreement_shortcut: bool = True) -> ScientificAsset:
+        self.log_thought("Supervisor", "Starting reconciliation of sources...")
+        
+        if len(responses) == 1:
+            return self._single_source_asset(responses[0])
+        
+        local = score_sources(responses)
+        plan = self.run_plan
+        if self._agrees_locally(local) and agreement_shortcut:
+            return self._local_asset(responses, local)
+        if plan is not None and plan.skip_supervisor_on_agreement and local.unanimous and agreement_shortcut:
+            plan.record(SKIP_SUPERVISOR)
+            return self._local_asset(responses, local)
+        
+        system = RECONCILIATION_SYSTEM_PROMPT
+        reasoning_chars = plan.reasoning_chars if plan is not None else None
+        if reasoning_chars is not None:
+            plan.record(SHORT_REASONING)
+        prompt = self._reconciliation_prompt(responses, reasoning_chars)
+        
+        # Compress: clip agent reasoning until the prompt fits a single call
+        limit = self.budget.prompt_limit(RECONCILIATION_MAX_TOKENS)
+        if estimate_tokens(system + prompt) > limit:
+            reasoning_chars = reasoning_chars or max(len(response.reasoning) for response in responses)
+            while estimate_tokens(system + prompt) > limit and reasoning_chars > MIN_REASONING_CHARS:
+                reasoning_chars = max(reasoning_chars // 2, MIN_REASONING_CHARS)
+                prompt = self._reconciliation_prompt(responses, reasoning_chars)
+            self.log_thought("Supervisor", f"Token plan: compress (agent reasoning clipped to {reasoning_chars:,} chars)")
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a scientific reconciliation expert. Respond only with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Parse JSON response
-            if content.startswith("```"):
-                content = content.split("```")[1]
-                if content.startswith("json"):
-                    content = content[4:].strip()
-            
-            data = json.loads(content)
+            # Same extractions as a previous run: the supervisor would see an identical prompt
+            debate = [f"debate:{self.debate_rounds}"] if self.debate_rounds else []
+            key = content_hash(self.active_model, system, prompt, *debate)
+            data = self.cache.get(key)
+            if data is not None:
+                self.log_thought("Supervisor", "♻️ Extractions unchanged since last run, reusing reconciliation")
+            elif plan is not None and plan.remaining < call_seconds(
+                self.active_model, estimate_tokens(system + prompt), RECONCILIATION_COMPLETION_TOKENS
+            ):
+                plan.record(SUPERVISOR_SKIPPED_AT_DEADLINE)
+                self.log_thought("Supervisor", f"⏱️ {max(plan.remaining, 0):.1f}s left before the deadline, too little for the Supervisor")
+                return self._local_fallback_asset(
+                    responses, local,
+                    f"Deadline reached before the Supervisor could run, so {len(responses)} sources were reconciled by "
+                    "local agreement scoring only. Where sources conflict, the first source's value is shown."
+                )
+            else:
+                data, shared = self.in_flight.do(key, lambda: self._parse_json(
+                    self._chat(system, prompt, temperature=0.3, max_tokens=RECONCILIATION_MAX_TOKENS)
+                ))
+                if shared:
+                    self.log_thought("Supervisor", "⏳ Identical reconciliation already in flight, shared its result")
             
             # Log conflicts if found
             if data.get("conflicts_found"):
@@ -231,53 +879,700 @@ If there are major discrepancies, confidence_score should be lower and conflicts
             else:
                 self.log_thought("Supervisor", "✓ Sources are in agreement")
             
-            asset = ScientificAsset(
-                drug_name=data["drug_name"],
-                molecule_type=data["molecule_type"],
-                clinical_phase=data["clinical_phase"],
-                primary_toxicity_finding=data["primary_toxicity_finding"],
-                confidence_score=data["confidence_score"],
-                conflicts_found=data.get("conflicts_found", []),
-                source_summary=data.get("source_summary")
-            )
+            asset = self._supervisor_asset(data, responses)
+            if self.debate_rounds and asset.conflicts_found and "debate_rounds" not in data:
+                asset = self._debate(asset, responses, documents, prompt)
+            self.cache.put(key, asset.model_dump())
             
+            self._cross_check(asset, local)
             self.log_thought("Supervisor", f"✓ Reconciliation complete. Confidence: {asset.confidence_score:.2%}")
             
             return asset
             
+        except CircuitOpenError as e:
+            self.log_thought("Supervisor", f"⚠️ {e}")
+            self.log_thought(
+                "Supervisor",
+                f"⚠️ Degraded mode: reconciled by local agreement scoring (confidence {local.confidence:.2%}), "
+                "conflicts listed but not resolved"
+            )
+            return self._local_fallback_asset(
+                responses, local,
+                f"DEGRADED: the LLM provider was unavailable, so {len(responses)} sources were reconciled by local "
+                "agreement scoring only. Where sources conflict, the first source's value is shown. Re-run to verify.",
+                degraded=True
+            )
         except Exception as e:
             error_msg = f"Error during reconciliation: {str(e)}"
             self.log_thought("Supervisor", f"✗ {error_msg}")
             raise RuntimeError(error_msg)
     
-    def process_dual_documents(self, doc1_text: str, doc1_type: str, doc2_text: str, doc2_type: str) -> tuple[ScientificAsset, List[str]]:
+    @staticmethod
+    def _supervisor_asset(data: dict, responses: List[AgentResponse]) -> ScientificAsset:
+        """Asset from a Supervisor ruling (or a cached one, which also carries its debate rounds)"""
+        return ScientificAsset(
+            drug_name=data["drug_name"],
+            molecule_type=data["molecule_type"],
+            clinical_phase=data["clinical_phase"],
+            primary_toxicity_finding=data["primary_toxicity_finding"],
+            confidence_score=data["confidence_score"],
+            conflicts_found=data.get("conflicts_found", []),
+            source_summary=data.get("source_summary"),
+            degraded=any(response.degraded for response in responses),
+            debate_rounds=data.get("debate_rounds", 0)
+        )
+    
+    @staticmethod
+    def _overruled_fields(response: AgentResponse, asset: ScientificAsset) -> List[str]:
+        """Fields where the ruling contradicts what this source stated"""
+        return [
+            field for field in RULE_FIELDS
+            if disagrees(field, getattr(response, field), getattr(asset, field))
+        ]
+    
+    def _rebuttal_prompt(self, response: AgentResponse, document: Optional[SourceDocument],
+                         asset: ScientificAsset, fields: List[str]) -> str:
+        """Ask an agent to defend or concede the values the Supervisor overruled"""
+        rulings = "\n".join(
+            f"- {field}: you stated '{getattr(response, field)}', the Supervisor ruled '{getattr(asset, field)}'"
+            for field in fields
+        )
+        conflicts = "\n".join(f"- {conflict}" for conflict in asset.conflicts_found) or "- none listed"
+        if document is not None:
+            evidence = filter_passages(document.text, DEBATE_EVIDENCE_TOKENS)
+        else:
+            evidence = response.reasoning
+        
+        return f"""You extracted data from a {response.source_type}. The Supervisor reconciled it with other sources and overruled you.
+
+Overruled fields:
+{rulings}
+
+Conflicts the Supervisor reported:
+{conflicts}
+
+Your source:
+{evidence}
+
+For each overruled field, maintain your value only if your source clearly supports it, quoting the exact sentence
+as evidence. Otherwise concede.
+
+Respond in JSON format:
+{{"rebuttals": [{{"field": "<field>", "position": "maintain" or "concede", "argument": "<one sentence>", "evidence": "<exact quote, empty when conceding>"}}]}}
+"""
+    
+    def _collect_rebuttals(self, responses: List[AgentResponse], documents: List[Optional[SourceDocument]],
+                           asset: ScientificAsset) -> List[str]:
+        """One rebuttal call per overruled agent; returns the maintained positions, formatted for the Supervisor"""
+        rebuttals = []
+        for index, (response, document) in enumerate(zip(responses, documents)):
+            fields = self._overruled_fields(response, asset)
+            if not fields:
+                continue
+            agent = agent_name(index)
+            data = self._parse_json(self._chat(
+                DEBATE_SYSTEM_PROMPT, self._rebuttal_prompt(response, document, asset, fields),
+                temperature=0.2, max_tokens=DEBATE_MAX_TOKENS
+            ))
+            for rebuttal in data.get("rebuttals", []):
+                field = rebuttal.get("field")
+                if field not in fields:
+                    continue
+                if rebuttal.get("position") != "maintain" or not rebuttal.get("evidence"):
+                    self.log_thought(agent, f"Concedes {field}: '{getattr(asset, field)}'")
+                    continue
+                self.log_thought(agent, f"🗣️ Maintains {field} '{getattr(response, field)}': \"{rebuttal['evidence']}\"")
+                rebuttals.append(
+                    f"{agent} ({response.source_type}) maintains {field} = '{getattr(response, field)}'. "
+                    f"Argument: {rebuttal.get('argument', '')} Evidence: \"{rebuttal['evidence']}\""
+                )
+        return rebuttals
+    
+    def _debate(self, asset: ScientificAsset, responses: List[AgentResponse],
+                documents: Optional[List[Optional[SourceDocument]]], prompt: str) -> ScientificAsset:
+        """
+        Let overruled agents rebut the Supervisor's ruling, for up to debate_rounds rounds
+        
+        Each round, every agent whose value was overruled may maintain it by
+        quoting its source, and the Supervisor rules again with the rebuttals in
+        view. The debate ends early once no agent maintains a position, the
+        ruling stops changing, or confidence stops improving by DEBATE_MIN_GAIN,
+        so only contested assets pay for extra rounds. A failed round (budget,
+        provider, deadline) ends the debate with the best ruling so far.
+        
+        Returns:
+            The ruling with the highest confidence, with the rounds held recorded
+        """
+        documents = documents or [None] * len(responses)
+        plan = self.run_plan
+        for round_number in range(1, self.debate_rounds + 1):
+            if not asset.conflicts_found:
+                break
+            round_seconds = (len(responses) + 1) * call_seconds(
+                self.active_model, estimate_tokens(prompt), RECONCILIATION_COMPLETION_TOKENS
+            )
+            if plan is not None and plan.remaining < round_seconds:
+                self.log_thought("Supervisor", f"⏱️ {max(plan.remaining, 0):.1f}s left before the deadline, ending debate")
+                break
+            
+            self.log_thought("Supervisor", f"🔁 Debate round {round_number}: inviting rebuttals to {len(asset.conflicts_found)} conflict(s)")
+            try:
+                rebuttals = self._collect_rebuttals(responses, documents, asset)
+                if not rebuttals:
+                    self.log_thought("Supervisor", "✓ Debate converged: every agent accepts the ruling")
+                    break
+                rebuttal_lines = "\n".join(f"- {rebuttal}" for rebuttal in rebuttals)
+                revised = self._supervisor_asset(self._parse_json(self._chat(
+                    RECONCILIATION_SYSTEM_PROMPT,
+                    f"""{prompt}
+Your previous ruling:
+{asset.model_dump_json(include={"drug_name", "molecule_type", "clinical_phase", "primary_toxicity_finding", "confidence_score", "conflicts_found"})}
+
+Rebuttals from the agents you overruled:
+{rebuttal_lines}
+
+Rule again. Change a field only if a rebuttal's quoted evidence outweighs the other sources.
+""",
+                    temperature=0.3, max_tokens=RECONCILIATION_MAX_TOKENS
+                )), responses)
+            except Exception as e:
+                self.log_thought("Supervisor", f"⚠️ Debate stopped in round {round_number}: {e}")
+                break
+            
+            revised.debate_rounds = round_number
+            asset.debate_rounds = round_number
+            changed = [field for field in RULE_FIELDS if disagrees(field, getattr(revised, field), getattr(asset, field))]
+            gain = revised.confidence_score - asset.confidence_score
+            self.log_thought(
+                "Supervisor",
+                f"Round {round_number} ruling: {', '.join(changed) or 'no fields'} revised, "
+                f"confidence {asset.confidence_score:.2%} → {revised.confidence_score:.2%}"
+            )
+            best = revised if gain >= 0 else asset
+            if not changed:
+                self.log_thought("Supervisor", "✓ Debate converged: ruling unchanged")
+                return best
+            if gain < DEBATE_MIN_GAIN:
+                self.log_thought("Supervisor", "Debate ended: confidence stopped improving")
+                return best
+            asset = revised
+        return asset
+    
+    def _agrees_locally(self, local: ConflictReport) -> bool:
+        """Sources agree closely enough to be reconciled without the Supervisor"""
+        return self.local_reconciliation and local.unanimous and local.confidence >= LOCAL_RECONCILIATION_CONFIDENCE
+    
+    def _local_asset(self, responses: List[AgentResponse], local: ConflictReport) -> ScientificAsset:
+        """Every source agrees: reconcile without calling the Supervisor model"""
+        self.log_thought(
+            "Supervisor",
+            f"⚡ All {len(responses)} sources agree (local confidence {local.confidence:.2%}), reconciled without LLM call"
+        )
+        
+        def first(field):
+            return next(getattr(response, field) for response in responses if getattr(response, field))
+        
+        return ScientificAsset(
+            drug_name=first("drug_name"),
+            molecule_type=first("molecule_type"),
+            clinical_phase=first("clinical_phase"),
+            primary_toxicity_finding=first("primary_toxicity_finding"),
+            confidence_score=local.confidence,
+            conflicts_found=[],
+            source_summary=f"All {len(responses)} sources agree on every field; reconciled by local agreement scoring",
+            local_confidence_score=local.confidence,
+            degraded=any(response.degraded for response in responses)
+        )
+    
+    @staticmethod
+    def _local_fallback_asset(responses: List[AgentResponse], local: ConflictReport, summary: str,
+                              degraded: bool = False) -> ScientificAsset:
+        """Supervisor unavailable or out of time: reconcile by local agreement scoring, conflicts left unresolved"""
+        def stated(field):
+            return next((getattr(r, field) for r in responses if getattr(r, field)), None) or "Not stated"
+        
+        return ScientificAsset(
+            drug_name=stated("drug_name"),
+            molecule_type=stated("molecule_type"),
+            clinical_phase=stated("clinical_phase"),
+            primary_toxicity_finding=stated("primary_toxicity_finding"),
+            confidence_score=local.confidence,
+            conflicts_found=local.describe_conflicts(),
+            source_summary=summary,
+            local_confidence_score=local.confidence,
+            degraded=degraded or any(response.degraded for response in responses)
+        )
+    
+    def _cross_check(self, asset: ScientificAsset, local: ConflictReport):
+        """Attach the local agreement score to a Supervisor result and flag disagreements"""
+        asset.local_confidence_score = local.confidence
+        if abs(asset.confidence_score - local.confidence) > CONFIDENCE_TOLERANCE:
+            self.log_thought(
+                "Supervisor",
+                f"⚠️ Confidence {asset.confidence_score:.2%} diverges from local agreement score {local.confidence:.2%}"
+            )
+        if local.conflicts and not asset.conflicts_found:
+            for conflict in local.describe_conflicts():
+                self.log_thought("Supervisor", f"⚠️ Local scorer found a conflict the Supervisor did not report: {conflict}")
+    
+    def _single_source_asset(self, response: AgentResponse) -> ScientificAsset:
+        """A lone source cannot be cross-checked: report it as is with neutral confidence"""
+        self.log_thought("Supervisor", "Only one source available, nothing to cross-check")
+        
+        def stated(value):
+            return value or "Not stated"
+        
+        return ScientificAsset(
+            drug_name=stated(response.drug_name),
+            molecule_type=stated(response.molecule_type),
+            clinical_phase=stated(response.clinical_phase),
+            primary_toxicity_finding=stated(response.primary_toxicity_finding),
+            confidence_score=SINGLE_SOURCE_CONFIDENCE,
+            conflicts_found=[],
+            source_summary=f"Single source ({response.source_type}), not corroborated by other documents",
+            degraded=response.degraded
+        )
+    
+    def fork(self) -> "DiligenceEngine":
+        """
+        Engine for a concurrent run: shares the Groq client, cache and
+        near-duplicate index, but has its own thought trace and token budget
+        """
+        forked = copy.copy(self)
+        forked._client = self.client
+        forked.thought_trace = []
+        forked.on_thought = None
+        forked.run_plan = None
+        forked.run_documents = set()
+        forked.budget = TokenBudget(self.model, run_budget=self.budget.run_budget,
+                                    max_prompt_tokens=self.budget.max_prompt_tokens,
+                                    max_chunks=self.budget.max_chunks)
+        return forked
+    
+    def _log_call_metrics(self):
+        """Report hedging and per-key usage (cumulative across runs) when they are in use"""
+        if self.hedging is not None and self.hedging.hedged:
+            self.log_thought("System", f"⚡ Hedging: {self.hedging.summary()}")
+        if self.key_pool is not None:
+            self.log_thought("System", f"🔑 API key pool: {self.key_pool.summary()}")
+    
+    def _extract(self, document: Union[str, List[str]], source_type: str, agent_name: str,
+                 doc_id: Optional[str] = None) -> AgentResponse:
+        """Route plain text and paged documents to the matching extraction path"""
+        plan = self.run_plan
+        if plan is not None and plan.passage_tokens:
+            text = document if isinstance(document, str) else "\n".join(document)
+            if estimate_tokens(text) > plan.passage_tokens:
+                # Deadline passage filtering works on the whole text, so page structure is dropped
+                document = filter_passages(text, plan.passage_tokens)
+                plan.record(PASSAGE_FILTER)
+                self.log_thought(agent_name, f"⏱️ Deadline: kept the most relevant ~{plan.passage_tokens:,} tokens")
+        if isinstance(document, list):
+            return self.extract_from_pages(document, source_type, agent_name, doc_id=doc_id)
+        return self.extract_from_document(document, source_type, agent_name)
+    
+    def _packed_extraction_prompt(self, items: List[Tuple[str, str, str, Dict[str, str]]]) -> str:
+        """Build one extraction prompt over several short documents, each tagged with its id"""
+        blocks = []
+        for doc_ref, source_type, text, known in items:
+            resolved = ""
+            if known:
+                listed = "; ".join(f"{field}={value}" for field, value in known.items())
+                resolved = f"Already resolved from explicit statements (copy unchanged): {listed}\n"
+            blocks.append(f'<document id="{doc_ref}" type="{source_type}">\n{resolved}{text}\n</document>')
+        reasoning = "explain your extraction process and any uncertainties"
+        if self.run_plan is not None and self.run_plan.reasoning_words:
+            reasoning += f", in at most {self.run_plan.reasoning_words} words"
+        documents = "\n\n".join(blocks)
+        return f"""You are a scientific diligence analyst reviewing {len(items)} short documents.
+
+For EACH document, extract the following information from that document's text only:
+1. Drug/Asset Name
+2. Molecule Type (small molecule, antibody, peptide, etc.)
+3. Clinical Development Phase (Preclinical, Phase 1, Phase 2, Phase 3, Approved)
+4. Primary Toxicity Finding (any safety concerns or adverse events mentioned)
+
+{documents}
+
+Provide your analysis as a JSON object with a single key "documents": a list with one entry
+per document, each with these fields:
+- id (the document id exactly as given)
+- drug_name
+- molecule_type
+- clinical_phase
+- primary_toxicity_finding
+- reasoning ({reasoning})
+- evidence (object mapping each field to the sentence of that document it was taken from, copied verbatim)
+
+Be precise and only extract information explicitly stated. Never carry information from one document to another.
+"""
+    
+    @staticmethod
+    def _parse_packed(data: dict, items: List[Tuple[str, str, str, Dict[str, str]]]) -> Dict[str, AgentResponse]:
+        """
+        Validate a packed extraction reply: exactly one well-formed entry per document id
+        
+        Raises:
+            ValueError: If an id is missing, duplicated or unknown, or an entry is malformed
+        """
+        entries = data.get("documents") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError("reply has no 'documents' list")
+        expected = {doc_ref: (source_type, known) for doc_ref, source_type, _, known in items}
+        responses = {}
+        for entry in entries:
+            doc_ref = str(entry.get("id")) if isinstance(entry, dict) else None
+            if doc_ref not in expected or doc_ref in responses:
+                raise ValueError(f"unexpected or repeated document id {doc_ref!r}")
+            source_type, known = expected[doc_ref]
+            fields = {field: entry.get(field) for field in RULE_FIELDS}
+            responses[doc_ref] = AgentResponse(
+                **{**fields, **known},
+                reasoning=entry.get("reasoning") or "No reasoning provided",
+                source_type=source_type,
+                evidence=evidence_quotes(entry)
+            )
+        missing = set(expected) - set(responses)
+        if missing:
+            raise ValueError(f"no entry for {', '.join(sorted(missing))}")
+        return responses
+    
+    def _extract_pack(self, items: List[Tuple[str, str, str, Dict[str, str]]]) -> Optional[Dict[str, AgentResponse]]:
+        """
+        Extract several short documents with one call
+        
+        Returns:
+            AgentResponse per document id, or None if the packed call failed or its
+            reply did not validate (the caller then extracts each document on its own)
+        """
+        prompt = self._packed_extraction_prompt(items)
+        key = content_hash(self.active_model, EXTRACTION_SYSTEM_PROMPT, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.log_thought("System", f"♻️ Reused cached packed extraction of {len(items)} documents")
+            return {doc_ref: AgentResponse(**response) for doc_ref, response in cached.items()}
+        
+        max_tokens = EXTRACTION_MAX_TOKENS
+        if self.run_plan is not None and self.run_plan.extraction_max_tokens:
+            max_tokens = self.run_plan.extraction_max_tokens
+            self.run_plan.record(SHORT_REASONING)
+        
+        def extract():
+            content = self._chat(
+                EXTRACTION_SYSTEM_PROMPT,
+                prompt,
+                temperature=0.2,
+                max_tokens=max_tokens * len(items)
+            )
+            return self._parse_packed(self._parse_json(content), items)
+        
+        try:
+            responses, shared = self.in_flight.do(key, extract)
+        except Exception as e:
+            self.log_thought("System", f"⚠️ Packed extraction failed ({e}), extracting each document on its own")
+            return None
+        if shared:
+            self.log_thought("System", "⏳ Identical packed extraction already in flight, shared its result")
+        self.cache.put(key, {doc_ref: response.model_dump() for doc_ref, response in responses.items()})
+        return responses
+    
+    def extract_runs(self, runs: List[Tuple["DiligenceEngine", List[SourceDocument]]]) -> List[List[Optional[AgentResponse]]]:
+        """
+        Extract short documents of independent runs (batch items) in shared calls
+        
+        A pack holds at most one document of each run, so two sources that will be
+        reconciled against each other never share a prompt. Documents of at most
+        PACK_MAX_DOCUMENT_TOKENS still get the near-duplicate and rule-based passes
+        on their run's engine; the rest are sent PACK_MAX_DOCUMENTS at a time in one
+        prompt, which saves the instruction preamble and a round trip per document.
+        Packed calls are made on this engine and their tokens are split across the
+        runs they served.
+        
+        Args:
+            runs: (engine, documents) of each run, every run on its own engine (see fork)
+        
+        Returns:
+            Responses of each run, None for the documents left to that run's
+            extract_documents (long documents, and short ones whose extraction failed)
+        """
+        results: List[List[Optional[AgentResponse]]] = [[None] * len(documents) for _, documents in runs]
+        pending: List[List[Tuple[int, str, Dict[str, str]]]] = []
+        for r, (engine, documents) in enumerate(runs):
+            engine.run_documents = set()
+            waiting = []
+            for i, document in enumerate(documents):
+                if estimate_tokens(document.text) > PACK_MAX_DOCUMENT_TOKENS:
+                    continue
+                name, text = agent_name(i), document.text
+                engine.log_thought(name, f"Starting extraction from {document.source_type}...")
+                doc_key = document.doc_id or f"sha:{content_hash(text)[:16]}"
+                if document.doc_id and isinstance(document.content, list):
+                    diff = engine.cache.diff_revision(document.doc_id, document.content)
+                    engine.log_thought(name, f"Revision check: {diff.summary()}")
+                results[r][i] = engine._reuse_near_duplicate(text, doc_key, document.source_type, name)
+                if results[r][i] is not None:
+                    continue
+                local, known = engine._apply_rules(text, document.source_type, name)
+                if local is not None:
+                    results[r][i] = engine._finish_extraction([local], 0, document.source_type, name, text, doc_key)
+                    continue
+                waiting.append((i, doc_key, known))
+            pending.append(waiting)
+        
+        while any(pending):
+            # The next document of each run, so no pack holds two documents of one run
+            group = []
+            for r, waiting in enumerate(pending):
+                if waiting and len(group) < PACK_MAX_DOCUMENTS:
+                    group.append((r, *waiting.pop(0)))
+            items = [
+                (f"doc{n + 1}", runs[r][1][i].source_type, runs[r][1][i].text, known)
+                for n, (r, i, _, known) in enumerate(group)
+            ]
+            packed = None
+            if len(group) > 1:
+                self.log_thought("System", f"📦 Packing {len(group)} short documents of different runs into one extraction call")
+                spent = self.budget.spent
+                packed = self._extract_pack(items)
+                share = (self.budget.spent - spent) // len(group)
+                for r, *_ in group:
+                    runs[r][0].budget.record(share)
+                    runs[r][0].log_thought("System", f"📦 Extracted in one call with {len(group) - 1} document(s) of other runs")
+            for (r, i, doc_key, known), (doc_ref, source_type, text, _) in zip(group, items):
+                engine, name = runs[r][0], agent_name(i)
+                try:
+                    if packed is not None:
+                        parts, reused = [packed[doc_ref]], 0
+                    else:
+                        parts, reused = engine._extract_parts([text], source_type, known, name)
+                    results[r][i] = engine._finish_extraction(parts, reused, source_type, name, text, doc_key)
+                except Exception as e:
+                    # Left to the run's own extract_documents, which reports the error for that run only
+                    engine.log_thought(name, f"✗ Error during extraction: {str(e)}")
+        return results
+    
+    def extract_documents(self, documents: List[SourceDocument],
+                          extracted: Optional[List[Optional[AgentResponse]]] = None) -> List[AgentResponse]:
+        """
+        Extract every document of a run, each in its own call
+        
+        The documents of a run are the sources one Supervisor reconciles, so they
+        are never packed into one prompt: read together, the model carries values
+        from one document to the other and their conflicts never surface. Short
+        documents of different runs can share calls instead (see extract_runs).
+        
+        Args:
+            documents: Source documents of the run
+            extracted: Responses extract_runs already produced for this run (None
+                entries are extracted here)
+        
+        Returns:
+            AgentResponse per document, with evidence located in its pages
+        """
+        if extracted is None:
+            self.run_documents = set()
+        responses = list(extracted) if extracted is not None else [None] * len(documents)
+        for i, document in enumerate(documents):
+            if responses[i] is None:
+                responses[i] = self._extract(document.content, document.source_type, agent_name(i),
+                                             doc_id=document.doc_id)
+        return [self._locate_evidence(response, document) for response, document in zip(responses, documents)]
+    
+    @staticmethod
+    def _locate_evidence(response: AgentResponse, document: SourceDocument) -> AgentResponse:
+        """Copy of the response with each evidence quote resolved to its page and offset in the document"""
+        pages = document.content if isinstance(document.content, list) else [document.content]
+        spans = locate_evidence(response.evidence, pages, document.doc_id or document.source_type)
+        return response.model_copy(update={"evidence_spans": spans})
+    
+    def process_dual_documents(self, doc1_text: Union[str, List[str]], doc1_type: str,
+                               doc2_text: Union[str, List[str]], doc2_type: str,
+                               doc1_id: Optional[str] = None, doc2_id: Optional[str] = None,
+                               deadline: Optional[float] = None) -> tuple[ScientificAsset, List[str]]:
         """
         Main workflow: Process two documents and return reconciled asset profile
         
         Args:
-            doc1_text: Text content of first document
+            doc1_text: Text content of first document (or a list of page texts)
             doc1_type: Type of first document (e.g., "Press Release")
-            doc2_text: Text content of second document
+            doc2_text: Text content of second document (or a list of page texts)
             doc2_type: Type of second document (e.g., "Clinical Trial Report")
+            doc1_id: Stable identifier of the first document, for revision tracking
+            doc2_id: Stable identifier of the second document, for revision tracking
+            deadline: Seconds the run may take; shortcuts are planned to meet it (see deadline.plan_deadline)
         
         Returns:
             Tuple of (ScientificAsset, thought_trace)
         """
-        # Reset thought trace for new analysis
+        # Reset thought trace and token spend for new analysis
         self.thought_trace = []
+        self.budget.reset()
         
         self.log_thought("System", f"🚀 Starting dual-document analysis: {doc1_type} vs {doc2_type}")
+        self._plan_run(deadline, [SourceDocument(content=doc1_text, source_type=doc1_type).text,
+                                  SourceDocument(content=doc2_text, source_type=doc2_type).text])
         
-        # Parallel extraction (Agent A and Agent B)
-        agent_a_response = self.extract_from_document(doc1_text, doc1_type, "Agent A")
-        agent_b_response = self.extract_from_document(doc2_text, doc2_type, "Agent B")
+        # Extraction (Agent A and Agent B)
+        documents = [
+            SourceDocument(content=doc1_text, source_type=doc1_type, doc_id=doc1_id),
+            SourceDocument(content=doc2_text, source_type=doc2_type, doc_id=doc2_id)
+        ]
+        agent_a_response, agent_b_response = self.extract_documents(documents)
         
         # Reconciliation (Supervisor Agent C)
-        final_asset = self.reconcile_sources(agent_a_response, agent_b_response)
+        final_asset = self.reconcile_sources(agent_a_response, agent_b_response, documents)
         
-        self.log_thought("System", "✅ Analysis complete. Asset profile ready.")
+        self._finish_run(final_asset)
+        self._log_call_metrics()
+        self.log_thought("System", f"✅ Analysis complete. Asset profile ready. (~{self.budget.spent:,} tokens spent)")
         
         return final_asset, self.thought_trace.copy()
+    
+    def process_documents(self, documents: List[SourceDocument],
+                          deadline: Optional[float] = None) -> tuple[ScientificAsset, List[str]]:
+        """
+        Process any number of documents about one asset and return the reconciled profile
+        
+        Args:
+            documents: Source documents (text or pages, type and optional id)
+            deadline: Seconds the run may take; shortcuts are planned to meet it (see deadline.plan_deadline)
+        
+        Returns:
+            Tuple of (ScientificAsset, thought_trace)
+        """
+        self.thought_trace = []
+        self.budget.reset()
+        
+        types = ", ".join(document.source_type for document in documents)
+        self.log_thought("System", f"🚀 Starting {len(documents)}-document analysis: {types}")
+        self._plan_run(deadline, [document.text for document in documents])
+        
+        responses = self.extract_documents(documents)
+        final_asset = self.reconcile_multiple(responses, documents)
+        
+        self._finish_run(final_asset)
+        self._log_call_metrics()
+        self.log_thought("System", f"✅ Analysis complete. Asset profile ready. (~{self.budget.spent:,} tokens spent)")
+        
+        return final_asset, self.thought_trace.copy()
+    
+    def update_asset(self, document: SourceDocument, knowledge_base,
+                     asset_key: Optional[str] = None) -> tuple[ScientificAsset, List[str]]:
+        """
+        Fold a new document into an asset's stored knowledge
+        
+        Only the new document is extracted, and it is reconciled against the
+        stored profile alone, so the cost of an update does not grow with the
+        number of earlier sources. A new source that agrees with a profile
+        without open conflicts is folded in locally; otherwise the Supervisor
+        rules, and decides which of the stored conflicts still apply.
+        
+        Args:
+            document: The newly arrived document
+            knowledge_base: Store with get(asset_key) and save(AssetKnowledge) (see knowledge.KnowledgeBase)
+            asset_key: Asset the document belongs to; detected from the text when omitted
+        
+        Returns:
+            Tuple of (updated ScientificAsset, thought_trace)
+        """
+        self.thought_trace = []
+        self.budget.reset()
+        self.run_plan = None
+        self.run_documents = set()
+        
+        text = document.text
+        sha = content_hash(text)
+        asset_key = asset_key or find_entities("", text).primary_asset
+        knowledge = knowledge_base.get(asset_key) if asset_key else None
+        self.log_thought("System", f"🚀 Updating asset {asset_key or '(unidentified)'} with {document.source_type}")
+        
+        if knowledge is not None and knowledge.has_source(sha):
+            self.log_thought("System", "♻️ Document already in knowledge base, profile unchanged")
+            return knowledge.profile, self.thought_trace.copy()
+        
+        response = self._extract(document.content, document.source_type, "Agent A", doc_id=document.doc_id)
+        response = self._locate_evidence(response, document)
+        if asset_key is None:
+            if not response.drug_name:
+                raise ValueError("Could not identify the asset of the document; pass asset_key")
+            asset_key = response.drug_name
+            knowledge = knowledge_base.get(asset_key)
+        
+        if knowledge is None:
+            self.log_thought("System", f"New asset {asset_key}, starting its knowledge base")
+            asset = self.reconcile_multiple([response])
+            knowledge = AssetKnowledge(asset_key=asset_key, profile=asset)
+        else:
+            earlier = len(knowledge.sources)
+            self.log_thought("System", f"Reconciling against stored profile of {asset_key} ({earlier} earlier sources)")
+            stored = knowledge.as_response()
+            local = score_sources([stored, response])
+            if not knowledge.profile.conflicts_found and self._agrees_locally(local):
+                asset = self.reconcile_multiple([stored, response], [None, document])
+                # The stored profile stands for its earlier sources: the new one moves confidence by its share
+                asset.confidence_score = round(
+                    (earlier * knowledge.profile.confidence_score + local.confidence) / (earlier + 1), 3
+                )
+                asset.source_summary = (
+                    f"New {document.source_type} agrees with the stored profile of {earlier} source(s) on every "
+                    "field; confidence updated by local agreement scoring"
+                )
+            else:
+                # Open conflicts are the Supervisor's to keep or resolve, even when the new source agrees
+                asset = self.reconcile_multiple([stored, response], [None, document], agreement_shortcut=False)
+            # Evidence of earlier sources still applies (a new revision of a document replaces its own)
+            replaced = {span.source for span in asset.evidence}
+            asset.evidence = [span for span in knowledge.profile.evidence if span.source not in replaced] + asset.evidence
+            knowledge.profile = asset
+        
+        knowledge.add_source(KnownSource(
+            sha=sha, source_type=document.source_type, doc_id=document.doc_id, extraction=response
+        ))
+        knowledge_base.save(knowledge)
+        
+        self.log_thought("System", f"✅ Asset {asset_key} updated. (~{self.budget.spent:,} tokens spent)")
+        
+        return asset, self.thought_trace.copy()
+    
+    def process_corpus(self, documents: List[SourceDocument], dictionary: Optional[AssetDictionary] = None,
+                       max_workers: int = 4) -> Dict[str, CorpusResult]:
+        """
+        Group a data room by asset locally, then reconcile each asset in parallel
+        
+        Grouping uses drug-code, INN and sponsor patterns (see clustering.py), so no
+        LLM call is spent on deciding which documents belong together.
+        
+        Args:
+            documents: Every document in the corpus (doc_id is required)
+            dictionary: Known asset aliases (code names, INN, brand names)
+            max_workers: Assets reconciled concurrently
+        
+        Returns:
+            Dict of asset name -> CorpusResult
+        
+        Raises:
+            ValueError: If a document has no doc_id or shares it with another document
+        """
+        by_id = {}
+        for document in documents:
+            if not document.doc_id:
+                raise ValueError(f"Every corpus document needs a doc_id ({document.source_type} has none)")
+            if document.doc_id in by_id:
+                raise ValueError(f"Duplicate doc_id in corpus: {document.doc_id}")
+            by_id[document.doc_id] = document
+        groups = cluster_documents({doc_id: document.text for doc_id, document in by_id.items()}, dictionary)
+        
+        def run(group: AssetGroup) -> CorpusResult:
+            engine = self.fork()
+            try:
+                asset, trace = engine.process_documents([by_id[doc_id] for doc_id in group.documents])
+                return CorpusResult(group=group, asset=asset, thought_trace=trace)
+            except Exception as e:
+                return CorpusResult(group=group, thought_trace=engine.thought_trace, error=str(e))
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(run, groups))
+        return {result.group.asset: result for result in results}
 
 
 # Example usage and testing
@@ -0,0 +1,516 @@
+"""
+Batch Runner
+Pipelined analysis of many document sets listed in an NDJSON manifest. PDF
+parsing and normalization run in a process pool while extraction and
+reconciliation run in thread pools, with bounded queues between the stages,
+so CPU and network work overlap and wall time approaches the slowest stage
+
+Manifest, one analysis per line (paths are relative to the manifest):
+    {"id": "btx-501", "asset": "BTX-501", "documents": [
+        {"source_type": "Press Release", "path": "btx501/pr.pdf"},
+        {"source_type": "Clinical Trial Report", "path": "btx501/csr.pdf", "doc_id": "csr-v2"},
+        {"source_type": "Abstract", "text": "..."}]}
+
+Run with: python batch.py manifest.ndjson --output results.ndjson
+
+Across several hosts sharing a filesystem, give each host a shard; items are
+partitioned by asset so documents about one asset stay on one host. Each shard
+writes its own results, report and cache file, and a merge step combines them:
+    python batch.py manifest.ndjson --shard-count 4 --shard-index 0   # on host 0, etc.
+    python batch.py manifest.ndjson --shard-count 4 --merge
+"""
+
+import argparse
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from backend import (PACK_MAX_DOCUMENTS, DiligenceEngine, ScientificAsset, SourceDocument, extract_pages_from_pdf,
+                     load_environment, normalize_page_texts)
+from cache import ExtractionCache, content_hash
+
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 2
+DEFAULT_LLM_WORKERS = 4
+
+# Items allowed to wait between two stages before the upstream stage blocks
+DEFAULT_QUEUE_SIZE = 8
+
+DONE = "done"
+FAILED = "failed"
+
+# Marks the end of a stage's input
+_END = object()
+
+
+class ManifestDocument(BaseModel):
+    """One document of a manifest entry: a PDF path or inline text"""
+    source_type: str
+    path: Optional[str] = None
+    text: Optional[str] = None
+    doc_id: Optional[str] = None
+
+
+class BatchItem(BaseModel):
+    """One manifest line: the documents about one asset that are reconciled together"""
+    id: str
+    asset: Optional[str] = Field(default=None, description="Asset the documents describe (defaults to id)")
+    documents: List[ManifestDocument]
+
+    @property
+    def asset_key(self) -> str:
+        return self.asset or self.id
+
+
+class BatchResult(BaseModel):
+    """One line of the results file"""
+    id: str
+    asset: str
+    status: str
+    result: Optional[ScientificAsset] = None
+    error: Optional[str] = None
+    thought_trace: List[str] = Field(default_factory=list)
+    metrics: Dict[str, float] = Field(default_factory=dict, description="Seconds per stage and tokens spent")
+
+
+class BatchReport(BaseModel):
+    """Totals for a batch run"""
+    items: int = 0
+    done: int = 0
+    failed: int = 0
+    skipped: int = Field(default=0, description="Items already done in an earlier run")
+    missing: int = Field(default=0, description="Manifest items no shard has a result for (merge only)")
+    wall_seconds: float = 0.0
+    stage_seconds: Dict[str, float] = Field(
+        default_factory=dict, description="Busy time summed over each stage's workers"
+    )
+    tokens_spent: int = 0
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+        missing = f", {self.missing} missing" if self.missing else ""
+        return (
+            f"{self.done} done, {self.failed} failed, {self.skipped} skipped{missing} of {self.items} "
+            f"in {self.wall_seconds:.1f}s "
+            f"(stage time: {stages}); ~{self.tokens_spent:,} tokens"
+        )
+
+
+def load_manifest(path: str) -> List[BatchItem]:
+    """
+    Read a manifest, resolving document paths against its directory
+
+    Raises:
+        ValueError: If a line is not a valid entry or ids repeat
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    items, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = BatchItem.model_validate_json(line)
+            except ValueError as e:
+                raise ValueError(f"Manifest line {number}: {e}")
+            if item.id in seen:
+                raise ValueError(f"Manifest line {number}: duplicate id {item.id}")
+            seen.add(item.id)
+            for document in item.documents:
+                if document.path:
+                    document.path = os.path.join(base, document.path)
+                elif not document.text:
+                    raise ValueError(f"Manifest line {number}: document needs 'path' or 'text'")
+            items.append(item)
+    return items
+
+
+def read_results(output_path: str) -> List[dict]:
+    """Records of a results file, in write order (missing file: none)"""
+    if not os.path.exists(output_path):
+        return []
+    records = []
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # Partial last line of an interrupted run
+    return records
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids already written as done to a results file, so a rerun resumes where it stopped"""
+    return {record["id"] for record in read_results(output_path) if record.get("status") == DONE}
+
+
+def shard_of(item: BatchItem, shard_count: int) -> int:
+    """
+    Shard an item belongs to: a stable hash of its asset, so every host
+    computes the same partition and an asset's items never split across shards
+    """
+    asset = " ".join(item.asset_key.split()).lower()
+    return int(content_hash(asset), 16) % shard_count
+
+
+def select_shard(items: List[BatchItem], shard_index: int, shard_count: int) -> List[BatchItem]:
+    """
+    Items of one shard, in manifest order
+
+    Raises:
+        ValueError: If shard_index is not in [0, shard_count)
+    """
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is not in 0..{shard_count - 1}")
+    return [item for item in items if shard_of(item, shard_count) == shard_index]
+
+
+def shard_path(path: str, shard_index: int, shard_count: int) -> str:
+    """Per-shard variant of a file path, e.g. results.ndjson -> results.shard-0-of-4.ndjson"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard_index}-of-{shard_count}{ext}"
+
+
+def report_path(output_path: str) -> str:
+    """Run report written next to a results file"""
+    return f"{os.path.splitext(output_path)[0]}.report.json"
+
+
+def write_report(report: BatchReport, output_path: str):
+    with open(report_path(output_path), "w", encoding="utf-8") as f:
+        f.write(report.model_dump_json(indent=2))
+
+
+def shard_cache(cache_path: str, shard_index: int, shard_count: int) -> ExtractionCache:
+    """
+    Cache for one shard: seeded from the shared cache on first use, then
+    written only by that shard so hosts never overwrite each other's file
+    """
+    path = shard_path(cache_path, shard_index, shard_count)
+    if not os.path.exists(path) and os.path.exists(cache_path):
+        shutil.copyfile(cache_path, path)
+    return ExtractionCache(path)
+
+
+def merge_shards(items: List[BatchItem], output_path: str, shard_count: int,
+                 cache_path: Optional[str] = None) -> BatchReport:
+    """
+    Combine the shards' results, reports and caches
+
+    Writes one results file in manifest order, keeping for each item its last
+    done record (else its last failure), and folds every shard cache into the
+    shared one. Stage seconds and tokens are totalled from the per-item
+    metrics; wall time is that of the slowest shard's last run.
+
+    Args:
+        items: Manifest entries
+        output_path: Merged results file (shard files are derived from it)
+        shard_count: Number of shards the manifest was run with
+        cache_path: Shared cache file the shard caches are merged into
+
+    Returns:
+        BatchReport for the whole manifest (also written next to output_path)
+    """
+    records: Dict[str, dict] = {}
+    report = BatchReport(items=len(items))
+    shared_cache = ExtractionCache(cache_path) if cache_path else None
+    for shard_index in range(shard_count):
+        path = shard_path(output_path, shard_index, shard_count)
+        for record in read_results(path):
+            previous = records.get(record["id"])
+            if previous is None or record.get("status") == DONE or previous.get("status") != DONE:
+                records[record["id"]] = record
+        if os.path.exists(report_path(path)):
+            with open(report_path(path), encoding="utf-8") as f:
+                shard_report = BatchReport.model_validate_json(f.read())
+            report.wall_seconds = max(report.wall_seconds, shard_report.wall_seconds)
+        if shared_cache is not None and os.path.exists(shard_path(cache_path, shard_index, shard_count)):
+            shared_cache.merge(ExtractionCache(shard_path(cache_path, shard_index, shard_count)))
+
+    stage_seconds: Dict[str, float] = {}
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for item in items:
+            record = records.get(item.id)
+            if record is None:
+                report.missing += 1
+                continue
+            out.write(json.dumps(record) + "\n")
+            if record.get("status") == DONE:
+                report.done += 1
+            else:
+                report.failed += 1
+            metrics = record.get("metrics", {})
+            report.tokens_spent += int(metrics.get("tokens_spent", 0))
+            for name, seconds in metrics.items():
+                if name.endswith("_seconds"):
+                    stage = name[:-len("_seconds")]
+                    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+    os.replace(tmp_path, output_path)
+    report.stage_seconds = {stage: round(seconds, 2) for stage, seconds in stage_seconds.items()}
+    write_report(report, output_path)
+    return report
+
+
+def parse_item(item: BatchItem, relevant_only: bool = False) -> Tuple[List[SourceDocument], float]:
+    """
+    Parse and normalize every PDF of an item (runs in a worker process)
+
+    Returns:
+        Tuple of (documents ready for extraction, seconds spent)
+    """
+    started = time.perf_counter()
+    documents = []
+    for document in item.documents:
+        if document.path:
+            with open(document.path, "rb") as f:
+                pages = extract_pages_from_pdf(f, relevant_only=relevant_only)
+            content, _ = normalize_page_texts(pages)
+            doc_id = document.doc_id or os.path.basename(document.path)
+        else:
+            content, doc_id = document.text, document.doc_id
+        documents.append(SourceDocument(content=content, source_type=document.source_type, doc_id=doc_id))
+    return documents, time.perf_counter() - started
+
+
+class BatchPipeline:
+    """
+    Staged batch execution: parse -> extract -> reconcile -> write
+
+    Parsing (with normalization) is CPU-bound and runs in a process pool;
+    extraction and reconciliation wait on Groq and run in thread pools, each
+    item on its own fork of the engine. Every stage hands items to the next
+    through a bounded queue, so a slow stage holds back the ones before it
+    instead of letting parsed documents pile up in memory. Results are
+    appended to the output file as they finish, in completion order.
+
+    With packing on (DILIGENCE_PACK_EXTRACTION=1), an extraction worker takes
+    the items already waiting together and packs their short documents into
+    shared calls, never two documents of one item in the same call.
+    """
+
+    def __init__(self, engine: DiligenceEngine, parse_workers: int = DEFAULT_PARSE_WORKERS,
+                 llm_workers: int = DEFAULT_LLM_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 relevant_only: bool = False):
+        self.engine = engine
+        self.parse_workers = parse_workers
+        self.llm_workers = llm_workers
+        self.queue_size = queue_size
+        self.relevant_only = relevant_only
+        self._busy: Dict[str, float] = {"parse": 0.0, "extract": 0.0, "reconcile": 0.0, "write": 0.0}
+        self._lock = threading.Lock()
+
+    def _add_busy(self, stage: str, seconds: float):
+        with self._lock:
+            self._busy[stage] += seconds
+
+    def _feed(self, items: List[BatchItem], pool: ProcessPoolExecutor, parsed: queue.Queue):
+        try:
+            for item in items:
+                # Blocks once queue_size parses are outstanding
+                parsed.put((item, pool.submit(parse_item, item, self.relevant_only)))
+        finally:
+            for _ in range(self.llm_workers):
+                parsed.put(_END)
+
+    def _take(self, parsed: queue.Queue) -> Tuple[list, bool]:
+        """
+        Next parsed item, plus those already waiting (up to PACK_MAX_DOCUMENTS) when packing is on
+
+        Returns:
+            Tuple of (entries, whether this worker's end marker was taken)
+        """
+        entry = parsed.get()
+        if entry is _END:
+            return [], True
+        entries = [entry]
+        while self.engine.pack_extraction and len(entries) < PACK_MAX_DOCUMENTS:
+            try:
+                entry = parsed.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _END:
+                return entries, True
+            entries.append(entry)
+        return entries, False
+
+    def _extract_packed(self, ready: list) -> list:
+        """Short documents of several items extracted in shared calls (see DiligenceEngine.extract_runs)"""
+        if len(ready) < 2:
+            return [None] * len(ready)
+        try:
+            return self.engine.fork().extract_runs([(engine, documents) for _, engine, documents, _ in ready])
+        except Exception as e:
+            for _, engine, _, _ in ready:
+                engine.log_thought("System", f"⚠️ Packed extraction failed ({e}), extracting each document on its own")
+            return [None] * len(ready)
+
+    def _extract_stage(self, parsed: queue.Queue, extracted: queue.Queue, results: queue.Queue):
+        while True:
+            entries, finished = self._take(parsed)
+            ready = []
+            for item, future in entries:
+                engine = self.engine.fork()
+                metrics = {}
+                try:
+                    documents, metrics["parse_seconds"] = future.result()
+                except Exception as e:
+                    results.put(self._failed(item, engine, metrics, e))
+                    continue
+                self._add_busy("parse", metrics["parse_seconds"])
+                types = ", ".join(document.source_type for document in documents)
+                engine.log_thought("System", f"🚀 Starting batch item {item.id}: {types}")
+                ready.append((item, engine, documents, metrics))
+
+            started = time.perf_counter()
+            packed = self._extract_packed(ready)
+            shared = (time.perf_counter() - started) / max(len(ready), 1)
+            for (item, engine, documents, metrics), done in zip(ready, packed):
+                started = time.perf_counter()
+                try:
+                    responses = engine.extract_documents(documents, done)
+                    metrics["extract_seconds"] = shared + time.perf_counter() - started
+                    self._add_busy("extract", metrics["extract_seconds"])
+                except Exception as e:
+                    results.put(self._failed(item, engine, metrics, e))
+                    continue
+                extracted.put((item, engine, documents, responses, metrics))
+            if finished:
+                extracted.put(_END)
+                return
+
+    def _reconcile_stage(self, extracted: queue.Queue, results: queue.Queue):
+        while True:
+            entry = extracted.get()
+            if entry is _END:
+                results.put(_END)
+                return
+            item, engine, documents, responses, metrics = entry
+            started = time.perf_counter()
+            try:
+                asset = engine.reconcile_multiple(responses, documents)
+            except Exception as e:
+                results.put(self._failed(item, engine, metrics, e))
+                continue
+            finally:
+                metrics["reconcile_seconds"] = time.perf_counter() - started
+                self._add_busy("reconcile", metrics["reconcile_seconds"])
+            engine.log_thought("System", f"✅ Batch item {item.id} complete. (~{engine.budget.spent:,} tokens spent)")
+            results.put(BatchResult(
+                id=item.id, asset=item.asset_key, status=DONE, result=asset,
+                thought_trace=engine.thought_trace.copy(),
+                metrics={**metrics, "tokens_spent": engine.budget.spent},
+            ))
+
+    @staticmethod
+    def _failed(item: BatchItem, engine: DiligenceEngine, metrics: dict, error: Exception) -> BatchResult:
+        return BatchResult(
+            id=item.id, asset=item.asset_key, status=FAILED, error=str(error),
+            thought_trace=engine.thought_trace.copy(),
+            metrics={**metrics, "tokens_spent": engine.budget.spent},
+        )
+
+    def run(self, items: List[BatchItem], output_path: str) -> BatchReport:
+        """
+        Analyze every item not already done in output_path, appending results to it
+
+        Args:
+            items: Manifest entries
+            output_path: NDJSON results file (created, or resumed if it exists)
+
+        Returns:
+            BatchReport for this run
+        """
+        started = time.perf_counter()
+        done_before = completed_ids(output_path)
+        todo = [item for item in items if item.id not in done_before]
+        report = BatchReport(items=len(items), skipped=len(items) - len(todo))
+
+        parsed = queue.Queue(maxsize=self.queue_size)
+        extracted = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            threads = [threading.Thread(target=self._feed, args=(todo, pool, parsed), daemon=True)]
+            threads += [
+                threading.Thread(target=self._extract_stage, args=(parsed, extracted, results), daemon=True)
+                for _ in range(self.llm_workers)
+            ]
+            threads += [
+                threading.Thread(target=self._reconcile_stage, args=(extracted, results), daemon=True)
+                for _ in range(self.llm_workers)
+            ]
+            for thread in threads:
+                thread.start()
+
+            # Write stage: this thread, until every reconcile worker has finished
+            finished_workers = 0
+            with open(output_path, "a", encoding="utf-8") as out:
+                while finished_workers < self.llm_workers:
+                    result = results.get()
+                    if result is _END:
+                        finished_workers += 1
+                        continue
+                    write_started = time.perf_counter()
+                    out.write(result.model_dump_json() + "\n")
+                    out.flush()
+                    self._add_busy("write", time.perf_counter() - write_started)
+                    report.tokens_spent += int(result.metrics.get("tokens_spent", 0))
+                    if result.status == DONE:
+                        report.done += 1
+                    else:
+                        report.failed += 1
+            for thread in threads:
+                thread.join()
+
+        report.wall_seconds = time.perf_counter() - started
+        report.stage_seconds = {stage: round(seconds, 2) for stage, seconds in self._busy.items()}
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diligence-Zero batch runner")
+    parser.add_argument("manifest", help="NDJSON manifest, one analysis per line")
+    parser.add_argument("--output", default="results.ndjson", help="NDJSON results file (resumed if it exists)")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS)
+    parser.add_argument("--llm-workers", type=int, default=DEFAULT_LLM_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--relevant-only", action="store_true", help="Only parse relevant sections of large PDFs")
+    parser.add_argument("--shard-count", type=int, default=1, help="Number of hosts the manifest is split across")
+    parser.add_argument("--shard-index", type=int, help="This host's shard (0-based), required with --shard-count")
+    parser.add_argument("--merge", action="store_true", help="Combine the shards' results, reports and caches")
+    parser.add_argument("--cache", default=None, help="Shared extraction cache file (default: DILIGENCE_CACHE_PATH)")
+    args = parser.parse_args()
+
+    load_environment()
+    items = load_manifest(args.manifest)
+    cache_path = args.cache or os.getenv("DILIGENCE_CACHE_PATH")
+    if args.merge:
+        report = merge_shards(items, args.output, args.shard_count, cache_path=cache_path)
+        print(f"✅ Merged {args.shard_count} shard(s) into {args.output}: {report.summary()}")
+        return
+
+    output_path, cache = args.output, ExtractionCache(cache_path)
+    if args.shard_count > 1:
+        if args.shard_index is None:
+            parser.error("--shard-index is required with --shard-count")
+        items = select_shard(items, args.shard_index, args.shard_count)
+        output_path = shard_path(args.output, args.shard_index, args.shard_count)
+        if cache_path:
+            cache = shard_cache(cache_path, args.shard_index, args.shard_count)
+    pipeline = BatchPipeline(DiligenceEngine(cache=cache), parse_workers=args.parse_workers,
+                             llm_workers=args.llm_workers, queue_size=args.queue_size,
+                             relevant_only=args.relevant_only)
+    print(f"🧬 Running {len(items)} analyses from {args.manifest} into {output_path}")
+    report = pipeline.run(items, output_path)
+    write_report(report, output_path)
+    print(f"✅ {report.summary()}")
+
+
+if __name__ == "__main__":
+    main()
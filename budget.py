@@ -0,0 +1,328 @@
+"""
+Token Budget Planner
+Estimates prompt size locally and decides how a document is sent to Groq
+before any API call is made
+"""
+
+import math
+import os
+import re
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# Context windows (tokens) for the Groq models the engine can use
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Per-call prompt ceiling; Groq rejects requests above the account's tokens-per-minute limit
+DEFAULT_MAX_PROMPT_TOKENS = 12000
+
+# Chunking is only worth it up to this many calls, after that we passage-filter instead
+DEFAULT_MAX_CHUNKS = 8
+
+# Average number of pages per content-defined page chunk
+DEFAULT_PAGES_PER_CHUNK = 8
+
+# Words and number groups roughly as a Llama-3 BPE tokenizer splits them
+_TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+# Terms that mark a passage as relevant to the fields we extract
+_RELEVANT_TERMS = re.compile(
+    r"phase|preclinical|approved|trial|molecule|antibody|inhibitor|peptide|conjugate|"
+    r"small molecule|gene therapy|toxicit|adverse|safety|serious|grade \d|hepato|cardio|"
+    r"neutropenia|thrombocytopenia|dose|tolerab|[A-Z]{2,5}-\d{2,5}",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the number of LLM tokens in a piece of text without a tokenizer
+
+    Short words count as one token, long words are split every ~4 characters,
+    digits are grouped in threes and every punctuation mark is its own token.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    count = 0
+    for piece in _TOKEN_PIECE.findall(text):
+        length = len(piece)
+        count += 1 if length <= 6 else 1 + math.ceil((length - 6) / 4)
+    return count
+
+
+def compress_text(text: str) -> str:
+    """Collapse whitespace and drop repeated lines (cheap, lossless for extraction purposes)"""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line or line in seen:
+            continue
+        seen.add(line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def split_passages(text: str) -> List[str]:
+    """Split text into paragraph-sized passages"""
+    passages = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    if len(passages) <= 1:
+        passages = [p.strip() for p in text.splitlines() if p.strip()]
+    return passages
+
+
+def filter_passages(text: str, token_limit: int) -> str:
+    """
+    Keep the passages most relevant to the extraction fields within a token limit
+
+    Args:
+        text: Document text
+        token_limit: Maximum number of tokens to keep
+
+    Returns:
+        str: Relevant passages in their original order
+    """
+    passages = split_passages(text)
+    scored = []
+    for index, passage in enumerate(passages):
+        tokens = estimate_tokens(passage)
+        hits = len(_RELEVANT_TERMS.findall(passage))
+        scored.append((hits / max(tokens, 1), hits, index, tokens))
+
+    kept = []
+    used = 0
+    for density, hits, index, tokens in sorted(scored, key=lambda s: (s[1] == 0, -s[0], s[2])):
+        if hits == 0 and kept:
+            break
+        if used + tokens > token_limit:
+            continue
+        kept.append(index)
+        used += tokens
+
+    if not kept:
+        # Every passage is larger than the limit, fall back to the leading slice
+        return chunk_text(text, token_limit)[0] if text.strip() else ""
+    return "\n\n".join(passages[i] for i in sorted(kept))
+
+
+def chunk_text(text: str, token_limit: int) -> List[str]:
+    """
+    Split text into passage-aligned chunks of at most token_limit tokens
+
+    Passages longer than the limit are cut on word boundaries.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        current = []
+        current_tokens = 0
+
+    for passage in split_passages(text):
+        tokens = estimate_tokens(passage)
+        if tokens > token_limit:
+            flush()
+            words = passage.split()
+            piece = []
+            piece_tokens = 0
+            for word in words:
+                word_tokens = estimate_tokens(word)
+                if piece and piece_tokens + word_tokens > token_limit:
+                    chunks.append(" ".join(piece))
+                    piece, piece_tokens = [], 0
+                piece.append(word)
+                piece_tokens += word_tokens
+            if piece:
+                chunks.append(" ".join(piece))
+            continue
+        if current_tokens + tokens > token_limit:
+            flush()
+        current.append(passage)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+def chunk_pages(pages: List[str], hashes: List[str], token_limit: int,
+                pages_per_chunk: int = DEFAULT_PAGES_PER_CHUNK) -> List[List[int]]:
+    """
+    Group consecutive pages into chunks whose boundaries depend on page content
+
+    A chunk ends after any page whose hash falls on the boundary residue, so editing
+    a page only changes the chunk holding it and inserting a page does not shift the
+    boundaries of the rest of the document. Chunks are also closed before they
+    exceed token_limit. Empty (skipped) pages are left out.
+
+    Args:
+        pages: Page texts
+        hashes: Content hash of each page (see cache.page_hashes)
+        token_limit: Maximum tokens per chunk
+        pages_per_chunk: Average chunk length in pages
+
+    Returns:
+        List of page-index groups
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for index, (page, page_hash) in enumerate(zip(pages, hashes)):
+        if not page.strip():
+            continue
+        tokens = estimate_tokens(page)
+        if current and current_tokens + tokens > token_limit:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+        if int(page_hash[:8], 16) % pages_per_chunk == 0:
+            groups.append(current)
+            current, current_tokens = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+class BudgetPlan(BaseModel):
+    """Decision taken by the planner before an LLM call"""
+    action: str = Field(description="One of: send, compress, filter, chunk")
+    estimated_tokens: int = Field(description="Predicted prompt + completion tokens for the original text")
+    planned_tokens: int = Field(description="Predicted prompt + completion tokens after the action")
+    prompt_limit: int = Field(description="Largest prompt allowed for a single call")
+    chunks: int = Field(default=1, description="Number of calls the document will be split into")
+    reason: str = Field(description="Why the action was chosen")
+
+
+class TokenBudget:
+    """
+    Tracks token spend for one analysis run and plans how each prompt is sent
+
+    The per-call limit is the smallest of the model's context window (minus the
+    completion reserve) and the configured per-call ceiling. The per-run budget
+    caps the total tokens spent across every call of a run.
+    """
+
+    def __init__(self, model: str, run_budget: Optional[int] = None, max_prompt_tokens: Optional[int] = None,
+                 max_chunks: int = DEFAULT_MAX_CHUNKS):
+        self.model = model
+        if run_budget is None and os.getenv("DILIGENCE_RUN_TOKEN_BUDGET"):
+            run_budget = int(os.getenv("DILIGENCE_RUN_TOKEN_BUDGET"))
+        if max_prompt_tokens is None:
+            max_prompt_tokens = int(os.getenv("DILIGENCE_MAX_PROMPT_TOKENS", DEFAULT_MAX_PROMPT_TOKENS))
+        self.run_budget = run_budget
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_chunks = max_chunks
+        self.spent = 0
+
+    @property
+    def context_window(self) -> int:
+        return MODEL_CONTEXT_WINDOWS.get(self.model, DEFAULT_CONTEXT_WINDOW)
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Tokens left in the run budget (None when unlimited)"""
+        if self.run_budget is None:
+            return None
+        return max(self.run_budget - self.spent, 0)
+
+    def reset(self):
+        """Start a new run"""
+        self.spent = 0
+
+    def record(self, tokens: int):
+        """Record tokens actually spent by a call"""
+        self.spent += tokens
+
+    def prompt_limit(self, max_tokens: int) -> int:
+        """Largest prompt a single call may carry given its completion reserve"""
+        return max(min(self.context_window - max_tokens, self.max_prompt_tokens), 0)
+
+    def check(self, prompt: str, max_tokens: int) -> int:
+        """
+        Verify a ready-made prompt fits the run budget
+
+        Returns:
+            int: Estimated prompt + completion tokens
+
+        Raises:
+            RuntimeError: If the call would exceed the remaining run budget
+        """
+        needed = estimate_tokens(prompt) + max_tokens
+        if self.remaining is not None and needed > self.remaining:
+            raise RuntimeError(
+                f"Token budget exhausted: call needs ~{needed:,} tokens, {self.remaining:,} remaining"
+            )
+        return needed
+
+    def plan_document(self, document_text: str, overhead_tokens: int, max_tokens: int) -> Tuple[BudgetPlan, List[str]]:
+        """
+        Choose how to send a document so each call fits the context and the run fits its budget
+
+        Args:
+            document_text: Raw document text that will be embedded in the prompt
+            overhead_tokens: Tokens of the instruction preamble around the document
+            max_tokens: Completion tokens reserved per call
+
+        Returns:
+            Tuple of (BudgetPlan, list of document texts to send - one per call)
+
+        Raises:
+            RuntimeError: If not even a filtered document fits the remaining run budget
+        """
+        per_call = overhead_tokens + max_tokens
+        limit = self.prompt_limit(max_tokens)
+        doc_limit = limit - overhead_tokens
+        if doc_limit <= 0:
+            raise RuntimeError(f"Prompt preamble alone exceeds the {limit:,} token prompt limit")
+
+        remaining = self.remaining
+        if remaining is not None:
+            doc_limit = min(doc_limit, remaining - per_call)
+            if doc_limit <= 0:
+                raise RuntimeError(
+                    f"Token budget exhausted: {remaining:,} tokens remaining, a call needs at least {per_call:,}"
+                )
+
+        doc_tokens = estimate_tokens(document_text)
+        estimated = doc_tokens + per_call
+
+        def make_plan(action, planned, chunks, reason):
+            return BudgetPlan(action=action, estimated_tokens=estimated, planned_tokens=planned,
+                              prompt_limit=limit, chunks=chunks, reason=reason)
+
+        if doc_tokens <= doc_limit:
+            return make_plan("send", estimated, 1, "Document fits in a single call"), [document_text]
+
+        compressed = compress_text(document_text)
+        compressed_tokens = estimate_tokens(compressed)
+        if compressed_tokens <= doc_limit:
+            return make_plan("compress", compressed_tokens + per_call, 1,
+                             "Fits after whitespace and duplicate-line compression"), [compressed]
+
+        # Chunking keeps every passage but pays the preamble once per chunk
+        context_doc_limit = limit - overhead_tokens
+        chunks = chunk_text(compressed, context_doc_limit)
+        chunk_cost = compressed_tokens + per_call * len(chunks)
+        affordable = remaining is None or chunk_cost <= remaining
+        if len(chunks) <= self.max_chunks and affordable:
+            return make_plan("chunk", chunk_cost, len(chunks),
+                             f"Too large for one call, split into {len(chunks)} chunks"), chunks
+
+        filtered = filter_passages(compressed, doc_limit)
+        reason = "Run budget cannot cover chunking" if not affordable else f"Would need {len(chunks)} chunks"
+        return make_plan("filter", estimate_tokens(filtered) + per_call, 1,
+                         f"{reason}, kept the most relevant passages"), [filtered]
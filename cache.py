@@ -0,0 +1,222 @@
+"""
+Extraction Cache
+Content-addressed store of per-chunk extractions, reconciliations and
+per-page document revisions, optionally persisted to an append-only JSONL
+file, plus in-flight coalescing of identical LLM calls
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def content_hash(*parts: str) -> str:
+    """Stable SHA-256 over one or more strings"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def page_hashes(pages: List[str]) -> List[str]:
+    """Hash every page (whitespace-insensitive) so revisions can be diffed page by page"""
+    return [content_hash(" ".join(page.split())) for page in pages]
+
+
+class RevisionDiff:
+    """Which pages of a document changed since the previous revision"""
+
+    def __init__(self, previous: Optional[List[str]], current: List[str]):
+        self.previous = previous
+        self.current = current
+        old = set(previous or [])
+        self.changed = [index for index, page_hash in enumerate(current) if page_hash not in old]
+
+    @property
+    def is_new(self) -> bool:
+        return self.previous is None
+
+    def summary(self) -> str:
+        if self.is_new:
+            return f"new document ({len(self.current)} pages)"
+        return f"{len(self.changed)} of {len(self.current)} pages changed since previous revision"
+
+
+class ExtractionCache:
+    """
+    Thread-safe key/value cache for LLM results
+
+    Entries are plain dicts (Pydantic model dumps). When a path is given the
+    cache is loaded from that file, and every new entry or revision is appended
+    to it as one JSON line, so a write costs the same however large the cache
+    has grown. Superseded lines are dropped when the file is next loaded.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, dict] = {}
+        self._revisions: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = value
+            self._append([{"key": key, "value": value}])
+
+    def diff_revision(self, doc_id: str, pages: List[str]) -> RevisionDiff:
+        """
+        Compare a document against its stored revision and record the new page hashes
+
+        Args:
+            doc_id: Stable identifier of the document (e.g. file name)
+            pages: Page texts of the new revision
+
+        Returns:
+            RevisionDiff describing the changed pages
+        """
+        current = page_hashes(pages)
+        with self._lock:
+            diff = RevisionDiff(self._revisions.get(doc_id), current)
+            self._revisions[doc_id] = current
+            self._append([{"doc_id": doc_id, "pages": current}])
+        return diff
+
+    def merge(self, other: "ExtractionCache") -> int:
+        """
+        Add another cache's entries and revisions (other wins on conflicting keys)
+
+        Returns:
+            Number of entries that were not already in this cache
+        """
+        with other._lock:
+            entries, revisions = dict(other._entries), dict(other._revisions)
+        with self._lock:
+            added = sum(1 for key in entries if key not in self._entries)
+            self._entries.update(entries)
+            self._revisions.update(revisions)
+            self._append([{"key": key, "value": value} for key, value in entries.items()] +
+                         [{"doc_id": doc_id, "pages": pages} for doc_id, pages in revisions.items()])
+        return added
+
+    def _load(self):
+        """
+        Replay the log
+
+        The file is rewritten with one line per live record when most lines are
+        superseded, when a line was cut short by a crash (appending after it
+        would corrupt the next record) or when it holds an earlier whole-cache snapshot.
+        """
+        lines, rewrite = 0, False
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    rewrite = True
+                    continue
+                lines += 1
+                if "key" in record:
+                    self._entries[record["key"]] = record["value"]
+                elif "doc_id" in record:
+                    self._revisions[record["doc_id"]] = record["pages"]
+                else:
+                    # Whole-cache JSON snapshot written by earlier versions
+                    self._entries.update(record.get("entries", {}))
+                    self._revisions.update(record.get("revisions", {}))
+                    rewrite = True
+        if rewrite or lines > 2 * (len(self._entries) + len(self._revisions)):
+            self._compact()
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, value in self._entries.items():
+                f.write(json.dumps({"key": key, "value": value}) + "\n")
+            for doc_id, pages in self._revisions.items():
+                f.write(json.dumps({"doc_id": doc_id, "pages": pages}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _append(self, records: List[dict]):
+        if not self.path or not records:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+class _Flight:
+    """One outstanding call and the waiters sharing it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait and receive the same result (or exception). Keys are
+    forgotten as soon as the call finishes, so later calls go to the cache.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key across concurrent callers
+
+        Returns:
+            Tuple of (result, True if it came from another caller's in-flight call)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+# Shared by every engine in the process, so concurrent sessions coalesce too
+IN_FLIGHT = SingleFlight()
@@ -0,0 +1,186 @@
+"""
+Asset Clustering
+Groups a document corpus by drug asset with local pattern matching, so
+per-asset reconciliation can be dispatched without any LLM call
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+# Development codes such as "BTX-501", "SYN 400" or "ABC123"
+DRUG_CODE = re.compile(r"\b([A-Z]{2,6})([- ]?)(\d{2,6})([A-Z]?)\b")
+_YEAR = re.compile(r"(19|20)\d\d")
+
+# Codes that look like drug codes but name something else
+NON_DRUG_CODES = {"COVID-19", "ICH-E6", "ISO-9001", "ISO-13485", "MEDDRA-25", "CTCAE-5", "FORM-10"}
+
+# Prefixes of biological targets, receptors and cytokines ("CD20", "IL-17", "CLDN18"): codes with
+# these prefixes are the drug's target, not the drug, unless the asset dictionary lists them
+TARGET_PREFIXES = {
+    "CD", "IL", "HER", "PD", "TNF", "CLDN", "CCR", "CXCR", "FGFR", "VEGF", "VEGFR", "TLR", "GPR", "HLA",
+    "JAK", "BCL", "KIR", "TGF", "IFN", "CSF", "MMP", "CYP", "TROP", "FCRN", "TIGIT",
+}
+
+# An asset followed by these words is the subject of the document ("BTX-501 is a ...", "ACM-101, an ...")
+DRUG_CONTEXT = re.compile(r"\s*(?:,|\(|\bis\b|\bwas\b)\s*(?:an?|the)\b", re.IGNORECASE)
+_TARGET_MENTION = re.compile(r"\banti-?\s*$", re.IGNORECASE)
+
+# International Nonproprietary Name stems (-mab antibodies, -nib kinase inhibitors, ...)
+INN_NAME = re.compile(
+    r"\b[a-z]{3,}(?:mab|tinib|nib|ciclib|parib|lisib|cept|glutide|tide|stat|previr|vir|prazole|sartan|"
+    r"olol|pril|gliptin|gliflozin|platin|taxel|rubicin|leucel|gene)\b",
+    re.IGNORECASE,
+)
+
+# Company names: one or two capitalised words followed by a corporate suffix
+SPONSOR_NAME = re.compile(
+    r"\b([A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)?)\s+"
+    r"(?:Pharmaceuticals|Pharma|Therapeutics|Biosciences|Biotherapeutics|Biotech|Oncology|Inc|Corp|"
+    r"Corporation|Ltd|AG|GmbH|plc)\b"
+)
+
+
+def normalize_code(prefix: str, number: str, suffix: str = "") -> str:
+    return f"{prefix.upper()}-{number}{suffix.upper()}"
+
+
+class AssetDictionary:
+    """
+    Known aliases of each asset (code names, INN and brand names)
+
+    All aliases are compiled into one alternation pattern, longest first, so a
+    document is scanned once regardless of dictionary size.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            aliases: Map of alias -> canonical asset name, e.g. {"lecanemab": "BAN2401"}
+        """
+        self.canonical = {alias.lower(): asset for alias, asset in (aliases or {}).items()}
+        self.pattern = None
+        if self.canonical:
+            alternation = "|".join(re.escape(alias) for alias in sorted(self.canonical, key=len, reverse=True))
+            self.pattern = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+
+    def find(self, text: str) -> List[str]:
+        if self.pattern is None:
+            return []
+        return [self.canonical[match.group(0).lower()] for match in self.pattern.finditer(text)]
+
+    def resolve(self, entity: str) -> str:
+        """Map an entity found by the generic patterns to its canonical asset name"""
+        return self.canonical.get(entity.lower(), entity)
+
+
+class DocumentEntities(BaseModel):
+    """Entities found in one document"""
+    doc_id: str
+    assets: Dict[str, int] = Field(default_factory=dict, description="Asset mentions (codes, INNs, dictionary hits)")
+    introduced: List[str] = Field(
+        default_factory=list, description='Assets named in drug context ("BTX-501 is a ...", "ACM-101, an ...")'
+    )
+    sponsors: Dict[str, int] = Field(default_factory=dict, description="Sponsor company mentions")
+
+    @property
+    def primary_asset(self) -> Optional[str]:
+        """
+        Asset the document is about: one introduced in drug context beats bare
+        mentions, then the most mentioned wins (ties go to the one mentioned first)
+        """
+        if not self.assets:
+            return None
+        return max(self.assets, key=lambda asset: (asset in self.introduced, self.assets[asset]))
+
+    @property
+    def primary_sponsor(self) -> Optional[str]:
+        if not self.sponsors:
+            return None
+        return max(self.sponsors, key=lambda sponsor: self.sponsors[sponsor])
+
+
+class AssetGroup(BaseModel):
+    """Documents describing the same asset"""
+    asset: str
+    documents: List[str]
+    sponsors: List[str] = Field(default_factory=list)
+
+
+def find_entities(doc_id: str, text: str, dictionary: Optional[AssetDictionary] = None) -> DocumentEntities:
+    """
+    Find drug codes, INN names, dictionary aliases and sponsors in a document
+
+    Args:
+        doc_id: Document identifier
+        text: Document text
+        dictionary: Optional known aliases
+
+    Returns:
+        DocumentEntities with mention counts in order of first appearance
+    """
+    dictionary = dictionary or AssetDictionary()
+    assets = Counter()
+    introduced = []
+
+    def mention(asset: str, match):
+        assets[asset] += 1
+        if asset not in introduced and DRUG_CONTEXT.match(text, match.end()):
+            introduced.append(asset)
+
+    for match in DRUG_CODE.finditer(text):
+        prefix, separator, number, suffix = match.groups()
+        if separator == " " and _YEAR.fullmatch(number):
+            continue  # "ASCO 2025", "FDA 2024"
+        code = normalize_code(prefix, number, suffix)
+        if code in NON_DRUG_CODES:
+            continue
+        known = code.lower() in dictionary.canonical or match.group(0).lower() in dictionary.canonical
+        if not known and (prefix.upper() in TARGET_PREFIXES or _TARGET_MENTION.search(text, 0, match.start())):
+            continue  # "anti-CD20", "IL-17 levels": the target, not the drug
+        mention(dictionary.resolve(code), match)
+    for match in INN_NAME.finditer(text):
+        mention(dictionary.resolve(match.group(0).lower()), match)
+    if dictionary.pattern is not None:
+        for match in dictionary.pattern.finditer(text):
+            mention(dictionary.canonical[match.group(0).lower()], match)
+
+    sponsors = Counter(match.group(1) for match in SPONSOR_NAME.finditer(text))
+    return DocumentEntities(doc_id=doc_id, assets=dict(assets), introduced=introduced, sponsors=dict(sponsors))
+
+
+def cluster_documents(documents: Dict[str, str], dictionary: Optional[AssetDictionary] = None) -> List[AssetGroup]:
+    """
+    Bucket documents by the asset they describe
+
+    Each document goes to its primary asset (see DocumentEntities.primary_asset), so
+    the targets it mentions ("anti-CD20", "IL-17") do not split an asset's documents
+    across groups. Documents naming no asset fall back to their sponsor, and
+    otherwise to an "unassigned" group.
+
+    Args:
+        documents: Map of doc_id -> document text
+        dictionary: Optional known aliases
+
+    Returns:
+        List of AssetGroup, largest first
+    """
+    groups: Dict[str, AssetGroup] = {}
+    for doc_id, text in documents.items():
+        entities = find_entities(doc_id, text, dictionary)
+        if entities.primary_asset:
+            key = entities.primary_asset
+        elif entities.primary_sponsor:
+            key = f"sponsor:{entities.primary_sponsor}"
+        else:
+            key = "unassigned"
+
+        group = groups.setdefault(key, AssetGroup(asset=key, documents=[]))
+        group.documents.append(doc_id)
+        for sponsor in entities.sponsors:
+            if sponsor not in group.sponsors:
+                group.sponsors.append(sponsor)
+
+    return sorted(groups.values(), key=lambda group: (-len(group.documents), group.asset))
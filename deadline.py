@@ -0,0 +1,154 @@
+"""
+Deadline Planner
+Predicts how long an analysis will take from its token counts and picks the
+cheapest set of shortcuts that should finish it within the caller's deadline
+"""
+
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from budget import estimate_tokens
+
+# Smaller Groq model used when the full model cannot meet the deadline
+FAST_MODEL = "llama-3.1-8b-instant"
+
+# Rough Groq throughput (tokens/second) for prompt processing and generation
+PROMPT_TOKENS_PER_SECOND = {
+    "llama-3.3-70b-versatile": 6000,
+    "llama-3.1-8b-instant": 20000,
+}
+COMPLETION_TOKENS_PER_SECOND = {
+    "llama-3.3-70b-versatile": 275,
+    "llama-3.1-8b-instant": 750,
+}
+
+# Network and queueing time of a call, whatever its size
+CALL_OVERHEAD_SECONDS = 0.3
+
+# Typical completion length of each call, and with reasoning truncated
+EXTRACTION_COMPLETION_TOKENS = 350
+RECONCILIATION_COMPLETION_TOKENS = 400
+SHORT_EXTRACTION_COMPLETION_TOKENS = 120
+SHORT_RECONCILIATION_COMPLETION_TOKENS = 150
+
+# Fixed instructions around every extraction and reconciliation prompt
+EXTRACTION_OVERHEAD_TOKENS = 300
+RECONCILIATION_PROMPT_TOKENS = 700
+
+# Reasoning limits used when truncating
+SHORT_REASONING_WORDS = 40
+SHORT_EXTRACTION_MAX_TOKENS = 300
+SHORT_REASONING_CHARS = 300
+
+# Per-document prompt size kept by deadline passage filtering
+DEADLINE_PASSAGE_TOKENS = 1500
+
+# Shortcuts in the order they are taken (least quality lost first)
+SKIP_SUPERVISOR = "skip supervisor on agreement"
+SHORT_REASONING = "truncated reasoning"
+PASSAGE_FILTER = "passage filtering"
+SMALLER_MODEL = "smaller model"
+
+# Taken during the run when too little time is left for the Supervisor call
+SUPERVISOR_SKIPPED_AT_DEADLINE = "supervisor skipped at deadline"
+
+
+def call_seconds(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Predicted wall time of one chat completion"""
+    return (
+        CALL_OVERHEAD_SECONDS
+        + prompt_tokens / PROMPT_TOKENS_PER_SECOND.get(model, 6000)
+        + completion_tokens / COMPLETION_TOKENS_PER_SECOND.get(model, 275)
+    )
+
+
+class DeadlinePlan(BaseModel):
+    """Shortcuts chosen for one run to meet its deadline"""
+    deadline_seconds: float = Field(description="Time allowed for the whole run")
+    model: str = Field(description="Model used for the run's calls")
+    degradations: List[str] = Field(default_factory=list, description="Shortcuts planned, in order")
+    applied: List[str] = Field(default_factory=list, description="Shortcuts the run actually took")
+    passage_tokens: Optional[int] = Field(default=None, description="Prompt size each document is filtered to")
+    extraction_max_tokens: Optional[int] = Field(default=None, description="Completion limit for extractions")
+    reasoning_words: Optional[int] = Field(default=None, description="Length asked of the agents' reasoning")
+    reasoning_chars: Optional[int] = Field(default=None, description="Agent reasoning clipped in the Supervisor prompt")
+    skip_supervisor_on_agreement: bool = False
+    estimated_seconds: float = Field(description="Predicted run time with these shortcuts")
+    started_at: float = Field(default_factory=time.monotonic)
+
+    @property
+    def remaining(self) -> float:
+        """Seconds left before the deadline"""
+        return self.deadline_seconds - (time.monotonic() - self.started_at)
+
+    def applies(self, degradation: str) -> bool:
+        return degradation in self.degradations
+
+    def record(self, degradation: str):
+        """Note that the run took a shortcut (planned, or forced by the deadline running out)"""
+        if degradation not in self.applied:
+            self.applied.append(degradation)
+
+    def summary(self) -> str:
+        taken = ", ".join(self.degradations) or "none needed"
+        return f"{self.deadline_seconds:g}s deadline, ~{self.estimated_seconds:.1f}s predicted. Shortcuts: {taken}"
+
+
+def plan_deadline(deadline_seconds: float, documents: List[str], model: str) -> DeadlinePlan:
+    """
+    Choose the fewest shortcuts that bring the predicted run time under the deadline
+
+    Shortcuts are added one at a time, least quality lost first: skipping the
+    Supervisor when the sources agree, asking for short reasoning, filtering each
+    document to its most relevant passages, then switching to the smaller model.
+    Extractions run one after another, so their times add up.
+
+    Args:
+        deadline_seconds: Time allowed for the whole run
+        documents: Text of each source document
+        model: Model the engine would use without shortcuts
+
+    Returns:
+        DeadlinePlan (its estimate may still exceed the deadline if every shortcut is taken)
+    """
+    document_tokens = [estimate_tokens(text) for text in documents]
+
+    def predict(plan: DeadlinePlan) -> float:
+        short = plan.applies(SHORT_REASONING)
+        extraction_completion = SHORT_EXTRACTION_COMPLETION_TOKENS if short else EXTRACTION_COMPLETION_TOKENS
+        seconds = sum(
+            call_seconds(plan.model, EXTRACTION_OVERHEAD_TOKENS + min(tokens, plan.passage_tokens or tokens),
+                         extraction_completion)
+            for tokens in document_tokens
+        )
+        if len(documents) > 1:
+            reconciliation_completion = SHORT_RECONCILIATION_COMPLETION_TOKENS if short else RECONCILIATION_COMPLETION_TOKENS
+            supervisor = call_seconds(plan.model, RECONCILIATION_PROMPT_TOKENS, reconciliation_completion)
+            # Agreement is only known after extraction: count the Supervisor at half weight once it may be skipped
+            seconds += supervisor / 2 if plan.skip_supervisor_on_agreement else supervisor
+        return seconds
+
+    plan = DeadlinePlan(deadline_seconds=deadline_seconds, model=model, estimated_seconds=0.0)
+    plan.estimated_seconds = predict(plan)
+    shortcuts = [SKIP_SUPERVISOR, SHORT_REASONING, PASSAGE_FILTER, SMALLER_MODEL]
+    while plan.estimated_seconds > deadline_seconds and shortcuts:
+        shortcut = shortcuts.pop(0)
+        if shortcut == PASSAGE_FILTER and max(document_tokens, default=0) <= DEADLINE_PASSAGE_TOKENS:
+            continue
+        if shortcut == SMALLER_MODEL and model == FAST_MODEL:
+            continue
+        plan.degradations.append(shortcut)
+        if shortcut == SKIP_SUPERVISOR:
+            plan.skip_supervisor_on_agreement = True
+        elif shortcut == SHORT_REASONING:
+            plan.extraction_max_tokens = SHORT_EXTRACTION_MAX_TOKENS
+            plan.reasoning_words = SHORT_REASONING_WORDS
+            plan.reasoning_chars = SHORT_REASONING_CHARS
+        elif shortcut == PASSAGE_FILTER:
+            plan.passage_tokens = DEADLINE_PASSAGE_TOKENS
+        else:
+            plan.model = FAST_MODEL
+        plan.estimated_seconds = predict(plan)
+    return plan
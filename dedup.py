@@ -0,0 +1,167 @@
+"""
+Near-Duplicate Detection
+MinHash signatures with an LSH band index, used to spot reprints of the same
+document (e.g. a press release with trivial edits) before paying for extraction
+"""
+
+import re
+import threading
+import zlib
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Similarity above which two documents are treated as the same content
+DEFAULT_THRESHOLD = 0.85
+
+# 128 permutations in 16 bands of 8 rows: candidates start to collide around 0.7 similarity
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 16
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Shingles hashed per vectorized step (bounds memory on 1,000-page documents)
+SIGNATURE_BLOCK = 8192
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> "np.ndarray":
+    """Hash overlapping word n-grams of lower-cased text to 32-bit integers"""
+    import numpy as np
+    
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in set(grams)), dtype=np.uint64)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index over ingested documents
+
+    Each added document keeps an optional payload (e.g. its extraction) that is
+    returned by query() so callers can reuse work done for a near-duplicate.
+    Documents found to be near-duplicates of each other form a cluster.
+    NumPy is imported on first use, so importing this module stays cheap.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERMUTATIONS,
+                 bands: int = NUM_BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        import numpy as np
+        
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        generator = np.random.RandomState(seed)
+        # Coefficients stay below 2^32 so signature() never overflows uint64
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._signatures: Dict[str, "np.ndarray"] = {}
+        self._payloads: Dict[str, Optional[dict]] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._parent: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> "np.ndarray":
+        """MinHash signature of a document"""
+        import numpy as np
+        
+        prime, max_hash = np.uint64(_MERSENNE_PRIME), np.uint64(_MAX_HASH)
+        # x, a and b are all below 2^32, so a·x + b < 2^64 is exact in uint64 and
+        # (a·x + b) mod p is the universal hash itself, not a wrapped value
+        hashes = shingles(text) & max_hash
+        signature = np.full(len(self._a), max_hash, dtype=np.uint64)
+        for start in range(0, hashes.size, SIGNATURE_BLOCK):
+            block = hashes[start:start + SIGNATURE_BLOCK]
+            permuted = (np.outer(block, self._a) + self._b) % prime & max_hash
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature
+
+    def _band_keys(self, signature: "np.ndarray") -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    @staticmethod
+    def similarity(first: "np.ndarray", second: "np.ndarray") -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float((first == second).mean())
+
+    def query(self, text: str, signature: Optional["np.ndarray"] = None) -> List[Tuple[str, float, Optional[dict]]]:
+        """
+        Find indexed documents similar to text
+
+        Returns:
+            List of (doc_id, estimated similarity, payload) above the threshold, most similar first
+        """
+        signature = self.signature(text) if signature is None else signature
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            matches = []
+            for doc_id in candidates:
+                score = self.similarity(signature, self._signatures[doc_id])
+                if score >= self.threshold:
+                    matches.append((doc_id, score, self._payloads[doc_id]))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def add(self, doc_id: str, text: str, payload: Optional[dict] = None,
+            signature: Optional["np.ndarray"] = None) -> List[Tuple[str, float, Optional[dict]]]:
+        """
+        Index a document and join it to the cluster of its near-duplicates
+
+        Re-adding a doc_id (a new revision) replaces its signature, payload and
+        LSH buckets, so queries no longer match its previous text.
+
+        Returns:
+            The near-duplicates found before the document was added
+        """
+        signature = self.signature(text) if signature is None else signature
+        matches = [match for match in self.query(text, signature) if match[0] != doc_id]
+        with self._lock:
+            previous = self._signatures.get(doc_id)
+            if previous is not None:
+                for band, key in enumerate(self._band_keys(previous)):
+                    bucket = self._buckets[band].get(key, [])
+                    if doc_id in bucket:
+                        bucket.remove(doc_id)
+                    if not bucket:
+                        self._buckets[band].pop(key, None)
+            self._signatures[doc_id] = signature
+            self._payloads[doc_id] = payload
+            self._parent.setdefault(doc_id, doc_id)
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].setdefault(key, [])
+                if doc_id not in bucket:
+                    bucket.append(doc_id)
+            for other, _, _ in matches:
+                self._union(doc_id, other)
+        return matches
+
+    def _find(self, doc_id: str) -> str:
+        while self._parent[doc_id] != doc_id:
+            self._parent[doc_id] = self._parent[self._parent[doc_id]]
+            doc_id = self._parent[doc_id]
+        return doc_id
+
+    def _union(self, first: str, second: str):
+        self._parent[self._find(first)] = self._find(second)
+
+    def cluster(self, doc_id: str) -> List[str]:
+        """All documents in the same near-duplicate cluster as doc_id"""
+        with self._lock:
+            if doc_id not in self._parent:
+                return []
+            root = self._find(doc_id)
+            return sorted(other for other in self._parent if self._find(other) == root)
@@ -0,0 +1,152 @@
+"""
+Evidence Spans
+Resolves the verbatim quotes agents give for each field to a page and
+character offset of the extracted text, so a reviewer can jump straight to the
+passage instead of re-reading the document
+"""
+
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# Characters of page text kept on each side of a match for display
+CONTEXT_CHARS = 200
+
+# Quotes shorter than this are too ambiguous to place
+MIN_QUOTE_CHARS = 4
+
+# Typographic characters models substitute when quoting (1:1, so offsets are preserved)
+_STRAIGHTEN = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-", " ": " "})
+
+_TOKEN = re.compile(r"\S+")
+_ELLIPSIS = re.compile(r"\s*(?:\.\.\.|…)\s*")
+
+
+class EvidenceSpan(BaseModel):
+    """Where the quote supporting one field was found"""
+    field: str
+    quote: str = Field(description="Quote as given by the agent")
+    source: str = Field(description="Document the quote comes from (id, or type when it has none)")
+    page: int = Field(description="1-based page number")
+    start: int = Field(description="Offset of the match in the page text")
+    end: int
+    exact: bool = Field(description="False when found only after folding case, spacing and typography")
+    before: str = Field(default="", description="Page text just before the match")
+    text: str = Field(default="", description="Matched page text")
+    after: str = Field(default="", description="Page text just after the match")
+
+
+def _fold(text: str) -> Tuple[str, List[int]]:
+    """
+    Lowercase, straighten typography and collapse whitespace runs to one space
+
+    Returns:
+        Tuple of (folded text, offset in text of each folded character)
+    """
+    text = text.translate(_STRAIGHTEN)
+    folded, positions = [], []
+    for match in _TOKEN.finditer(text):
+        token = match.group(0)
+        lowered = token.lower()
+        if len(lowered) != len(token):
+            lowered = token  # Rare characters whose lowercase changes length
+        if folded:
+            folded.append(" ")
+            positions.append(match.start() - 1)
+        folded.append(lowered)
+        positions.extend(range(match.start(), match.end()))
+    return "".join(folded), positions
+
+
+class PageIndex:
+    """
+    Searchable text of a paged document
+
+    Pages are joined once with their start offsets recorded, and a folded copy
+    keeps a map back to the original offsets, so every quote is one str.find
+    over the document (exact first, then folded) plus a bisect for its page.
+    """
+
+    def __init__(self, pages: List[str]):
+        self.pages = [page or "" for page in pages]
+        self.starts = []
+        offset = 0
+        for page in self.pages:
+            self.starts.append(offset)
+            offset += len(page) + 1
+        self.text = "\n".join(self.pages)
+        self.folded, self.positions = _fold(self.text)
+
+    def find(self, quote: str) -> Optional[Tuple[int, int, bool]]:
+        """
+        Offsets of a quote in the joined text
+
+        A quote elided with "..." is placed by its longest segment.
+
+        Returns:
+            Tuple of (start, end, exact), or None when the quote is not in the document
+        """
+        quote = quote.strip().strip("\"'“”‘’")
+        segments = [segment for segment in _ELLIPSIS.split(quote) if segment]
+        if not segments:
+            return None
+        quote = max(segments, key=len)
+        if len(quote) < MIN_QUOTE_CHARS:
+            return None
+
+        start = self.text.find(quote)
+        if start >= 0:
+            return start, start + len(quote), True
+        folded_quote, _ = _fold(quote)
+        start = self.folded.find(folded_quote) if folded_quote else -1
+        if start < 0:
+            return None
+        return self.positions[start], self.positions[start + len(folded_quote) - 1] + 1, False
+
+    def locate(self, field: str, quote: str, source: str) -> Optional[EvidenceSpan]:
+        """Span of a field's quote, with surrounding page text (clipped to the page it starts on)"""
+        found = self.find(quote)
+        if found is None:
+            return None
+        start, end, exact = found
+        index = bisect_right(self.starts, start) - 1
+        page = self.pages[index]
+        page_start = start - self.starts[index]
+        page_end = min(end - self.starts[index], len(page))
+        return EvidenceSpan(
+            field=field,
+            quote=quote,
+            source=source,
+            page=index + 1,
+            start=page_start,
+            end=page_end,
+            exact=exact,
+            before=page[max(page_start - CONTEXT_CHARS, 0):page_start],
+            text=page[page_start:page_end],
+            after=page[page_end:page_end + CONTEXT_CHARS],
+        )
+
+
+def locate_evidence(evidence: Dict[str, str], pages: List[str], source: str) -> List[EvidenceSpan]:
+    """
+    Resolve each field's quote against a document
+
+    Args:
+        evidence: Field -> verbatim quote, as returned by extraction
+        pages: Page texts of the document (a plain-text document is one page)
+        source: Label of the document recorded on each span
+
+    Returns:
+        One EvidenceSpan per quote found; quotes not in the document are dropped
+    """
+    if not evidence:
+        return []
+    index = PageIndex(pages)
+    spans = []
+    for field, quote in evidence.items():
+        span = index.locate(field, quote, source)
+        if span is not None:
+            spans.append(span)
+    return spans
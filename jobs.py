@@ -0,0 +1,234 @@
+"""
+Background Analysis Jobs
+Worker pool and job queue so analyses run outside the Streamlit script thread
+and keep going across reruns and browser reconnects
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from backend import DiligenceEngine, ScientificAsset, SourceDocument
+from store import ResultsStore, SourceRecord
+
+# Analyses run at the same time across all users
+DEFAULT_WORKERS = 2
+
+# Queued plus running jobs accepted before new submissions are refused
+DEFAULT_MAX_PENDING = 16
+
+# Seconds a job may run before it is stopped at its next step
+DEFAULT_JOB_TIMEOUT = 300
+
+# Finished jobs are dropped from memory after this many seconds, or beyond this many
+# (their results stay in the ResultsStore under analysis_id)
+DEFAULT_FINISHED_TTL = 3600
+DEFAULT_MAX_FINISHED = 200
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when the pending-job limit is reached"""
+
+
+class JobTimeoutError(RuntimeError):
+    """Raised inside a job that ran past its timeout"""
+
+
+class Job(BaseModel):
+    """One queued analysis"""
+    id: str
+    owner: str = Field(description="Client that submitted the job")
+    label: str
+    status: str = QUEUED
+    created_at: str
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: str = Field(default="Waiting for a worker", description="Latest thought trace entry")
+    steps: int = Field(default=0, description="Thought trace entries so far")
+    timeout: Optional[float] = Field(default=None, description="Seconds the job may run")
+    deadline: Optional[float] = Field(default=None, description="Seconds the analysis is planned to finish in")
+    result: Optional[ScientificAsset] = None
+    thought_trace: List[str] = Field(default_factory=list)
+    analysis_id: Optional[int] = Field(default=None, description="Id of the result in the results store")
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobQueue:
+    """
+    Thread pool running analyses, with per-job status held in memory
+
+    Finished results are also written to the ResultsStore, so they outlive the
+    process. Jobs run on a fork of the submitted engine and never share its
+    thought trace or token budget. Submissions beyond max_pending queued or
+    running jobs are refused, and a job past its timeout is stopped at its
+    next thought trace step. Finished jobs are evicted after finished_ttl
+    seconds, or oldest first beyond max_finished, so a long-running service
+    does not keep every trace and result in memory.
+    """
+
+    def __init__(self, store: ResultsStore, max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, timeout: Optional[float] = None,
+                 finished_ttl: Optional[float] = None, max_finished: int = DEFAULT_MAX_FINISHED):
+        max_workers = max_workers or int(os.getenv("DILIGENCE_JOB_WORKERS", DEFAULT_WORKERS))
+        self.max_workers = max_workers
+        self.max_pending = max_pending or int(os.getenv("DILIGENCE_MAX_PENDING_JOBS", DEFAULT_MAX_PENDING))
+        self.timeout = timeout or float(os.getenv("DILIGENCE_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT))
+        self.finished_ttl = finished_ttl or float(os.getenv("DILIGENCE_JOB_TTL", DEFAULT_FINISHED_TTL))
+        self.max_finished = max_finished
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diligence-job")
+        self._jobs: Dict[str, Job] = {}
+        # Timeouts raised from on_thought, by job id: the engine may wrap them in its own errors
+        self._timeouts: Dict[str, JobTimeoutError] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, engine: DiligenceEngine, documents: List[SourceDocument],
+               sources: List[SourceRecord], label: str, timeout: Optional[float] = None,
+               deadline: Optional[float] = None) -> Job:
+        """
+        Queue an analysis of documents
+
+        Args:
+            owner: Client identifier used to list the job later
+            engine: Engine to fork for this job
+            documents: Documents to reconcile
+            sources: Fingerprints of the documents, stored with the result
+            label: Short description shown in the job list
+            timeout: Seconds the job may run (defaults to the queue's timeout)
+            deadline: Seconds the analysis should take once started; the engine plans
+                shortcuts to meet it (unlike timeout, the job is not stopped)
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If max_pending jobs are already queued or running
+        """
+        return self.submit_lazy(owner, engine, lambda: (documents, sources), label, timeout=timeout, deadline=deadline)
+
+    def submit_lazy(self, owner: str, engine: DiligenceEngine,
+                    prepare: Callable[[], Tuple[List[SourceDocument], List[SourceRecord]]], label: str,
+                    timeout: Optional[float] = None, deadline: Optional[float] = None) -> Job:
+        """
+        Queue an analysis whose documents are prepared (e.g. PDFs parsed) by the worker
+
+        Args:
+            prepare: Returns (documents, sources); an exception fails the job
+            Other arguments as for submit()
+
+        Raises:
+            QueueFullError: If max_pending jobs are already queued or running
+        """
+        job = Job(
+            id=uuid.uuid4().hex[:12],
+            owner=owner,
+            label=label,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            timeout=timeout or self.timeout,
+            deadline=deadline,
+        )
+        with self._lock:
+            self._evict()
+            if sum(1 for queued in self._jobs.values() if queued.active) >= self.max_pending:
+                raise QueueFullError(f"{self.max_pending} analyses already pending, retry later")
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job.id, engine.fork(), prepare)
+        return self._snapshot(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def pending(self) -> int:
+        """Queued plus running jobs"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.active)
+
+    def full(self) -> bool:
+        """True when a submission would be refused"""
+        return self.pending() >= self.max_pending
+
+    def jobs(self, owner: str) -> List[Job]:
+        """Jobs submitted by owner, newest first"""
+        with self._lock:
+            self._evict()
+            owned = [self._snapshot(job) for job in self._jobs.values() if job.owner == owner]
+        return sorted(owned, key=lambda job: job.created_at, reverse=True)
+
+    def _evict(self):
+        """Drop finished jobs past finished_ttl, then the oldest beyond max_finished (caller holds the lock)"""
+        cutoff = time.time() - self.finished_ttl
+        finished = sorted((job for job in self._jobs.values() if not job.active), key=lambda job: job.finished_at)
+        expired = [job for job in finished if job.finished_at < cutoff]
+        kept = finished[len(expired):]
+        for job in expired + kept[:max(len(kept) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+
+    @staticmethod
+    def _snapshot(job: Job) -> Job:
+        """Copy that is safe to read while the worker keeps appending to the trace"""
+        return job.model_copy(update={"thought_trace": list(job.thought_trace)})
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            for field, value in changes.items():
+                setattr(job, field, value)
+
+    def _progress(self, job_id: str, entry: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.progress = entry
+            job.steps += 1
+            job.thought_trace.append(entry)
+            if time.time() - job.started_at > job.timeout:
+                self._timeouts[job_id] = JobTimeoutError(f"Analysis exceeded its {job.timeout:g}s timeout")
+            timeout = self._timeouts.get(job_id)
+        if timeout is not None:
+            raise timeout
+
+    def _run(self, job_id: str, engine: DiligenceEngine,
+             prepare: Callable[[], Tuple[List[SourceDocument], List[SourceRecord]]]):
+        self._update(job_id, status=RUNNING, started_at=time.time(), progress="Reading documents")
+        engine.on_thought = lambda entry: self._progress(job_id, entry)
+        try:
+            documents, sources = prepare()
+            asset, trace = engine.process_documents(documents, deadline=self.get(job_id).deadline)
+            started_at = self.get(job_id).started_at
+            analysis_id = self.store.save(asset, sources, trace, metrics={
+                "analysis_time": time.time() - started_at,
+                "tokens_spent": engine.budget.spent,
+            })
+            self._update(job_id, status=DONE, finished_at=time.time(), result=asset, thought_trace=trace,
+                         analysis_id=analysis_id)
+        except Exception as e:
+            # Report the timeout itself, not the extraction or reconciliation error it surfaced as
+            with self._lock:
+                error = self._timeouts.pop(job_id, e)
+            self._update(job_id, status=FAILED, finished_at=time.time(), error=str(error),
+                         thought_trace=engine.thought_trace.copy())
+        with self._lock:
+            self._timeouts.pop(job_id, None)
+            self._evict()
@@ -0,0 +1,254 @@
+"""
+API Key Pool
+Spreads Groq calls over several API keys, each with its own request/token
+rate budget, so batch throughput grows with the number of keys
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# Rate-limit window used by Groq's per-minute quotas
+WINDOW_SECONDS = 60.0
+
+# Cool-down after a 429 that did not say when to retry
+DEFAULT_COOLDOWN_SECONDS = 30.0
+
+# Longest a call waits for a key with budget left before giving up
+DEFAULT_MAX_WAIT_SECONDS = 60.0
+
+
+class KeyUsage(BaseModel):
+    """Usage report for one key of the pool"""
+    key: str = Field(description="Masked API key")
+    requests: int = Field(description="Calls made with the key")
+    tokens: int = Field(description="Tokens spent with the key")
+    rate_limited: int = Field(description="429 responses received")
+    in_flight: int = Field(description="Calls currently running")
+    window_requests: int = Field(description="Calls in the last minute")
+    window_tokens: int = Field(description="Tokens in the last minute")
+    cooling_seconds: float = Field(description="Seconds until the key is used again after a 429")
+
+
+def mask_key(api_key: str) -> str:
+    return f"{api_key[:4]}…{api_key[-4:]}" if len(api_key) > 12 else "…"
+
+
+def is_rate_limit(error: Exception) -> bool:
+    """True for a 429 from the provider (groq.RateLimitError or any error carrying status 429)"""
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Retry-After of a 429 response, if the provider sent one"""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class _PooledKey:
+    """One key with its client, sliding usage window and cool-down"""
+
+    def __init__(self, api_key: str, client_factory: Callable[[str], object]):
+        self.api_key = api_key
+        self._client_factory = client_factory
+        self._client = None
+        self.requests = 0
+        self.tokens = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.cooling_until = 0.0
+        self.window: deque = deque()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory(self.api_key)
+        return self._client
+
+    def trim(self, now: float):
+        while self.window and now - self.window[0][0] >= WINDOW_SECONDS:
+            self.window.popleft()
+
+    def window_tokens(self) -> int:
+        return sum(entry[1] for entry in self.window)
+
+
+def _groq_client(api_key: str):
+    from groq import Groq
+
+    # The pool rotates to another key on 429 instead of letting the client retry the same one
+    return Groq(api_key=api_key, max_retries=0)
+
+
+class KeyPool:
+    """
+    Least-loaded selection over several API keys
+
+    A call takes the key with the fewest calls in flight, then the fewest tokens
+    spent in the last minute, among keys that are not cooling down after a 429
+    and have request/token budget left in the current minute. When no key is
+    available the call waits for one, up to max_wait seconds.
+    """
+
+    def __init__(self, api_keys: List[str], requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, max_wait: float = DEFAULT_MAX_WAIT_SECONDS,
+                 client_factory: Callable[[str], object] = _groq_client):
+        if not api_keys:
+            raise ValueError("KeyPool needs at least one API key")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self._keys = [_PooledKey(api_key, client_factory) for api_key in dict.fromkeys(api_keys)]
+        self._available = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _has_budget(self, key: _PooledKey, tokens: int, now: float) -> bool:
+        if key.cooling_until > now:
+            return False
+        key.trim(now)
+        if self.requests_per_minute is not None and len(key.window) >= self.requests_per_minute:
+            return False
+        # A call larger than the whole per-minute budget still goes through on an idle key
+        if self.tokens_per_minute is not None and key.window and key.window_tokens() + tokens > self.tokens_per_minute:
+            return False
+        return True
+
+    def _next_free(self, now: float) -> float:
+        """Seconds until some key may have budget again"""
+        waits = []
+        for key in self._keys:
+            if key.cooling_until > now:
+                waits.append(key.cooling_until - now)
+            elif key.window:
+                waits.append(WINDOW_SECONDS - (now - key.window[0][0]))
+        return max(min(waits, default=1.0), 0.05)
+
+    def _acquire(self, tokens: int) -> Tuple[_PooledKey, list]:
+        """
+        Reserve the least-loaded key with budget for a call of about tokens
+
+        Returns:
+            Tuple of (key, its usage-window entry for this call)
+
+        Raises:
+            RuntimeError: If no key frees up within max_wait seconds
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self._available:
+            while True:
+                now = time.monotonic()
+                candidates = [key for key in self._keys if self._has_budget(key, tokens, now)]
+                if candidates:
+                    key = min(candidates, key=lambda k: (k.in_flight, k.window_tokens()))
+                    key.in_flight += 1
+                    # Count the call now so concurrent callers see the reservation
+                    entry = [now, tokens]
+                    key.window.append(entry)
+                    return key, entry
+                if now >= deadline:
+                    raise RuntimeError(f"All {len(self._keys)} API keys are rate limited or out of budget")
+                self._available.wait(min(self._next_free(now), deadline - now))
+
+    def _release(self, key: _PooledKey, entry: list, tokens: Optional[int] = None,
+                 error: Optional[Exception] = None):
+        """Return a key, recording the call's actual token spend or its 429"""
+        with self._available:
+            key.in_flight -= 1
+            key.requests += 1
+            if error is not None:
+                # A failed call still counts as a request, but spent no tokens we know of
+                entry[1] = 0
+            if error is not None and is_rate_limit(error):
+                key.rate_limited += 1
+                key.cooling_until = time.monotonic() + (retry_after(error) or DEFAULT_COOLDOWN_SECONDS)
+            if tokens is not None:
+                key.tokens += tokens
+                # Replace the reservation with the actual spend
+                entry[1] = tokens
+            self._available.notify_all()
+
+    def call(self, fn: Callable[[object], Tuple[object, int]], tokens: int):
+        """
+        Run fn(client) on a pooled key, moving to another key when one answers 429
+
+        Args:
+            fn: Makes the request with the given client; returns (result, tokens spent)
+            tokens: Estimated tokens of the call, checked against the per-key budget
+
+        Returns:
+            fn's (result, tokens spent)
+        """
+        for attempt in range(len(self._keys)):
+            key, entry = self._acquire(tokens)
+            try:
+                result, spent = fn(key.client)
+            except Exception as e:
+                self._release(key, entry, error=e)
+                if is_rate_limit(e) and attempt < len(self._keys) - 1:
+                    continue
+                raise
+            self._release(key, entry, tokens=spent)
+            return result, spent
+
+    def usage(self) -> List[KeyUsage]:
+        now = time.monotonic()
+        with self._available:
+            report = []
+            for key in self._keys:
+                key.trim(now)
+                report.append(KeyUsage(
+                    key=mask_key(key.api_key),
+                    requests=key.requests,
+                    tokens=key.tokens,
+                    rate_limited=key.rate_limited,
+                    in_flight=key.in_flight,
+                    window_requests=len(key.window),
+                    window_tokens=key.window_tokens(),
+                    cooling_seconds=round(max(key.cooling_until - now, 0.0), 1),
+                ))
+        return report
+
+    def summary(self) -> str:
+        return "; ".join(
+            f"{usage.key}: {usage.requests} calls, ~{usage.tokens:,} tokens"
+            + (f", {usage.rate_limited} × 429" if usage.rate_limited else "")
+            for usage in self.usage()
+        )
+
+
+_pools: Dict[Tuple[str, ...], KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def configured_keys() -> List[str]:
+    """Keys listed in GROQ_API_KEYS (comma-separated)"""
+    return [key.strip() for key in os.getenv("GROQ_API_KEYS", "").split(",") if key.strip()]
+
+
+def shared_key_pool(api_keys: List[str]) -> KeyPool:
+    """
+    Pool for these keys shared by every engine in the process, since rate
+    limits are per account; per-key budgets come from DILIGENCE_KEY_RPM and
+    DILIGENCE_KEY_TPM on first use
+    """
+    identity = tuple(dict.fromkeys(api_keys))
+    with _pools_lock:
+        if identity not in _pools:
+            rpm = os.getenv("DILIGENCE_KEY_RPM")
+            tpm = os.getenv("DILIGENCE_KEY_TPM")
+            _pools[identity] = KeyPool(
+                list(identity),
+                requests_per_minute=int(rpm) if rpm else None,
+                tokens_per_minute=int(tpm) if tpm else None,
+            )
+        return _pools[identity]
@@ -0,0 +1,65 @@
+"""
+Asset Knowledge Base
+Per-asset reconciled profile and source extractions kept in SQLite, so a new
+document only has to be reconciled against the stored state
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from backend import AssetKnowledge
+from store import DEFAULT_DB_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS asset_knowledge (
+    asset_key TEXT PRIMARY KEY COLLATE NOCASE,
+    updated_at TEXT NOT NULL,
+    source_count INTEGER NOT NULL,
+    knowledge TEXT NOT NULL
+);
+"""
+
+
+class KnowledgeBase:
+    """
+    SQLite-backed map of asset key -> AssetKnowledge
+
+    Shares the results database file by default. Asset keys are matched
+    case-insensitively.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("DILIGENCE_RESULTS_DB", DEFAULT_DB_PATH)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def get(self, asset_key: str) -> Optional[AssetKnowledge]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT knowledge FROM asset_knowledge WHERE asset_key = ?", (asset_key,)
+            ).fetchone()
+        return AssetKnowledge.model_validate_json(row[0]) if row else None
+
+    def save(self, knowledge: AssetKnowledge):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO asset_knowledge (asset_key, updated_at, source_count, knowledge) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    knowledge.asset_key,
+                    datetime.now().isoformat(timespec="seconds"),
+                    len(knowledge.sources),
+                    knowledge.model_dump_json(),
+                ),
+            )
+
+    def assets(self) -> List[str]:
+        """Asset keys with stored knowledge, most recently updated first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT asset_key FROM asset_knowledge ORDER BY updated_at DESC").fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,176 @@
+"""
+PDF Text Normalization
+Strips layout noise from pypdf output before it is sent to the agents
+"""
+
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from pydantic import BaseModel
+
+from budget import estimate_tokens
+
+# Lines inspected at the top and bottom of each page for running headers/footers
+EDGE_LINES = 3
+
+# A line is a running header/footer when it repeats on this share of pages
+REPEAT_THRESHOLD = 0.5
+MIN_PAGES_FOR_REPEATS = 3
+
+_PAGE_NUMBER = re.compile(r"^(page\s*)?[-–]?\s*\d{1,4}\s*[-–]?(\s*(of|/)\s*\d{1,4})?$", re.IGNORECASE)
+_HYPHEN_BREAK = re.compile(r"(\w)-\n(?=[a-z])")
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+# Legal boilerplate that carries no scientific content
+BOILERPLATE_PATTERNS = [
+    r"forward[- ]looking statements?",
+    r"private securities litigation reform act",
+    r"all rights reserved",
+    r"©\s*\d{4}",
+    r"copyright\s+(©\s*)?\d{4}",
+    r"this (document|communication|press release) (is|does) not constitute an offer",
+    r"for investor relations",
+    r"media contact",
+    r"^confidential(ity)?( and proprietary)?$",
+    r"trademarks? (of|are the property of)",
+]
+_BOILERPLATE = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+
+class NormalizationReport(BaseModel):
+    """Per-document summary of what normalization removed"""
+    pages: int
+    chars_before: int
+    chars_after: int
+    tokens_before: int
+    tokens_after: int
+    headers_footers_removed: int = 0
+    page_numbers_removed: int = 0
+    hyphenations_joined: int = 0
+    boilerplate_removed: int = 0
+
+    @property
+    def char_reduction(self) -> float:
+        """Share of characters removed (0-1)"""
+        return 1 - self.chars_after / self.chars_before if self.chars_before else 0.0
+
+    @property
+    def token_reduction(self) -> float:
+        """Share of estimated prompt tokens removed (0-1)"""
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.chars_before:,} → {self.chars_after:,} chars ({self.char_reduction:.0%} smaller), "
+            f"~{self.tokens_before - self.tokens_after:,} tokens saved"
+        )
+
+
+def _edge_size(lines: List[str]) -> int:
+    """Lines at each edge of a page that may hold a header/footer (short pages get fewer)"""
+    return min(EDGE_LINES, max(1, len(lines) // 4))
+
+
+def _line_key(line: str) -> str:
+    """Compare header/footer candidates with page numbers and dates masked out"""
+    return _DIGITS.sub("#", " ".join(line.split()).lower())
+
+
+def find_running_lines(pages: List[List[str]]) -> set:
+    """
+    Detect running headers and footers
+
+    Args:
+        pages: Lines of each page
+
+    Returns:
+        set: Masked line keys that repeat at the edges of enough pages
+    """
+    if len(pages) < MIN_PAGES_FOR_REPEATS:
+        return set()
+
+    counts = Counter()
+    for lines in pages:
+        edge = _edge_size(lines)
+        edges = {_line_key(line) for line in lines[:edge] + lines[-edge:] if line.strip()}
+        counts.update(edges)
+
+    threshold = max(MIN_PAGES_FOR_REPEATS, REPEAT_THRESHOLD * len(pages))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def normalize_page_texts(pages: List[str]) -> Tuple[List[str], NormalizationReport]:
+    """
+    Normalize the text of each PDF page, keeping the page structure
+
+    Drops running headers/footers and page numbers, strips legal boilerplate,
+    rejoins words hyphenated across line breaks and collapses whitespace.
+
+    Args:
+        pages: Raw text of each page as returned by pypdf
+
+    Returns:
+        Tuple of (normalized page texts, NormalizationReport)
+    """
+    raw = "\n".join(pages)
+    report = NormalizationReport(
+        pages=len(pages),
+        chars_before=len(raw),
+        chars_after=0,
+        tokens_before=estimate_tokens(raw),
+        tokens_after=0,
+    )
+
+    page_lines = [page.splitlines() for page in pages]
+    running = find_running_lines(page_lines)
+
+    cleaned_pages = []
+    for lines in page_lines:
+        kept = []
+        edge = _edge_size(lines)
+        running_lines = {
+            index for index, line in enumerate(lines)
+            if (index < edge or index >= len(lines) - edge) and line.strip() and _line_key(line.strip()) in running
+        }
+        body = [index for index, line in enumerate(lines) if line.strip() and index not in running_lines]
+        # Only the first or last line inside the header/footer can be a page number:
+        # bare numbers anywhere else are table cells (patient counts, doses, percentages)
+        outer = {body[0], body[-1]} if body else set()
+        for index, line in enumerate(lines):
+            stripped = line.strip()
+            if index in running_lines:
+                report.headers_footers_removed += 1
+                continue
+            if index in outer and _PAGE_NUMBER.match(stripped):
+                report.page_numbers_removed += 1
+                continue
+            if stripped and _BOILERPLATE.search(stripped):
+                report.boilerplate_removed += 1
+                continue
+            kept.append(_SPACES.sub(" ", stripped))
+        text, joined = _HYPHEN_BREAK.subn(r"\1", "\n".join(kept))
+        report.hyphenations_joined += joined
+        cleaned_pages.append(_BLANK_LINES.sub("\n\n", text).strip())
+
+    report.chars_after = sum(len(page) for page in cleaned_pages) + max(len(cleaned_pages) - 1, 0)
+    report.tokens_after = sum(estimate_tokens(page) for page in cleaned_pages)
+    return cleaned_pages, report
+
+
+def normalize_pages(pages: List[str]) -> Tuple[str, NormalizationReport]:
+    """
+    Normalize the text of each PDF page and join them into one document
+
+    Args:
+        pages: Raw text of each page as returned by pypdf
+
+    Returns:
+        Tuple of (normalized text, NormalizationReport)
+    """
+    cleaned_pages, report = normalize_page_texts(pages)
+    text = "\n".join(page for page in cleaned_pages if page)
+    report.chars_after = len(text)
+    return text, report
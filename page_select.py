@@ -0,0 +1,263 @@
+"""
+Relevance-Guided Page Selection
+Decides which pages of a large regulatory submission are worth extracting,
+using the PDF outline when present and a cheap heading scan otherwise
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# Documents shorter than this are always extracted in full
+MIN_PAGES_FOR_SELECTION = 30
+
+# Characters read from the top of a page during the heading scan
+HEADING_CHARS = 160
+
+# Sections covering product description, clinical phase and safety
+RELEVANT_SECTIONS = re.compile(
+    r"product|description|summary|overview|introduction|clinical|phase|trial|stud(y|ies)|efficacy|"
+    r"safety|adverse|toxic|pharmacolog|risk|indication|mechanism|molecule|investigational|"
+    r"drug substance|conclusion",
+    re.IGNORECASE,
+)
+
+# Sections that never feed the extracted fields (checked first, they are more specific)
+IRRELEVANT_SECTIONS = re.compile(
+    r"manufactur|\bcmc\b|stability|packag|label(l)?ing|references|bibliograph|appendi(x|ces)|"
+    r"financial|case report form|curriculum vitae|table of contents|\bindex\b|administrative|"
+    r"certification|environmental assessment|patent information|batch records?|quality control",
+    re.IGNORECASE,
+)
+
+
+class PageSelection(BaseModel):
+    """Pages chosen for full extraction"""
+    total_pages: int
+    selected: List[int] = Field(description="Zero-based indexes of pages to extract")
+    method: str = Field(description="all, outline or headings")
+    sections: List[str] = Field(default_factory=list, description="Section titles that were kept")
+
+    @property
+    def skipped(self) -> int:
+        return self.total_pages - len(self.selected)
+
+
+# A heading is at most this long; longer lines are body text
+HEADING_MAX_WORDS = 10
+
+# Section numbering in front of a heading ("5.3", "IV.", "B.")
+_NUMBERING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVX]+\.|[A-Z]\.)\s+")
+# Sentence punctuation: a heading never ends in ".", "," or ";", nor holds a sentence break
+_SENTENCE_PUNCTUATION = re.compile(r"[.,;]$|[.!?]\s")
+# Short words left lower-case in title-case headings
+_MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "vs", "with"}
+
+# Literal strings shown by Tj/TJ operators in a decoded content stream
+_RAW_TEXT = re.compile(rb"\(((?:[^()\\]|\\.)*)\)\s*(?:Tj|'|\")|\[((?:[^\]\\]|\\.)*)\]\s*TJ")
+_RAW_TJ_PART = re.compile(rb"\(((?:[^()\\]|\\.)*)\)")
+_RAW_LINE_BREAK = re.compile(rb"T\*|Td|TD|'")
+
+# Bytes of the content stream inspected by the raw heading scan
+RAW_SCAN_BYTES = 4096
+
+
+class _StopScan(Exception):
+    """Raised from the pypdf visitor once enough heading text has been read"""
+
+
+def classify_heading(title: str) -> Optional[bool]:
+    """
+    Classify a section title
+
+    Returns:
+        True if relevant, False if irrelevant, None if the title says nothing either way
+    """
+    if IRRELEVANT_SECTIONS.search(title):
+        return False
+    if RELEVANT_SECTIONS.search(title):
+        return True
+    return None
+
+
+def looks_like_heading(line: str) -> bool:
+    """
+    Whether a page's opening line is a section heading rather than body text
+
+    Headings are short, numbered or in title/upper case, and carry no sentence
+    punctuation; a continuation page opening mid-paragraph ("Stability of
+    response was maintained ...") is not one.
+    """
+    line = line.strip()
+    numbered = _NUMBERING.match(line)
+    title = line[numbered.end():] if numbered else line
+    words = title.split()
+    if not words or len(words) > HEADING_MAX_WORDS or _SENTENCE_PUNCTUATION.search(title):
+        return False
+    if numbered:
+        return True
+    return all(word[0].isupper() or not word[0].isalpha() or word.lower() in _MINOR_WORDS for word in words)
+
+
+def outline_sections(reader) -> List[Tuple[int, str, Optional[bool]]]:
+    """
+    Flatten the PDF outline into (start page, title, relevance) entries
+
+    Untitled or neutral children inherit the relevance of their parent bookmark.
+    """
+    entries = []
+
+    def walk(items, parent_relevance):
+        last_relevance = parent_relevance
+        for item in items:
+            if isinstance(item, list):
+                walk(item, last_relevance)
+                continue
+            try:
+                page = reader.get_destination_page_number(item)
+            except Exception:
+                continue
+            if page is None or page < 0:
+                continue
+            title = str(item.get("/Title", ""))
+            relevance = classify_heading(title)
+            if relevance is None:
+                relevance = parent_relevance
+            entries.append((page, title, relevance))
+            last_relevance = relevance
+
+    try:
+        walk(reader.outline, None)
+    except Exception:
+        return []
+    return sorted(entries, key=lambda entry: entry[0])
+
+
+def _raw_heading(page) -> str:
+    """
+    Pull the first literal strings straight out of the page content stream
+
+    Works for simple (single-byte) fonts without building pypdf's text state;
+    returns an empty string for CID fonts so the caller can fall back.
+    """
+    try:
+        contents = page.get_contents()
+        if contents is None:
+            return ""
+        data = contents.get_data()[:RAW_SCAN_BYTES]
+    except Exception:
+        return ""
+
+    lines = []
+    current = []
+    position = 0
+    for match in _RAW_TEXT.finditer(data):
+        if current and _RAW_LINE_BREAK.search(data, position, match.start()):
+            lines.append(b"".join(current))
+            current = []
+        if match.group(1) is not None:
+            current.append(match.group(1))
+        else:
+            current.extend(_RAW_TJ_PART.findall(match.group(2)))
+        position = match.end()
+        if sum(len(line) for line in lines) >= HEADING_CHARS:
+            break
+    if current:
+        lines.append(b"".join(current))
+
+    text = "\n".join(line.decode("latin-1").replace("\\(", "(").replace("\\)", ")") for line in lines)
+    letters = sum(ch.isalpha() for ch in text)
+    return text[:HEADING_CHARS] if letters >= len(text) * 0.5 else ""
+
+
+def scan_heading(page) -> str:
+    """
+    Read only the first few lines of a page
+
+    Tries the raw content-stream scan first; otherwise pypdf's text visitor is
+    aborted once HEADING_CHARS characters have been collected, since pypdf has
+    no partial extraction.
+    """
+    raw = _raw_heading(page)
+    if raw:
+        return raw
+
+    pieces = []
+    collected = 0
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        nonlocal collected
+        pieces.append(text)
+        collected += len(text)
+        if collected >= HEADING_CHARS:
+            raise _StopScan()
+
+    try:
+        page.extract_text(visitor_text=visitor)
+    except _StopScan:
+        pass
+    except Exception:
+        return ""
+    return "".join(pieces)[:HEADING_CHARS]
+
+
+def _select(relevance_by_page: List[Optional[bool]]) -> List[int]:
+    """Keep relevant pages and pages whose section is unknown"""
+    return [index for index, relevance in enumerate(relevance_by_page) if relevance is not False]
+
+
+def select_from_outline(reader, entries) -> PageSelection:
+    total = len(reader.pages)
+    relevance_by_page = [None] * total
+    sections = []
+    for position, (start, title, relevance) in enumerate(entries):
+        end = entries[position + 1][0] if position + 1 < len(entries) else total
+        for page in range(start, max(end, start + 1)):
+            if page < total:
+                relevance_by_page[page] = relevance
+        if relevance is not False:
+            sections.append(title)
+    return PageSelection(total_pages=total, selected=_select(relevance_by_page), method="outline", sections=sections)
+
+
+def select_from_headings(reader) -> PageSelection:
+    total = len(reader.pages)
+    relevance_by_page = []
+    sections = []
+    current = None
+    for page in reader.pages:
+        # A heading keeps applying to the following pages until the next one appears;
+        # body text at the top of a continuation page leaves the current section in place
+        for line in scan_heading(page).splitlines()[:2]:
+            if not looks_like_heading(line):
+                continue
+            relevance = classify_heading(line)
+            if relevance is not None:
+                current = relevance
+                if relevance and line.strip() not in sections:
+                    sections.append(line.strip())
+                break
+        relevance_by_page.append(current)
+    return PageSelection(total_pages=total, selected=_select(relevance_by_page), method="headings", sections=sections)
+
+
+def select_relevant_pages(reader, min_pages: int = MIN_PAGES_FOR_SELECTION) -> PageSelection:
+    """
+    Choose which pages of a PDF to extract in full
+
+    Args:
+        reader: pypdf PdfReader
+        min_pages: Documents with fewer pages are kept whole
+
+    Returns:
+        PageSelection with the pages to extract
+    """
+    total = len(reader.pages)
+    if total < min_pages:
+        return PageSelection(total_pages=total, selected=list(range(total)), method="all")
+
+    entries = outline_sections(reader)
+    if entries:
+        return select_from_outline(reader, entries)
+    return select_from_headings(reader)
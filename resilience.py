@@ -0,0 +1,355 @@
+"""
+Call Resilience Policies
+Latency hedging for Groq calls (a duplicate request is sent when a call runs
+past a percentile of recent latencies, and the first valid response wins) and
+a circuit breaker that fails fast while the provider is down or slow
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, List, Optional, Tuple
+
+# Percentile of recent latencies after which a call is hedged
+DEFAULT_HEDGE_PERCENTILE = 0.95
+
+# Hedge delay used until enough latencies have been observed
+INITIAL_HEDGE_DELAY = 8.0
+
+# Never hedge sooner than this, whatever the recent latencies
+MIN_HEDGE_DELAY = 0.5
+
+# Latencies observed before the adaptive delay replaces the initial one
+MIN_LATENCY_SAMPLES = 10
+
+# Recent latencies kept for the percentile
+LATENCY_WINDOW = 200
+
+# At most this fraction of calls may be hedged (caps the extra spend)
+DEFAULT_MAX_HEDGE_RATIO = 0.1
+
+# Consecutive failed or slow calls that open the circuit
+DEFAULT_FAILURE_THRESHOLD = 3
+
+# A call slower than this counts as a failure even if it succeeds
+DEFAULT_SLOW_CALL_SECONDS = 20.0
+
+# Seconds the circuit stays open before one trial call is let through
+DEFAULT_RESET_SECONDS = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+# Client errors meaning the provider could not be reached or did not answer in time
+# (groq/httpx names, matched by name so this module does not import the client)
+CONNECTION_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout", "WriteTimeout",
+    "PoolTimeout", "TimeoutException", "RemoteProtocolError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    True for errors that show the provider is down or slow: connection errors,
+    timeouts and 5xx responses. Other responses (400 validation errors, 429 rate
+    limits) and local errors (budget, parsing) say nothing about its health.
+    """
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in CONNECTION_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class HedgePolicy:
+    """
+    Adaptive request hedging
+
+    A call that has not returned after the chosen percentile of recent
+    latencies gets a duplicate. Whichever finishes first with a valid result
+    wins. A request already on the wire cannot be aborted, so the loser's
+    response is discarded when it arrives and its tokens are reported to
+    on_discard. Hedges are capped at
+    max_hedge_ratio of all calls.
+
+    Every attempt gets its own thread, so however many workers share the
+    policy a call is sent as soon as it is made, and its hedge timer and
+    latency start when it is actually running.
+    """
+
+    def __init__(self, percentile: float = DEFAULT_HEDGE_PERCENTILE,
+                 max_hedge_ratio: float = DEFAULT_MAX_HEDGE_RATIO,
+                 initial_delay: float = INITIAL_HEDGE_DELAY):
+        if not 0.0 < percentile < 1.0:
+            raise ValueError("percentile must be between 0 and 1")
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.initial_delay = initial_delay
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.saved_seconds = 0.0
+        self.extra_tokens = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["HedgePolicy"]:
+        """Policy configured by DILIGENCE_HEDGE_PERCENTILE (hedging is off when unset)"""
+        percentile = os.getenv("DILIGENCE_HEDGE_PERCENTILE")
+        if not percentile:
+            return None
+        ratio = float(os.getenv("DILIGENCE_MAX_HEDGE_RATIO", DEFAULT_MAX_HEDGE_RATIO))
+        return cls(percentile=float(percentile), max_hedge_ratio=ratio)
+
+    def delay(self) -> float:
+        """Seconds to wait for a call before hedging it"""
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        index = min(int(self.percentile * len(ordered)), len(ordered) - 1)
+        return max(ordered[index], MIN_HEDGE_DELAY)
+
+    def _observe(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    @staticmethod
+    def _start(call: Callable[[], Any]) -> Tuple[Future, List[float]]:
+        """
+        Run call on a new thread
+
+        Returns:
+            Tuple of (future of the result, list that receives the monotonic time the call began)
+        """
+        future: Future = Future()
+        began: List[float] = []
+
+        def attempt():
+            if not future.set_running_or_notify_cancel():
+                return
+            began.append(time.monotonic())
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=attempt, name="diligence-hedge", daemon=True).start()
+        return future, began
+
+    def _reserve_hedge(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.max_hedge_ratio * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def run(self, call: Callable[[], Any], allow_hedge: bool = True,
+            on_discard: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Run call, hedging it if it is slow
+
+        Args:
+            call: The request; raising marks its result invalid
+            allow_hedge: False when the caller cannot afford a duplicate (e.g. run budget)
+            on_discard: Receives the loser's result when it eventually arrives
+
+        Returns:
+            The first valid result
+        """
+        with self._lock:
+            self.calls += 1
+        # Nothing queues ahead of the attempt, so the hedge timer runs from when the request is sent
+        primary, began = self._start(call)
+        done, _ = wait([primary], timeout=self.delay())
+        started = began[0] if began else time.monotonic()
+        if done or not allow_hedge or not self._reserve_hedge():
+            result = primary.result()
+            self._observe(time.monotonic() - started)
+            return result
+
+        hedge, _ = self._start(call)
+        pending = {primary, hedge}
+        winner: Optional[Future] = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+        if winner is None:
+            raise primary.exception()
+
+        won_at = time.monotonic() - started
+        self._observe(won_at)
+        loser = hedge if winner is primary else primary
+        if winner is hedge:
+            with self._lock:
+                self.hedge_wins += 1
+
+        def settle(future: Future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            if loser is primary:
+                # The primary's real latency shows how long the hedge saved us
+                with self._lock:
+                    self.saved_seconds += max(time.monotonic() - started - won_at, 0.0)
+            if on_discard is not None:
+                on_discard(future.result())
+
+        loser.add_done_callback(settle)
+        return winner.result()
+
+    def record_extra_tokens(self, tokens: int):
+        with self._lock:
+            self.extra_tokens += tokens
+
+    def metrics(self) -> dict:
+        with self._lock:
+            calls, hedged = self.calls, self.hedged
+            metrics = {
+                "calls": calls,
+                "hedged": hedged,
+                "hedge_rate": hedged / calls if calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "saved_seconds": round(self.saved_seconds, 2),
+                "extra_tokens": self.extra_tokens,
+            }
+        metrics["hedge_delay"] = round(self.delay(), 2)
+        return metrics
+
+    def summary(self) -> str:
+        m = self.metrics()
+        return (
+            f"{m['hedged']} of {m['calls']} calls hedged ({m['hedge_rate']:.0%}), {m['hedge_wins']} won by the hedge, "
+            f"~{m['saved_seconds']:.1f}s saved, ~{m['extra_tokens']:,} extra tokens, hedging after {m['hedge_delay']:.2f}s"
+        )
+
+
+class CircuitBreaker:
+    """
+    Fail-fast guard around provider calls
+
+    failure_threshold consecutive provider failures (see is_provider_failure)
+    or slow calls open the circuit; other errors pass through uncounted. While
+    open, calls raise CircuitOpenError at once instead of waiting out the client
+    timeout. After reset_seconds a single trial call is let through (half-open):
+    success closes the circuit, failure opens it again. The failure that trips
+    the circuit is also raised as CircuitOpenError, so callers fall back from
+    that call onwards.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS,
+                 reset_seconds: float = DEFAULT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        """Breaker configured by the DILIGENCE_BREAKER_* variables"""
+        return cls(
+            failure_threshold=int(os.getenv("DILIGENCE_BREAKER_FAILURES", DEFAULT_FAILURE_THRESHOLD)),
+            slow_call_seconds=float(os.getenv("DILIGENCE_BREAKER_SLOW_SECONDS", DEFAULT_SLOW_CALL_SECONDS)),
+            reset_seconds=float(os.getenv("DILIGENCE_BREAKER_RESET_SECONDS", DEFAULT_RESET_SECONDS)),
+        )
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call (0 when calls are allowed)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self._opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def _admit(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Provider unavailable ({self.last_error}), retrying in {self.retry_in():.0f}s")
+
+    def _release(self):
+        """End a call that says nothing about the provider's health, leaving the state as it is"""
+        with self._lock:
+            self._trial_running = False
+
+    def _record(self, failure: Optional[str]) -> bool:
+        """Record a call outcome; True if it opened the circuit"""
+        with self._lock:
+            trial = self.state == HALF_OPEN
+            self._trial_running = False
+            if failure is None:
+                self.state = CLOSED
+                self.failures = 0
+                return False
+            self.failures += 1
+            self.last_error = failure
+            if trial or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                return True
+            return False
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn through the breaker
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or this call's provider failure opened it
+        """
+        self._admit()
+        started = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_provider_failure(e):
+                self._release()
+                raise
+            if self._record(f"{type(e).__name__}: {e}"):
+                raise CircuitOpenError(f"Provider unavailable ({type(e).__name__}: {e})") from e
+            raise
+        elapsed = time.monotonic() - started
+        self._record(f"call took {elapsed:.0f}s" if elapsed > self.slow_call_seconds else None)
+        return result
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "trips": self.trips, "rejected": self.rejected}
+
+
+_provider_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def provider_breaker() -> CircuitBreaker:
+    """
+    Breaker shared by every engine in the process, so an outage seen by one
+    session fails fast for all of them; configured from the environment on first use
+    """
+    global _provider_breaker
+    with _breaker_lock:
+        if _provider_breaker is None:
+            _provider_breaker = CircuitBreaker.from_env()
+        return _provider_breaker
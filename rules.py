@@ -0,0 +1,213 @@
+"""
+Tier-0 Rule-Based Extractor
+Precompiled patterns and lexicons that resolve regularly-phrased fields
+(clinical phase, molecule type, drug code) before any LLM call
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from clustering import find_entities
+
+# Minimum confidence for a local match to replace the LLM for that field
+HIGH_CONFIDENCE = 0.85
+
+FIELDS = ["drug_name", "molecule_type", "clinical_phase", "primary_toxicity_finding"]
+
+_ROMAN = {"i": "1", "ii": "2", "iii": "3", "iv": "4"}
+
+PHASE = re.compile(
+    r"\bphase\s*:?\s*(iv|i{1,3}|[1-4])\s*([ab])?(?:\s*(?:/|-|and)\s*(?:phase\s*)?(iv|i{1,3}|[1-4])\s*([ab])?)?\b",
+    re.IGNORECASE,
+)
+STAGE = re.compile(r"\b(pre-?clinical|ind-enabling|fda[- ]approved|approved by the fda|marketed)\b", re.IGNORECASE)
+
+# A phase preceded by these words is a plan, not the current stage ("on track for Phase 3")
+FUTURE_CONTEXT = re.compile(
+    r"(\bfor|\bto|\binto|\btoward|\btowards|\bplann(ed|ing)|\bprepar(e|ing)|\benter(ing)?|\binitiate|\bnext)\W+(\w+\W+){0,2}$",
+    re.IGNORECASE,
+)
+
+# Molecule classes, most specific first; each pattern maps to a normalized label
+MOLECULE_LEXICON = [
+    (r"antibody[- ]drug conjugate|\bADCs?\b", "Antibody-drug conjugate"),
+    (r"bispecific antibod(y|ies)", "Bispecific antibody"),
+    (r"(monoclonal|humani[sz]ed|fully human) antibod(y|ies)|\bmAbs?\b", "Monoclonal antibody"),
+    (r"small[- ]molecule", "Small molecule"),
+    (r"\bsiRNA\b|small interfering RNA", "siRNA"),
+    (r"antisense oligonucleotide|\bASO\b", "Antisense oligonucleotide"),
+    (r"\bmRNA\b", "mRNA"),
+    (r"gene therapy|\bAAV\b", "Gene therapy"),
+    (r"CAR[- ]?T|cell therapy", "Cell therapy"),
+    (r"fusion protein", "Fusion protein"),
+    (r"\bpeptide\b", "Peptide"),
+    (r"\bvaccine\b", "Vaccine"),
+]
+_MOLECULE_PATTERNS = [(re.compile(pattern, re.IGNORECASE), label) for pattern, label in MOLECULE_LEXICON]
+
+# INN stems that imply a molecule class
+_INN_CLASS = [
+    (re.compile(r"\b[a-z]{3,}mab\b", re.IGNORECASE), "Monoclonal antibody"),
+    (re.compile(r"\b[a-z]{3,}(tinib|nib|ciclib|parib|lisib)\b", re.IGNORECASE), "Small molecule"),
+]
+
+# Sentence end: ".", "!" or "?" before a space, so decimals ("4.5%") and abbreviations ("vs.", "e.g.") do not cut it
+SENTENCE_END = r"(?<!\bvs)(?<!\bal)(?<!\bapprox)(?<!\bfig)(?<!\bno)(?<!\b[a-z]\.[a-z])(?:[.!?](?=\s|$)|$)"
+
+# "Safety findings: ..." style statements, up to the end of the sentence
+SAFETY_LABEL = re.compile(
+    rf"\b(safety findings?|toxicity|adverse events?|safety profile)\s*:\s*(?P<finding>.+?{SENTENCE_END})",
+    re.IGNORECASE,
+)
+SAFETY_TERMS = re.compile(
+    r"toxicit|adverse event|serious adverse|\bSAEs?\b|hepatotox|cardiotox|neutropenia|thrombocytopenia|"
+    r"infusion[- ]related|injection site|grade [1-5]|dose[- ]limiting|well[- ]tolerated|safety profile",
+    re.IGNORECASE,
+)
+_SENTENCE = re.compile(rf"\S.*?{SENTENCE_END}")
+_CUT_AT_NUMBER = re.compile(r"\d\.$")
+
+
+class RuleMatch(BaseModel):
+    """A field value found by the rule extractor"""
+    value: str
+    confidence: float = Field(ge=0.0, le=1.0)
+    evidence: str = Field(description="Text that triggered the match")
+
+
+class RuleExtraction(BaseModel):
+    """Local matches for each AgentResponse field"""
+    drug_name: Optional[RuleMatch] = None
+    molecule_type: Optional[RuleMatch] = None
+    clinical_phase: Optional[RuleMatch] = None
+    primary_toxicity_finding: Optional[RuleMatch] = None
+
+    def resolved(self, min_confidence: float = HIGH_CONFIDENCE) -> Dict[str, str]:
+        """Fields matched with at least min_confidence, as field -> value"""
+        resolved = {}
+        for field in FIELDS:
+            match = getattr(self, field)
+            if match is not None and match.confidence >= min_confidence:
+                resolved[field] = match.value
+        return resolved
+
+    @property
+    def complete(self) -> bool:
+        return len(self.resolved()) == len(FIELDS)
+
+
+def _normalize_phase(match) -> str:
+    first, first_sub, second, second_sub = match.groups()
+    label = f"Phase {_ROMAN.get(first.lower(), first)}{(first_sub or '').lower()}"
+    if second:
+        label += f"/{_ROMAN.get(second.lower(), second)}{(second_sub or '').lower()}"
+    return label
+
+
+def _normalize_stage(text: str) -> str:
+    text = text.lower()
+    if "clinical" in text or "ind" in text:
+        return "Preclinical"
+    return "Approved"
+
+
+def extract_phase(text: str) -> Optional[RuleMatch]:
+    """Current clinical phase; plans ("advancing to Phase 3") are ignored"""
+    mentions = Counter()
+    evidence = {}
+    for pattern, normalize in ((PHASE, _normalize_phase), (STAGE, lambda m: _normalize_stage(m.group(0)))):
+        for match in pattern.finditer(text):
+            if FUTURE_CONTEXT.search(text[max(0, match.start() - 40):match.start()]):
+                continue
+            label = normalize(match)
+            mentions[label] += 1
+            evidence.setdefault(label, match.group(0).strip())
+    if not mentions:
+        return None
+    label, _ = mentions.most_common(1)[0]
+    confidence = 0.95 if len(mentions) == 1 else 0.5
+    return RuleMatch(value=label, confidence=confidence, evidence=evidence[label])
+
+
+def extract_molecule_type(text: str) -> Optional[RuleMatch]:
+    """Molecule class from the lexicon, falling back to INN stems"""
+    found = {}
+    for pattern, label in _MOLECULE_PATTERNS:
+        match = pattern.search(text)
+        if match and label not in found:
+            found[label] = match.group(0)
+    # An ADC or bispecific is also described as an antibody; keep the specific class
+    if "Monoclonal antibody" in found and ({"Antibody-drug conjugate", "Bispecific antibody"} & found.keys()):
+        del found["Monoclonal antibody"]
+    if len(found) == 1:
+        label, evidence = next(iter(found.items()))
+        return RuleMatch(value=label, confidence=0.9, evidence=evidence)
+    if found:
+        label, evidence = next(iter(found.items()))
+        return RuleMatch(value=label, confidence=0.5, evidence=evidence)
+
+    for pattern, label in _INN_CLASS:
+        match = pattern.search(text)
+        if match:
+            return RuleMatch(value=label, confidence=0.8, evidence=match.group(0))
+    return None
+
+
+def extract_drug_name(text: str) -> Optional[RuleMatch]:
+    """Most-mentioned drug code or INN name"""
+    entities = find_entities("", text)
+    asset = entities.primary_asset
+    if asset is None:
+        return None
+    confidence = 0.9 if len(entities.assets) == 1 else 0.6
+    return RuleMatch(value=asset, confidence=confidence, evidence=asset)
+
+
+def extract_toxicity(text: str) -> Optional[RuleMatch]:
+    """
+    Primary toxicity finding
+
+    Only an explicitly labelled statement ("Safety findings: ...") is trusted;
+    free-text safety sentences are returned at low confidence for the LLM to judge.
+    """
+    text = " ".join(text.split())
+    labelled = [match.group("finding").strip() for match in SAFETY_LABEL.finditer(text)]
+    labelled = [finding for finding in labelled if len(finding) > 10]
+    if len(labelled) == 1:
+        # A finding ending in "4." may still be cut at a number ("4. 5%" in spaced-out PDF text)
+        confidence = 0.5 if _CUT_AT_NUMBER.search(labelled[0]) else 0.9
+        return RuleMatch(value=labelled[0], confidence=confidence, evidence=labelled[0])
+
+    sentences = [sentence.strip() for sentence in _SENTENCE.findall(text) if SAFETY_TERMS.search(sentence)]
+    if not sentences:
+        return None
+    return RuleMatch(value=" ".join(sentences[:2]), confidence=0.5, evidence=sentences[0])
+
+
+def extract_rules(text: str) -> RuleExtraction:
+    """
+    Run every rule over a document
+
+    Args:
+        text: Document text
+
+    Returns:
+        RuleExtraction with a match (and confidence) per field that could be found
+    """
+    return RuleExtraction(
+        drug_name=extract_drug_name(text),
+        molecule_type=extract_molecule_type(text),
+        clinical_phase=extract_phase(text),
+        primary_toxicity_finding=extract_toxicity(text),
+    )
+
+
+def describe(extraction: RuleExtraction, fields: List[str]) -> str:
+    """Reasoning text for fields resolved locally"""
+    return "; ".join(
+        f"{field}: '{getattr(extraction, field).evidence}' ({getattr(extraction, field).confidence:.0%})"
+        for field in fields
+    )
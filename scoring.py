@@ -0,0 +1,209 @@
+"""
+Local Conflict Scoring
+Agreement-based confidence and a structured conflict list computed across any
+number of extractions, without an LLM call
+
+Each field value is normalized to a small set of tokens (canonical phase
+numbers, molecule class and family, drug code, content words), and every field
+gets an N x N Jaccard similarity matrix from one binary incidence product.
+"""
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from clustering import find_entities
+from rules import FIELDS, extract_molecule_type, extract_phase
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Weight of each field in the overall confidence
+FIELD_WEIGHTS = {
+    "drug_name": 0.3,
+    "clinical_phase": 0.3,
+    "molecule_type": 0.2,
+    "primary_toxicity_finding": 0.2,
+}
+
+# A pair of sources below this similarity on a field is a conflict
+CONFLICT_THRESHOLD = {
+    "drug_name": 0.5,
+    "clinical_phase": 0.5,
+    "molecule_type": 0.5,
+    "primary_toxicity_finding": 0.25,
+}
+
+# Agreement credited to a field stated by only one source (nothing to compare against)
+UNCORROBORATED_AGREEMENT = 0.5
+
+_MISSING = re.compile(
+    r"^\s*(none|null|n/?a|unknown|unclear|not (stated|specified|mentioned|reported|available|found))\s*\.?\s*$",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[a-z0-9]+")
+_PHASE_NUMBER = re.compile(r"\d")
+_STOP_WORDS = {
+    "a", "an", "and", "as", "at", "by", "for", "in", "is", "of", "on", "or", "the", "to", "was", "were", "with",
+    "patients", "patient", "observed", "reported", "study", "trial",
+}
+
+_MOLECULE_FAMILY = {
+    "Antibody-drug conjugate": "biologic antibody",
+    "Bispecific antibody": "biologic antibody",
+    "Monoclonal antibody": "biologic antibody",
+    "Fusion protein": "biologic protein",
+    "Peptide": "biologic protein",
+    "siRNA": "oligonucleotide",
+    "Antisense oligonucleotide": "oligonucleotide",
+    "mRNA": "nucleic acid",
+    "Gene therapy": "nucleic acid",
+}
+
+
+def field_tokens(field: str, value: Optional[str]) -> List[str]:
+    """
+    Normalize a field value to comparable tokens
+
+    Returns:
+        Empty list when the value is missing or says nothing
+    """
+    if not value or _MISSING.match(value):
+        return []
+
+    if field == "clinical_phase":
+        match = extract_phase(value)
+        if match is None:
+            return [value.strip().lower()]
+        if match.value.startswith("Phase"):
+            return [f"phase {number}" for number in _PHASE_NUMBER.findall(match.value)]
+        return [match.value.lower()]
+
+    if field == "molecule_type":
+        match = extract_molecule_type(value)
+        if match is None:
+            return [value.strip().lower()]
+        family = _MOLECULE_FAMILY.get(match.value, match.value.lower())
+        return [match.value.lower(), f"family:{family}"]
+
+    if field == "drug_name":
+        asset = find_entities("", value).primary_asset
+        return [asset.upper()] if asset else [value.strip().upper()]
+
+    return sorted({word for word in _WORD.findall(value.lower()) if word not in _STOP_WORDS})
+
+
+def field_similarity(field: str, first: Optional[str], second: Optional[str]) -> Optional[float]:
+    """Jaccard similarity of two values of a field (None when either says nothing)"""
+    first_tokens, second_tokens = set(field_tokens(field, first)), set(field_tokens(field, second))
+    if not first_tokens or not second_tokens:
+        return None
+    return len(first_tokens & second_tokens) / len(first_tokens | second_tokens)
+
+
+def disagrees(field: str, first: Optional[str], second: Optional[str]) -> bool:
+    """True if two stated values of a field are as far apart as a conflict between sources"""
+    similarity = field_similarity(field, first, second)
+    return similarity is not None and similarity < CONFLICT_THRESHOLD[field]
+
+
+def similarity_matrix(token_sets: List[List[str]]) -> "np.ndarray":
+    """
+    Pairwise Jaccard similarity of token sets
+
+    Returns:
+        N x N matrix; rows and columns of empty sets are NaN
+    """
+    import numpy as np
+
+    vocabulary = {token: column for column, token in enumerate({t for tokens in token_sets for t in tokens})}
+    incidence = np.zeros((len(token_sets), max(len(vocabulary), 1)), dtype=np.float64)
+    for row, tokens in enumerate(token_sets):
+        incidence[row, [vocabulary[token] for token in tokens]] = 1.0
+
+    intersection = incidence @ incidence.T
+    sizes = incidence.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = intersection / union
+    empty = sizes == 0
+    similarity[empty, :] = np.nan
+    similarity[:, empty] = np.nan
+    return similarity
+
+
+class FieldConflict(BaseModel):
+    """Disagreement between sources on one field"""
+    field: str
+    values: Dict[str, str] = Field(description="Source label -> stated value")
+    agreement: float = Field(ge=0.0, le=1.0)
+
+    def describe(self) -> str:
+        stated = " vs ".join(f"'{value}' ({source})" for source, value in self.values.items())
+        return f"{self.field}: {stated}"
+
+
+class ConflictReport(BaseModel):
+    """Local agreement scores across all sources"""
+    confidence: float = Field(ge=0.0, le=1.0)
+    field_agreement: Dict[str, Optional[float]] = Field(
+        description="Mean pairwise similarity per field (None when no source states it)"
+    )
+    conflicts: List[FieldConflict] = Field(default_factory=list)
+
+    @property
+    def unanimous(self) -> bool:
+        """Every field stated by at least two sources, with no conflicts"""
+        return not self.conflicts and all(
+            agreement is not None and agreement > UNCORROBORATED_AGREEMENT
+            for agreement in self.field_agreement.values()
+        )
+
+    def describe_conflicts(self) -> List[str]:
+        return [conflict.describe() for conflict in self.conflicts]
+
+
+def score_sources(responses, labels: Optional[List[str]] = None) -> ConflictReport:
+    """
+    Score agreement between extractions of the same asset
+
+    Args:
+        responses: AgentResponse-like objects (one per source)
+        labels: Name of each source in conflict descriptions (defaults to source_type)
+
+    Returns:
+        ConflictReport with an agreement-based confidence and the conflicting fields
+    """
+    import numpy as np
+
+    labels = labels or [response.source_type for response in responses]
+    # Repeated source types still need distinct labels
+    labels = [label if labels.count(label) == 1 else f"{label} #{i}" for i, label in enumerate(labels, 1)]
+
+    field_agreement = {}
+    conflicts = []
+    weighted = 0.0
+    for field in FIELDS:
+        values = [getattr(response, field) for response in responses]
+        similarity = similarity_matrix([field_tokens(field, value) for value in values])
+        stated = np.flatnonzero(~np.isnan(np.diag(similarity)))
+
+        if len(stated) == 0:
+            field_agreement[field] = None
+            continue
+        if len(stated) == 1:
+            agreement = UNCORROBORATED_AGREEMENT
+        else:
+            pairs = similarity[np.ix_(stated, stated)][np.triu_indices(len(stated), k=1)]
+            agreement = round(float(pairs.mean()), 3)
+            if pairs.min() < CONFLICT_THRESHOLD[field]:
+                conflicts.append(FieldConflict(
+                    field=field,
+                    values={labels[i]: values[i] for i in stated},
+                    agreement=agreement,
+                ))
+        field_agreement[field] = agreement
+        weighted += FIELD_WEIGHTS[field] * agreement
+
+    return ConflictReport(confidence=round(weighted, 3), field_agreement=field_agreement, conflicts=conflicts)
@@ -0,0 +1,327 @@
+"""
+Diligence HTTP Service
+Submit/status/result API over the background job queue, so other services can
+run analyses without holding a connection open during the LLM calls
+
+    POST /analyses               Submit 2+ documents (base64 PDF or text): 202 with a job id,
+                                 429 when the queue is full (checked before the body is read;
+                                 PDFs are parsed by the job, so an unreadable one fails the job)
+    GET  /analyses/{id}          Status and latest progress (404 once a finished job is evicted;
+                                 its result stays in the results store under analysis_id)
+    GET  /analyses/{id}/result   200 with the asset when done, 202 while pending, 500 if failed;
+                                 ?wait=N long-polls for up to N seconds
+    GET  /analyses/{id}/stream   NDJSON stream of thought trace entries, then the result
+    GET  /health                 Worker pool, queue depth, provider circuit state and per-key usage
+
+Run with: python service.py --port 8000
+"""
+
+import argparse
+import base64
+import binascii
+import io
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from pydantic import BaseModel
+
+from backend import DiligenceEngine, SourceDocument, extract_pages_from_pdf, load_environment, normalize_page_texts
+from jobs import DONE, FAILED, Job, JobQueue, QueueFullError
+from store import ResultsStore, SourceRecord, source_record
+
+# Largest request body accepted (base64 PDFs included)
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+# Seconds a client may stall while sending a request before the connection is dropped
+REQUEST_TIMEOUT = 30
+
+# Longest ?wait= accepted by the result endpoint
+MAX_WAIT_SECONDS = 30
+
+# Retry-After sent with 202 and 429 responses
+RETRY_AFTER_SECONDS = 5
+
+# Interval between job checks while long-polling or streaming
+POLL_SECONDS = 0.25
+
+
+class SubmittedDocument(BaseModel):
+    """One document of a submission: decoded, but not parsed yet"""
+    source_type: str
+    doc_id: Optional[str] = None
+    pdf: Optional[bytes] = None
+    text: Optional[str] = None
+
+
+def read_submission(payload: dict) -> List[SubmittedDocument]:
+    """
+    Validate a submission body and decode its PDFs, without parsing them
+
+    Args:
+        payload: {"documents": [{"source_type", "doc_id"?, "pdf_base64" | "text"}, ...],
+                  "relevant_only"?: bool}
+
+    The body may also carry "timeout" and "deadline" (seconds), read by the handler.
+
+    Returns:
+        The submitted documents
+
+    Raises:
+        ValueError: If the body is malformed or a PDF is not valid base64
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    items = payload.get("documents")
+    if not isinstance(items, list) or len(items) < 2:
+        raise ValueError("'documents' must list at least two sources")
+
+    submitted = []
+    for i, item in enumerate(items, 1):
+        if not isinstance(item, dict) or not item.get("source_type"):
+            raise ValueError(f"Document {i} needs a 'source_type'")
+        document = SubmittedDocument(source_type=item["source_type"], doc_id=item.get("doc_id"))
+        if item.get("pdf_base64"):
+            try:
+                document.pdf = base64.b64decode(item["pdf_base64"], validate=True)
+            except binascii.Error as e:
+                raise ValueError(f"Document {i}: {e}")
+        elif item.get("text"):
+            document.text = item["text"]
+        else:
+            raise ValueError(f"Document {i} needs 'pdf_base64' or 'text'")
+        submitted.append(document)
+    return submitted
+
+
+def load_documents(submitted: List[SubmittedDocument],
+                   relevant_only: bool = False) -> Tuple[List[SourceDocument], List[SourceRecord]]:
+    """
+    Parse and normalize submitted PDFs (run by the job, off the request thread)
+
+    Returns:
+        Tuple of (documents, their fingerprints)
+
+    Raises:
+        ValueError: If a PDF cannot be read
+    """
+    documents, sources = [], []
+    for i, item in enumerate(submitted, 1):
+        if item.pdf is not None:
+            try:
+                pages = extract_pages_from_pdf(io.BytesIO(item.pdf), relevant_only=relevant_only)
+            except RuntimeError as e:
+                raise ValueError(f"Document {i}: {e}")
+            content, _ = normalize_page_texts(pages)
+        else:
+            content = item.text
+        documents.append(SourceDocument(content=content, source_type=item.source_type, doc_id=item.doc_id))
+        sources.append(source_record(content, item.source_type, item.doc_id))
+    return documents, sources
+
+
+def job_status(job: Job) -> dict:
+    """Public view of a job, without its result"""
+    return {
+        "job_id": job.id,
+        "label": job.label,
+        "status": job.status,
+        "created_at": job.created_at,
+        "elapsed_seconds": round(job.elapsed, 2) if job.elapsed is not None else None,
+        "steps": job.steps,
+        "progress": job.progress,
+        "error": job.error,
+    }
+
+
+class DiligenceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's job queue"""
+    protocol_version = "HTTP/1.1"
+    timeout = REQUEST_TIMEOUT
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str, headers: Optional[dict] = None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _job(self, job_id: str) -> Optional[Job]:
+        job = self.server.queue.get(job_id)
+        if job is None:
+            self._error(404, f"Unknown analysis {job_id}")
+        return job
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/analyses":
+            return self._error(404, "Not found")
+
+        queue = self.server.queue
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # The body cannot be delimited, so the connection cannot be reused either
+            self.close_connection = True
+            return self._error(400, "Invalid Content-Length header")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._error(413, f"Request body over {MAX_BODY_BYTES // (1024 * 1024)} MB")
+        if queue.full():
+            # Shed load before reading the body (the unread body rules out keep-alive)
+            self.close_connection = True
+            return self._error(429, f"{queue.max_pending} analyses already pending, retry later",
+                               {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            submitted = read_submission(payload)
+            relevant_only = bool(payload.get("relevant_only", False))
+            timeout = payload.get("timeout")
+            timeout = min(float(timeout), queue.timeout) if timeout else None
+            deadline = float(payload["deadline"]) if payload.get("deadline") else None
+        except (ValueError, TypeError) as e:
+            return self._error(400, str(e))
+
+        label = " vs ".join(document.doc_id or document.source_type for document in submitted)
+        owner = self.headers.get("X-Client-Id", "api")
+        try:
+            job = queue.submit_lazy(owner, self.server.engine, lambda: load_documents(submitted, relevant_only), label,
+                                    timeout=timeout, deadline=deadline)
+        except QueueFullError as e:
+            return self._error(429, str(e), {"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+        self._send_json(202, {
+            **job_status(job),
+            "status_url": f"/analyses/{job.id}",
+            "result_url": f"/analyses/{job.id}/result",
+            "stream_url": f"/analyses/{job.id}/stream",
+        }, {"Location": f"/analyses/{job.id}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["health"]:
+            queue, engine = self.server.queue, self.server.engine
+            key_usage = engine.key_pool.usage() if engine.key_pool is not None else []
+            return self._send_json(200, {
+                "status": "ok", "workers": queue.max_workers, "pending": queue.pending(), "max_pending": queue.max_pending,
+                "provider_circuit": engine.breaker.metrics(),
+                "api_keys": [usage.model_dump() for usage in key_usage],
+            })
+        if len(parts) < 2 or parts[0] != "analyses":
+            return self._error(404, "Not found")
+
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if len(parts) == 2:
+            return self._send_json(200, job_status(job))
+        if parts[2:] == ["result"]:
+            try:
+                wait = float(parse_qs(url.query).get("wait", ["0"])[0] or 0)
+            except ValueError:
+                return self._error(400, "'wait' must be a number of seconds")
+            return self._result(job, min(max(wait, 0.0), MAX_WAIT_SECONDS))
+        if parts[2:] == ["stream"]:
+            return self._stream(job)
+        self._error(404, "Not found")
+
+    def _result(self, job: Job, wait: float):
+        deadline = time.time() + wait
+        while job.active and time.time() < deadline:
+            time.sleep(POLL_SECONDS)
+            job = self.server.queue.get(job.id)
+            if job is None:
+                return self._error(404, "Analysis evicted from memory; its result is in the results store")
+
+        if job.status == DONE:
+            return self._send_json(200, {
+                **job_status(job), "analysis_id": job.analysis_id, "result": job.result.model_dump(),
+                "thought_trace": job.thought_trace,
+            })
+        if job.status == FAILED:
+            return self._send_json(500, {**job_status(job), "thought_trace": job.thought_trace})
+        self._send_json(202, job_status(job), {"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    def _write_chunk(self, event: dict):
+        data = (json.dumps(event) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, job: Job):
+        """Send thought trace entries as they happen, then the outcome, as chunked NDJSON"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        sent = 0
+        try:
+            self._write_chunk({"event": "status", **job_status(job)})
+            while True:
+                for entry in job.thought_trace[sent:]:
+                    self._write_chunk({"event": "thought", "entry": entry})
+                sent = len(job.thought_trace)
+                if not job.active:
+                    break
+                time.sleep(POLL_SECONDS)
+                job = self.server.queue.get(job.id)
+                if job is None:
+                    break
+
+            if job is not None and job.status == DONE:
+                self._write_chunk({"event": "result", "analysis_id": job.analysis_id, "result": job.result.model_dump()})
+            else:
+                self._write_chunk({"event": "error", "error": job.error if job else "Analysis evicted from memory"})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class DiligenceServer(ThreadingHTTPServer):
+    """HTTP server holding the engine and job queue shared by all requests"""
+    daemon_threads = True
+
+    def __init__(self, address, engine: DiligenceEngine, queue: JobQueue):
+        super().__init__(address, DiligenceHandler)
+        self.engine = engine
+        self.queue = queue
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8000, engine: Optional[DiligenceEngine] = None,
+                  queue: Optional[JobQueue] = None) -> DiligenceServer:
+    """Build the service; the engine and queue default to ones configured from the environment"""
+    load_environment()
+    engine = engine or DiligenceEngine()
+    queue = queue or JobQueue(ResultsStore())
+    return DiligenceServer((host, port), engine, queue)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diligence-Zero HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port)
+    print(f"🧬 Diligence service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Results Store
+Local SQLite history of every reconciled asset profile with its source hashes,
+thought trace and run metrics, so past analyses can be reloaded without
+re-running the pipeline
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from backend import ScientificAsset
+from cache import content_hash
+
+DEFAULT_DB_PATH = ".diligence_results.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    drug_name TEXT NOT NULL,
+    clinical_phase TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    source_key TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    trace TEXT NOT NULL,
+    metrics TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_drug ON analyses (drug_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_analyses_phase ON analyses (clinical_phase);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_confidence ON analyses (confidence);
+CREATE INDEX IF NOT EXISTS idx_analyses_sources ON analyses (source_key);
+"""
+
+
+class SourceRecord(BaseModel):
+    """Fingerprint of one analyzed document"""
+    source_type: str
+    sha: str = Field(description="SHA-256 of the document text")
+    doc_id: Optional[str] = None
+
+
+def source_record(content, source_type: str, doc_id: Optional[str] = None) -> SourceRecord:
+    """Fingerprint a document given as text or as a list of page texts"""
+    text = content if isinstance(content, str) else "\n".join(content)
+    return SourceRecord(source_type=source_type, sha=content_hash(text), doc_id=doc_id)
+
+
+def sources_key(sources: List[SourceRecord]) -> str:
+    """Identity of an analysis input: the same documents in the same roles"""
+    return content_hash(*(f"{source.source_type}:{source.sha}" for source in sources))
+
+
+class AnalysisSummary(BaseModel):
+    """One row of the history listing"""
+    id: int
+    created_at: str
+    drug_name: str
+    clinical_phase: str
+    confidence: float
+
+
+class StoredAnalysis(AnalysisSummary):
+    """A complete stored analysis"""
+    asset: ScientificAsset
+    sources: List[SourceRecord]
+    thought_trace: List[str]
+    metrics: dict = Field(default_factory=dict)
+
+
+class ResultsStore:
+    """
+    SQLite-backed history of analyses
+
+    One connection is shared across threads (Streamlit reruns, background jobs)
+    and serialized with a lock.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("DILIGENCE_RESULTS_DB", DEFAULT_DB_PATH)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def save(self, asset: ScientificAsset, sources: List[SourceRecord], thought_trace: List[str],
+             metrics: Optional[dict] = None) -> int:
+        """
+        Store a finished analysis
+
+        Returns:
+            Id of the stored analysis
+        """
+        row = (
+            datetime.now().isoformat(timespec="seconds"),
+            asset.drug_name,
+            asset.clinical_phase,
+            asset.confidence_score,
+            sources_key(sources),
+            json.dumps([source.model_dump() for source in sources]),
+            asset.model_dump_json(),
+            json.dumps(thought_trace),
+            json.dumps(metrics or {}),
+        )
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO analyses (created_at, drug_name, clinical_phase, confidence, source_key, "
+                "sources, asset, trace, metrics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+        return cursor.lastrowid
+
+    def get(self, analysis_id: int) -> Optional[StoredAnalysis]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return self._load(row) if row else None
+
+    def find_by_sources(self, sources: List[SourceRecord]) -> Optional[StoredAnalysis]:
+        """
+        Most recent full analysis of exactly these documents, if any
+
+        Degraded results and results cut short by deadline shortcuts (skipped
+        Supervisor, passage filtering, smaller model) are never reused.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM analyses WHERE source_key = ? AND COALESCE(json_extract(asset, '$.degraded'), 0) = 0 "
+                "AND COALESCE(json_array_length(asset, '$.degradations_applied'), 0) = 0 "
+                "ORDER BY id DESC LIMIT 1",
+                (sources_key(sources),),
+            ).fetchone()
+        return self._load(row) if row else None
+
+    def history(self, drug_name: Optional[str] = None, clinical_phase: Optional[str] = None,
+                min_confidence: Optional[float] = None, since: Optional[str] = None,
+                limit: int = 50) -> List[AnalysisSummary]:
+        """
+        List stored analyses, newest first
+
+        Args:
+            drug_name: Substring of the drug name (case-insensitive)
+            clinical_phase: Exact clinical phase
+            min_confidence: Lowest confidence score to include
+            since: ISO date; only analyses created on or after it
+            limit: Maximum rows returned
+        """
+        clauses, params = [], []
+        if drug_name:
+            clauses.append("drug_name LIKE ? COLLATE NOCASE")
+            params.append(f"%{drug_name}%")
+        if clinical_phase:
+            clauses.append("clinical_phase = ?")
+            params.append(clinical_phase)
+        if min_confidence is not None:
+            clauses.append("confidence >= ?")
+            params.append(min_confidence)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, created_at, drug_name, clinical_phase, confidence FROM analyses {where} "
+                "ORDER BY id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [AnalysisSummary(**dict(row)) for row in rows]
+
+    def phases(self) -> List[str]:
+        """Distinct clinical phases in the store, for filter widgets"""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT clinical_phase FROM analyses ORDER BY clinical_phase").fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _load(row) -> StoredAnalysis:
+        return StoredAnalysis(
+            id=row["id"],
+            created_at=row["created_at"],
+            drug_name=row["drug_name"],
+            clinical_phase=row["clinical_phase"],
+            confidence=row["confidence"],
+            asset=ScientificAsset.model_validate_json(row["asset"]),
+            sources=[SourceRecord(**source) for source in json.loads(row["sources"])],
+            thought_trace=json.loads(row["trace"]),
+            metrics=json.loads(row["metrics"]),
+        )
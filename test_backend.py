@@ -3,8 +3,11 @@ Backend Testing Protocol for Diligence-Zero
 Tests Groq API integration, Pydantic validation, and multi-agent reasoning
 """
 
+import json
+import re
 import sys
 import time
+from types import SimpleNamespace
 from backend import DiligenceEngine, ScientificAsset, AgentResponse
 from dotenv import load_dotenv
 import os
@@ -12,12 +15,98 @@ import os
 # Load environment variables
 load_dotenv()
 
+# Cold `import backend` measured at ~0.28s once groq, pypdf, numpy and dotenv
+# became lazy (~0.8s before); the budget leaves headroom for slower machines
+IMPORT_TIME_BUDGET = 0.5
+
+# Modules backend must not import until they are needed
+LAZY_MODULES = ["groq", "pypdf", "numpy", "dotenv"]
+
 def print_section(title):
     """Print a formatted section header"""
     print("\n" + "="*70)
     print(f"  {title}")
     print("="*70 + "\n")
 
+def build_pdf(pages, outline=None):
+    """
+    Build an in-memory PDF with one line of Helvetica text per entry of each page
+    
+    Args:
+        pages: Lines of each page
+        outline: Optional (title, page index) bookmarks
+    
+    Returns:
+        pypdf PdfReader over the document
+    """
+    import io
+    from pypdf import PdfReader, PdfWriter
+    
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        stream = "BT /F1 12 Tf 14 TL 50 780 Td " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    
+    data = io.BytesIO()
+    data.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(data.tell())
+        data.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = data.tell()
+    data.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    data.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    data.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    data.seek(0)
+    
+    if outline:
+        writer = PdfWriter(clone_from=PdfReader(data))
+        for title, page in outline:
+            writer.add_outline_item(title, page)
+        data = io.BytesIO()
+        writer.write(data)
+        data.seek(0)
+    return PdfReader(data)
+
+class StubCompletions:
+    """Stands in for the Groq chat completions API: answers reply(prompt) and records every prompt"""
+    
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+    
+    def create(self, model, messages, temperature, max_tokens, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        message = SimpleNamespace(content=self.reply(prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def stub_engine(reply, **kwargs):
+    """
+    DiligenceEngine whose LLM calls go to a StubCompletions
+    
+    Returns:
+        Tuple of (engine, StubCompletions)
+    """
+    engine = DiligenceEngine(api_key="test", **kwargs)
+    completions = StubCompletions(reply)
+    engine.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    engine.key_pool = None
+    return engine, completions
+
+def extraction_reply(**fields):
+    """Reply function returning one fixed Agent A/B extraction"""
+    extraction = {"drug_name": "BTX-501", "molecule_type": "Small molecule", "clinical_phase": "Phase 1",
+                  "primary_toxicity_finding": "Hepatotoxicity", "reasoning": "Stated in the document", **fields}
+    return lambda prompt: json.dumps(extraction)
+
 def test_api_connectivity():
     """Test 1: Verify Groq API key is valid and LPU is responding"""
     print_section("TEST 1: API Connectivity")
@@ -262,6 +351,1506 @@ def test_json_robustness():
         print(f"\n❌ TEST 5 FAILED: {str(e)}")
         return False
 
+def test_token_budget_planner():
+    """Test 6: Verify the local token planner picks an action before any API call"""
+    print_section("TEST 6: Token Budget Planner")
+    
+    try:
+        from budget import TokenBudget, estimate_tokens
+        
+        short_doc = "BTX-100 is a small molecule drug currently in Phase 2 clinical trials."
+        estimate = estimate_tokens(short_doc)
+        assert 10 <= estimate <= 30, f"Unexpected estimate for short document: {estimate}"
+        print(f"✓ Short document estimated at {estimate} tokens")
+        
+        budget = TokenBudget("llama-3.3-70b-versatile", max_prompt_tokens=600)
+        plan, parts = budget.plan_document(short_doc, overhead_tokens=200, max_tokens=100)
+        assert plan.action == "send" and parts == [short_doc], "Short document should be sent as is"
+        print("✓ Short document sent as is")
+        
+        filler = "\n\n".join(
+            f"Section {i}: Manufacturing batch records and packaging logistics for lot {i}."
+            for i in range(40)
+        )
+        long_doc = filler + "\n\nSafety: 12% of patients experienced mild hepatotoxicity in Phase 1."
+        plan, parts = budget.plan_document(long_doc, overhead_tokens=200, max_tokens=100)
+        assert plan.action == "chunk" and len(parts) == plan.chunks > 1, f"Expected chunking, got {plan.action}"
+        print(f"✓ Long document chunked into {plan.chunks} calls")
+        
+        tight = TokenBudget("llama-3.3-70b-versatile", max_prompt_tokens=600, run_budget=700)
+        plan, parts = tight.plan_document(long_doc, overhead_tokens=200, max_tokens=100)
+        assert plan.action == "filter", f"Expected passage filtering under a tight budget, got {plan.action}"
+        assert "hepatotoxicity" in parts[0], "Filtering dropped the safety passage"
+        print("✓ Tight run budget falls back to passage filtering")
+        
+        print("\n✅ TEST 6 PASSED: Token planning works offline")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 6 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 6 FAILED: {str(e)}")
+        return False
+
+def test_near_duplicate_detection():
+    """Test 7: Verify reprints with trivial edits are detected as near-duplicates"""
+    print_section("TEST 7: Near-Duplicate Detection")
+    
+    try:
+        from dedup import NearDuplicateIndex
+        
+        press_release = """
+        SynapTech Pharmaceuticals announces breakthrough Phase 2 results for SYN-400,
+        a novel monoclonal antibody targeting neurodegenerative diseases. The Phase 2
+        trial enrolled 250 patients with Alzheimer's disease and demonstrated significant
+        cognitive improvements. The drug showed an excellent safety profile with no
+        serious adverse events reported. SYN-400 is on track for Phase 3 trials in Q4 2026.
+        """
+        reprint = press_release.replace("breakthrough", "positive") + " Contact: media@synaptech.example"
+        unrelated = """
+        BTX-501 Clinical Trial Report: Phase 1 safety study completed with 45 patients.
+        Molecule classification: Small molecule kinase inhibitor.
+        """
+        
+        index = NearDuplicateIndex(threshold=0.7)
+        index.add("press-release", press_release, payload={"drug_name": "SYN-400"})
+        
+        matches = index.query(reprint)
+        assert matches and matches[0][0] == "press-release", "Reprint not detected"
+        assert matches[0][2] == {"drug_name": "SYN-400"}, "Payload of the original not returned"
+        print(f"✓ Reprint detected ({matches[0][1]:.0%} similar)")
+        
+        assert not index.query(unrelated), "Unrelated document flagged as duplicate"
+        print("✓ Unrelated document not flagged")
+        
+        index.add("reprint", reprint)
+        assert index.cluster("reprint") == ["press-release", "reprint"], "Duplicate cluster not recorded"
+        print("✓ Duplicate cluster recorded")
+
+        from dedup import _MAX_HASH, _MERSENNE_PRIME, shingles
+        hashes = [int(x) for x in shingles(unrelated)]
+        expected = [min((int(a) * x + int(b)) % _MERSENNE_PRIME & _MAX_HASH for x in hashes)
+                    for a, b in zip(index._a, index._b)]
+        assert [int(value) for value in index.signature(unrelated)] == expected, \
+            "Signature differs from the exact (a·x + b) mod p hash"
+        print("✓ Signature matches the universal hash computed with exact integers")
+
+        index.add("press-release", unrelated, payload={"drug_name": "BTX-501"})
+        current = index._band_keys(index._signatures["press-release"])
+        stale = [key for band, buckets in enumerate(index._buckets) for key, bucket in buckets.items()
+                 if "press-release" in bucket and key != current[band]]
+        assert not stale, f"{len(stale)} band keys of the old text left behind"
+        assert [doc_id for doc_id, _, _ in index.query(press_release)] == ["reprint"], \
+            "Re-added document still matched by its old text"
+        print("✓ Re-adding a document replaces its LSH buckets")
+
+        print("\n✅ TEST 7 PASSED: Near-duplicate detection works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 7 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 7 FAILED: {str(e)}")
+        return False
+
+def test_rule_extraction():
+    """Test 8: Verify the rule-based pre-pass resolves explicit fields and ignores planned phases"""
+    print_section("TEST 8: Rule-Based Extraction")
+    
+    try:
+        from rules import extract_rules
+        
+        trial_report = """
+        BTX-501 Clinical Trial Report: Phase 1 safety study completed with 45 patients.
+        Molecule classification: Small molecule kinase inhibitor.
+        Safety findings: Grade 3 hepatotoxicity observed in 2 of 45 patients.
+        """
+        press_release = """
+        SYN-400, a novel monoclonal antibody, completed its Phase 2 trial.
+        SYN-400 is on track for Phase 3 trials in Q4 2026.
+        """
+        
+        rules = extract_rules(trial_report)
+        assert rules.complete, f"Expected every field resolved, got {rules.resolved()}"
+        assert rules.clinical_phase.value == "Phase 1", "Wrong phase"
+        assert rules.molecule_type.value == "Small molecule", "Wrong molecule type"
+        print(f"✓ Trial report fully resolved: {rules.resolved()}")
+        
+        rules = extract_rules(press_release)
+        resolved = rules.resolved()
+        assert resolved.get("clinical_phase") == "Phase 2", "Planned Phase 3 counted as current phase"
+        assert resolved.get("molecule_type") == "Monoclonal antibody", "Molecule type not resolved"
+        assert not rules.complete, "Missing toxicity finding should leave the LLM call in place"
+        print(f"✓ Press release partially resolved: {resolved}")
+        
+        decimal_report = trial_report.replace(
+            "Grade 3 hepatotoxicity observed in 2 of 45 patients.",
+            "Grade 3 neutropenia occurred in 4.5% of patients vs. 1.2% on placebo, e.g. in cohort B."
+        )
+        finding = extract_rules(decimal_report).primary_toxicity_finding
+        assert finding.value == "Grade 3 neutropenia occurred in 4.5% of patients vs. 1.2% on placebo, e.g. in cohort B.", \
+            f"Finding cut at a decimal point or abbreviation: {finding.value!r}"
+        rules = extract_rules(trial_report.replace("in 2 of 45 patients.", "in 4. 5% of patients."))
+        assert rules.primary_toxicity_finding.value.endswith("in 4."), "Expected the spaced-out decimal to cut the sentence"
+        assert not rules.complete, "A finding cut at a number must not skip the LLM call"
+        print("✓ Decimals and abbreviations kept in the finding; a finding cut at a number is low confidence")
+        
+        print("\n✅ TEST 8 PASSED: Rule-based extraction works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 8 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 8 FAILED: {str(e)}")
+        return False
+
+def test_local_conflict_scoring():
+    """Test 9: Verify the local scorer measures agreement and lists conflicts without an LLM call"""
+    print_section("TEST 9: Local Conflict Scoring")
+    
+    try:
+        from scoring import score_sources
+        
+        trial_report = AgentResponse(
+            drug_name="BTX-501", molecule_type="Small molecule kinase inhibitor", clinical_phase="Phase 1",
+            primary_toxicity_finding="Grade 3 hepatotoxicity in 2 of 45 patients",
+            reasoning="Stated in report", source_type="Clinical Trial Report"
+        )
+        fda_report = AgentResponse(
+            drug_name="BTX 501", molecule_type="small-molecule", clinical_phase="Phase I",
+            primary_toxicity_finding="Hepatotoxicity (grade 3)",
+            reasoning="Stated in review", source_type="FDA Report"
+        )
+        press_release = AgentResponse(
+            drug_name="BTX-501", molecule_type="Small molecule", clinical_phase="Phase 2",
+            primary_toxicity_finding="No serious adverse events",
+            reasoning="Stated in release", source_type="Press Release"
+        )
+        
+        agreeing = score_sources([trial_report, fda_report])
+        assert agreeing.unanimous, f"Equivalent phrasings flagged as conflicts: {agreeing.describe_conflicts()}"
+        assert agreeing.confidence >= 0.85, f"Confidence too low for agreeing sources: {agreeing.confidence}"
+        print(f"✓ Agreeing sources scored {agreeing.confidence:.2f}")
+        
+        conflicting = score_sources([trial_report, fda_report, press_release])
+        fields = [conflict.field for conflict in conflicting.conflicts]
+        assert "clinical_phase" in fields, "Phase conflict not detected"
+        assert "drug_name" not in fields and "molecule_type" not in fields, "Agreeing fields flagged"
+        assert conflicting.confidence < agreeing.confidence, "Conflicts did not lower confidence"
+        for conflict in conflicting.describe_conflicts():
+            print(f"✓ Conflict: {conflict}")
+        
+        print("\n✅ TEST 9 PASSED: Local conflict scoring works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 9 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 9 FAILED: {str(e)}")
+        return False
+
+def test_results_store():
+    """Test 10: Verify analyses are stored and found again by sources and filters"""
+    print_section("TEST 10: Results Store")
+    
+    try:
+        import tempfile
+        from store import ResultsStore, source_record
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ResultsStore(os.path.join(tmp, "results.db"))
+            asset = ScientificAsset(
+                drug_name="BTX-501", molecule_type="Small molecule", clinical_phase="Phase 1",
+                primary_toxicity_finding="Grade 3 hepatotoxicity", confidence_score=0.6,
+                conflicts_found=["Phase 1 vs Phase 2"]
+            )
+            sources = [
+                source_record("Press release text", "Press Release", "release.pdf"),
+                source_record(["Page 1", "Page 2"], "Clinical Trial Report", "report.pdf")
+            ]
+            analysis_id = store.save(asset, sources, ["[System] Done"], {"analysis_time": 1.5})
+            
+            stored = store.find_by_sources(sources)
+            assert stored is not None and stored.id == analysis_id, "Analysis not found by its sources"
+            assert stored.asset == asset, "Stored asset differs"
+            assert stored.thought_trace == ["[System] Done"], "Thought trace not stored"
+            print(f"✓ Analysis {analysis_id} found by source hashes")
+            
+            swapped = [sources[1], sources[0]]
+            assert store.find_by_sources(swapped) is None, "Different document roles matched"
+            
+            assert [e.id for e in store.history(drug_name="btx")] == [analysis_id], "Drug name filter failed"
+            assert not store.history(min_confidence=0.9), "Confidence filter failed"
+            assert store.phases() == ["Phase 1"], "Phase listing failed"
+            print("✓ History filters by drug name, phase and confidence")
+            
+            rushed = asset.model_copy(update={"degradations_applied": ["skipped Supervisor"]})
+            store.save(rushed, sources, ["[System] Done"])
+            assert store.find_by_sources(sources).id == analysis_id, "Deadline-shortcut result reused"
+            degraded = asset.model_copy(update={"degraded": True})
+            store.save(degraded, sources, ["[System] Done"])
+            assert store.find_by_sources(sources).id == analysis_id, "Degraded result reused"
+            print("✓ Degraded and deadline-shortcut results are never reused")
+        
+        print("\n✅ TEST 10 PASSED: Results store works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 10 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 10 FAILED: {str(e)}")
+        return False
+
+def test_import_time():
+    """Test 11: Verify a cold `import backend` stays within its time budget"""
+    print_section("TEST 11: Import Time Budget")
+    
+    try:
+        import subprocess
+        
+        probe = (
+            "import sys, time; start = time.perf_counter(); import backend; "
+            "print(time.perf_counter() - start); "
+            f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+        )
+        here = os.path.dirname(os.path.abspath(__file__))
+        timings = []
+        for _ in range(3):
+            output = subprocess.run(
+                [sys.executable, "-c", probe], cwd=here, capture_output=True, text=True, check=True
+            ).stdout.splitlines()
+            timings.append(float(output[0]))
+            loaded = [module for module in output[1].split(",") if module] if len(output) > 1 else []
+            assert not loaded, f"Imported eagerly: {', '.join(loaded)}"
+        
+        best = min(timings)
+        print(f"✓ Heavy dependencies stay lazy: {', '.join(LAZY_MODULES)}")
+        print(f"Cold import: {best:.3f}s (budget {IMPORT_TIME_BUDGET:.2f}s)")
+        assert best <= IMPORT_TIME_BUDGET, f"Import took {best:.3f}s, over the {IMPORT_TIME_BUDGET:.2f}s budget"
+        
+        print("\n✅ TEST 11 PASSED: Import time within budget")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 11 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 11 FAILED: {str(e)}")
+        return False
+
+def test_single_flight():
+    """Test 12: Verify concurrent identical calls share one execution"""
+    print_section("TEST 12: In-Flight Deduplication")
+    
+    try:
+        import threading
+        from cache import SingleFlight
+        
+        flights = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_call():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"drug_name": "SYN-400"}
+        
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do("press-release", slow_call)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(flights.do("press-release", slow_call)))
+            for _ in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        while flights.shared < len(followers):
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        
+        assert len(calls) == 1, f"Expected one execution, got {len(calls)}"
+        assert all(result == {"drug_name": "SYN-400"} for result, _ in results), "Followers got a different result"
+        assert sum(1 for _, shared in results if shared) == len(followers), "Shared calls not reported"
+        print(f"✓ {len(results)} concurrent callers, 1 execution")
+        
+        flights.do("press-release", lambda: calls.append(1))
+        assert len(calls) == 2, "Finished call was not forgotten"
+        print("✓ Key released once the call finished")
+        
+        print("\n✅ TEST 12 PASSED: In-flight deduplication works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 12 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 12 FAILED: {str(e)}")
+        return False
+
+def test_request_hedging():
+    """Test 13: Verify slow calls are hedged and the first valid response wins"""
+    print_section("TEST 13: Request Hedging")
+    
+    try:
+        import threading
+        from resilience import HedgePolicy
+        
+        policy = HedgePolicy(percentile=0.9, max_hedge_ratio=0.25, initial_delay=0.05)
+        attempts = []
+        discarded = []
+        lock = threading.Lock()
+        for _ in range(3):
+            policy.run(lambda: "fast")
+        assert policy.hedged == 0, "Fast calls should not be hedged"
+        
+        def tail_latency_call():
+            # First attempt hangs in the tail, the duplicate returns at once
+            with lock:
+                attempts.append(1)
+                attempt = len(attempts)
+            time.sleep(0.5 if attempt == 1 else 0.01)
+            return f"response {attempt}"
+        
+        start = time.time()
+        result = policy.run(tail_latency_call, on_discard=discarded.append)
+        elapsed = time.time() - start
+        assert result == "response 2", f"Expected the hedge to win, got {result}"
+        assert elapsed < 0.4, f"Hedged call still waited for the slow request ({elapsed:.2f}s)"
+        print(f"✓ Slow call hedged, answered in {elapsed:.2f}s")
+        
+        time.sleep(0.6)
+        assert discarded == ["response 1"], "Losing response was not handed back for accounting"
+        metrics = policy.metrics()
+        assert metrics["hedged"] == 1 and metrics["hedge_wins"] == 1
+        assert metrics["saved_seconds"] > 0.2, f"Savings not measured: {metrics}"
+        print(f"✓ Metrics: {policy.summary()}")
+        
+        # A second hedge would make 2 of 5 calls hedged, over the 25% cap
+        attempts.clear()
+        result = policy.run(tail_latency_call)
+        assert result == "response 1" and len(attempts) == 1, "Hedge cap not enforced"
+        print("✓ Hedges capped at max_hedge_ratio of calls")
+        
+        def failing_then_ok():
+            with lock:
+                attempts.append(1)
+                attempt = len(attempts)
+            if attempt == 1:
+                time.sleep(0.2)
+                raise ValueError("Empty completion")
+            time.sleep(0.3)
+            return "valid"
+        
+        for _ in range(3):
+            policy.run(lambda: "fast")
+        attempts.clear()
+        assert policy.run(failing_then_ok) == "valid", "Invalid first response should not win"
+        print("✓ First valid response wins over an earlier failure")
+
+        # More concurrent callers than the old fixed pool of 8: none may be hedged while merely queued
+        busy = HedgePolicy(percentile=0.9, max_hedge_ratio=1.0, initial_delay=0.3)
+        callers = [threading.Thread(target=busy.run, args=(lambda: time.sleep(0.2),)) for _ in range(24)]
+        start = time.time()
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        assert busy.hedged == 0, f"{busy.hedged} calls hedged before they were sent"
+        assert time.time() - start < 0.5, "Concurrent calls waited for each other"
+        assert max(busy._latencies) < 0.3, f"Queue time counted as latency: {max(busy._latencies):.2f}s"
+        print("✓ 24 concurrent calls run at once; none hedged, latencies exclude waiting")
+        
+        print("\n✅ TEST 13 PASSED: Request hedging works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 13 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 13 FAILED: {str(e)}")
+        return False
+
+def test_circuit_breaker():
+    """Test 14: Verify the circuit breaker opens, fails fast and recovers"""
+    print_section("TEST 14: Circuit Breaker")
+    
+    try:
+        from resilience import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+        
+        breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=0.1, reset_seconds=0.2)
+        calls = []
+        
+        def outage():
+            calls.append(1)
+            raise ConnectionError("Connection refused")
+        
+        try:
+            breaker.call(outage)
+            assert False, "Provider error was swallowed"
+        except CircuitOpenError:
+            assert False, "Circuit opened before the failure threshold"
+        except ConnectionError:
+            pass
+        try:
+            breaker.call(outage)
+            assert False, "Provider error was swallowed"
+        except CircuitOpenError:
+            pass
+        assert breaker.state == OPEN, f"Expected open circuit, got {breaker.state}"
+        print("✓ Circuit opened after 2 consecutive failures")
+        
+        start = time.time()
+        try:
+            breaker.call(outage)
+            assert False, "Open circuit let a call through"
+        except CircuitOpenError:
+            pass
+        assert len(calls) == 2 and time.time() - start < 0.05, "Open circuit did not fail fast"
+        print("✓ Open circuit fails fast without calling the provider")
+        
+        time.sleep(0.25)
+        assert breaker.call(lambda: "recovered") == "recovered"
+        assert breaker.state == CLOSED, "Successful trial call did not close the circuit"
+        print("✓ Trial call after the reset timeout closed the circuit")
+        
+        breaker.call(lambda: time.sleep(0.15))
+        try:
+            breaker.call(lambda: time.sleep(0.15))
+        except CircuitOpenError:
+            assert False, "Slow call that succeeded should return its result"
+        assert breaker.state == OPEN, "Slow calls did not open the circuit"
+        print("✓ Slow calls count as failures")
+        
+        time.sleep(0.25)
+        try:
+            breaker.call(outage)
+        except CircuitOpenError:
+            pass
+        assert breaker.state == OPEN and breaker.trips == 3, "Failed trial call did not reopen the circuit"
+        print(f"✓ Failed trial call reopened the circuit ({breaker.metrics()})")
+
+        class ProviderError(Exception):
+            def __init__(self, status_code):
+                super().__init__(f"Error code: {status_code}")
+                self.status_code = status_code
+
+        class APITimeoutError(Exception):
+            pass
+
+        def failing(error):
+            def call():
+                raise error
+            return call
+
+        breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=10, reset_seconds=60)
+        for error in [ProviderError(400), ProviderError(429), ValueError("Empty completion"),
+                      RuntimeError("Run token budget exhausted")] * 3:
+            try:
+                breaker.call(failing(error))
+            except CircuitOpenError:
+                assert False, f"{error!r} opened the circuit"
+            except Exception as e:
+                assert e is error, "Non-provider error was not passed through unchanged"
+        assert breaker.state == CLOSED and breaker.failures == 0, f"Client errors counted: {breaker.metrics()}"
+        print("✓ 400s, 429s and local errors pass through without counting as provider failures")
+
+        for error in (ProviderError(503), APITimeoutError("Request timed out.")):
+            try:
+                breaker.call(failing(error))
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                assert e is error
+        assert breaker.state == OPEN, "5xx responses and timeouts should open the circuit"
+        print("✓ 5xx responses and timeouts count as provider failures")
+
+        print("\n✅ TEST 14 PASSED: Circuit breaker works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 14 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 14 FAILED: {str(e)}")
+        return False
+
+def test_deadline_planner():
+    """Test 15: Verify the deadline planner takes shortcuts only as needed"""
+    print_section("TEST 15: Deadline Planner")
+    
+    try:
+        from deadline import (FAST_MODEL, PASSAGE_FILTER, SHORT_REASONING, SKIP_SUPERVISOR, SMALLER_MODEL,
+                              plan_deadline)
+        
+        model = "llama-3.3-70b-versatile"
+        short_docs = ["BTX-501 Phase 2 press release. " * 40, "BTX-501 Phase 1 trial report. " * 40]
+        long_docs = [doc * 50 for doc in short_docs]
+        
+        relaxed = plan_deadline(120, long_docs, model)
+        assert relaxed.degradations == [] and relaxed.model == model, f"Unneeded shortcuts: {relaxed.degradations}"
+        print(f"✓ Loose deadline: {relaxed.summary()}")
+        
+        interactive = plan_deadline(5, short_docs, model)
+        assert interactive.estimated_seconds <= 5, f"Plan misses the deadline: {interactive.summary()}"
+        assert PASSAGE_FILTER not in interactive.degradations, "Short documents should not be passage-filtered"
+        assert SMALLER_MODEL not in interactive.degradations, "Smaller model taken before cheaper shortcuts"
+        print(f"✓ 5s deadline: {interactive.summary()}")
+        
+        tight = plan_deadline(2, long_docs, model)
+        assert tight.degradations == [SKIP_SUPERVISOR, SHORT_REASONING, PASSAGE_FILTER, SMALLER_MODEL], \
+            f"Shortcuts out of order: {tight.degradations}"
+        assert tight.model == FAST_MODEL and tight.passage_tokens and tight.extraction_max_tokens
+        assert tight.estimated_seconds < relaxed.estimated_seconds
+        print(f"✓ 2s deadline on long documents: {tight.summary()}")
+        
+        print("\n✅ TEST 15 PASSED: Deadline planner works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 15 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 15 FAILED: {str(e)}")
+        return False
+
+def test_key_pool():
+    """Test 16: Verify the API key pool balances load and cools rate-limited keys"""
+    print_section("TEST 16: API Key Pool")
+    
+    try:
+        from keypool import KeyPool
+        
+        class RateLimited(Exception):
+            status_code = 429
+        
+        pool = KeyPool(["key-one-0000001", "key-two-0000002", "key-three-0003"], requests_per_minute=2,
+                       max_wait=0.2, client_factory=lambda api_key: api_key)
+        used = []
+        
+        def request(client):
+            used.append(client)
+            return "ok", 100
+        
+        for _ in range(3):
+            pool.call(request, tokens=100)
+        assert sorted(used) == ["key-one-0000001", "key-three-0003", "key-two-0000002"], f"Load not spread: {used}"
+        print("✓ Least-loaded selection spread 3 calls over 3 keys")
+        
+        def rate_limited_on_first_key(client):
+            used.append(client)
+            if client == "key-one-0000001":
+                raise RateLimited("429 Too Many Requests")
+            return "ok", 100
+        
+        used.clear()
+        assert pool.call(rate_limited_on_first_key, tokens=100) == ("ok", 100)
+        usage = {entry.key: entry for entry in pool.usage()}
+        cooled = [entry for entry in usage.values() if entry.rate_limited]
+        assert len(used) == 2 and len(cooled) == 1 and cooled[0].cooling_seconds > 0, "429 key not cooled"
+        print(f"✓ 429 moved the call to another key and cooled {cooled[0].key} for {cooled[0].cooling_seconds:.0f}s")
+        
+        # Every key has now used its 2 requests per minute (or is cooling)
+        pool.call(request, tokens=100)
+        try:
+            pool.call(request, tokens=100)
+            assert False, "Per-key request budget not enforced"
+        except RuntimeError:
+            pass
+        print("✓ Calls wait, then fail, once every key is out of budget")
+        
+        total = sum(entry.requests for entry in pool.usage())
+        assert total == 6, f"Expected 6 recorded requests, got {total}"
+        print(f"✓ Per-key usage: {pool.summary()}")
+        
+        print("\n✅ TEST 16 PASSED: API key pool works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 16 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 16 FAILED: {str(e)}")
+        return False
+
+def test_packed_extraction():
+    """Test 17: Verify packed replies are validated and packs never mix documents of one run"""
+    print_section("TEST 17: Packed Extraction Validation")
+    
+    try:
+        from backend import DiligenceEngine, SourceDocument
+        
+        items = [
+            ("doc1", "Press Release", "BTX-501 enters Phase 2.", {"clinical_phase": "Phase 2"}),
+            ("doc2", "Abstract", "BTX-501 showed grade 3 hepatotoxicity.", {}),
+        ]
+        
+        def entry(doc_ref, phase):
+            return {"id": doc_ref, "drug_name": "BTX-501", "molecule_type": "Small molecule",
+                    "clinical_phase": phase, "primary_toxicity_finding": "Hepatotoxicity", "reasoning": "Stated"}
+        
+        responses = DiligenceEngine._parse_packed({"documents": [entry("doc2", "Phase 1"), entry("doc1", "Phase 3")]}, items)
+        assert set(responses) == {"doc1", "doc2"}, "Responses not keyed by document id"
+        assert responses["doc1"].source_type == "Press Release" and responses["doc2"].source_type == "Abstract"
+        assert responses["doc1"].clinical_phase == "Phase 2", "Rule-resolved field was not kept"
+        assert responses["doc2"].clinical_phase == "Phase 1"
+        print("✓ Reply entries mapped back to their documents, in any order")
+        
+        invalid_replies = {
+            "missing document": {"documents": [entry("doc1", "Phase 2")]},
+            "repeated id": {"documents": [entry("doc1", "Phase 2"), entry("doc1", "Phase 2")]},
+            "unknown id": {"documents": [entry("doc1", "Phase 2"), entry("doc9", "Phase 2")]},
+            "no documents list": {"drug_name": "BTX-501"},
+        }
+        for problem, reply in invalid_replies.items():
+            try:
+                DiligenceEngine._parse_packed(reply, items)
+                assert False, f"Accepted a reply with a {problem}"
+            except ValueError:
+                pass
+        print(f"✓ Rejected {len(invalid_replies)} malformed replies (triggers per-document fallback)")
+
+        def reply(prompt):
+            ids = re.findall(r'<document id="(doc\d+)"', prompt)
+            if not ids:
+                return extraction_reply()(prompt)
+            return json.dumps({"documents": [entry(doc_ref, "Phase 1") for doc_ref in ids]})
+
+        runs = [
+            ["ACM-101 completed enrollment across forty sites in Europe.",
+             "ACM-101 manufacturing scaled up at the Boston facility this spring."],
+            ["ZYX-220 licensing deal signed with a Japanese partner in March.",
+             "ZYX-220 abstract reports pharmacokinetics from healthy volunteers."],
+        ]
+        engine, completions = stub_engine(reply)
+        engine.pack_extraction = True
+        engine.extract_documents([SourceDocument(content=text, source_type="Abstract") for text in runs[0]])
+        assert len(completions.prompts) == 2, "Documents of one run were packed together"
+        assert not any("<document id=" in prompt for prompt in completions.prompts)
+        print("✓ Documents of one reconciliation are extracted in separate calls")
+
+        engine, completions = stub_engine(reply)
+        engine.pack_extraction = True
+        forks = [engine.fork() for _ in runs]
+        results = engine.extract_runs([
+            (fork, [SourceDocument(content=text, source_type="Abstract") for text in texts])
+            for fork, texts in zip(forks, runs)
+        ])
+        assert len(completions.prompts) == 2, f"Expected 2 packed calls, got {len(completions.prompts)}"
+        for prompt in completions.prompts:
+            assert prompt.count("<document id=") == 2, "Pack does not hold one document of each run"
+            assert ("ACM-101" in prompt) and ("ZYX-220" in prompt), "Pack holds two documents of one run"
+        assert all(response is not None for responses in results for response in responses)
+        assert forks[0].budget.spent == forks[1].budget.spent > 0, "Packed call tokens not split across runs"
+        print("✓ Short documents of different runs share calls, one document of each run per call")
+
+        print("\n✅ TEST 17 PASSED: Packed extraction validation works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 17 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 17 FAILED: {str(e)}")
+        return False
+
+def test_batch_manifest():
+    """Test 18: Verify batch manifests load and interrupted runs resume"""
+    print_section("TEST 18: Batch Manifest and Resume")
+    
+    try:
+        import json
+        import tempfile
+        from batch import DONE, FAILED, completed_ids, load_manifest
+        
+        with tempfile.TemporaryDirectory() as folder:
+            manifest = os.path.join(folder, "manifest.ndjson")
+            with open(manifest, "w") as f:
+                f.write(json.dumps({"id": "btx-501", "asset": "BTX-501", "documents": [
+                    {"source_type": "Press Release", "path": "btx501/pr.pdf"},
+                    {"source_type": "Abstract", "text": "BTX-501 Phase 1 abstract"}]}) + "\n\n")
+                f.write(json.dumps({"id": "cmp-22", "documents": [
+                    {"source_type": "Press Release", "text": "CMP-22 enters Phase 3"}]}) + "\n")
+            
+            items = load_manifest(manifest)
+            assert [item.id for item in items] == ["btx-501", "cmp-22"], "Manifest entries not loaded in order"
+            assert items[0].documents[0].path == os.path.join(folder, "btx501", "pr.pdf"), "Path not resolved"
+            assert items[1].asset_key == "cmp-22", "Asset should default to the id"
+            print("✓ Manifest loaded, paths resolved against its folder")
+            
+            with open(manifest, "a") as f:
+                f.write(json.dumps({"id": "cmp-22", "documents": []}) + "\n")
+            try:
+                load_manifest(manifest)
+                assert False, "Duplicate id accepted"
+            except ValueError:
+                pass
+            print("✓ Duplicate ids rejected")
+            
+            output = os.path.join(folder, "results.ndjson")
+            with open(output, "w") as f:
+                f.write(json.dumps({"id": "btx-501", "status": DONE}) + "\n")
+                f.write(json.dumps({"id": "cmp-22", "status": FAILED}) + "\n")
+                f.write('{"id": "xyz-9", "sta')  # Interrupted mid-write
+            assert completed_ids(output) == {"btx-501"}, "Resume should only skip items already done"
+            print("✓ Rerun skips done items and retries failed or partial ones")
+        
+        print("\n✅ TEST 18 PASSED: Batch manifest handling works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 18 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 18 FAILED: {str(e)}")
+        return False
+
+def test_batch_sharding():
+    """Test 19: Verify shards partition by asset and merge back into one report"""
+    print_section("TEST 19: Sharded Batch Merge")
+    
+    try:
+        import json
+        import tempfile
+        from batch import (DONE, FAILED, BatchItem, BatchReport, merge_shards, select_shard, shard_of,
+                           shard_path, write_report)
+        from cache import ExtractionCache
+        
+        items = [BatchItem(id=f"item-{i}", asset=f"Asset {i % 4}", documents=[]) for i in range(12)]
+        shards = [select_shard(items, index, 3) for index in range(3)]
+        assert sorted(item.id for shard in shards for item in shard) == sorted(item.id for item in items), \
+            "Shards must cover every item exactly once"
+        for i in range(4):
+            owners = {shard_of(item, 3) for item in items if item.asset == f"Asset {i}"}
+            assert len(owners) == 1, f"Asset {i} split across shards"
+        assert shard_of(BatchItem(id="x", asset="  asset 1 ", documents=[]), 3) == shard_of(items[1], 3), \
+            "Partition should ignore case and spacing of the asset"
+        print("✓ Partition is deterministic and keeps each asset on one shard")
+        
+        with tempfile.TemporaryDirectory() as folder:
+            output = os.path.join(folder, "results.ndjson")
+            cache_path = os.path.join(folder, "cache.json")
+            for index, shard in enumerate(shards):
+                path = shard_path(output, index, 3)
+                with open(path, "w") as f:
+                    for item in shard:
+                        # Every item failed once, then succeeded on a resumed run (except item-0)
+                        f.write(json.dumps({"id": item.id, "status": FAILED, "metrics": {"tokens_spent": 5}}) + "\n")
+                        if item.id != "item-0":
+                            f.write(json.dumps({"id": item.id, "status": DONE,
+                                                "metrics": {"extract_seconds": 1.0, "tokens_spent": 100}}) + "\n")
+                write_report(BatchReport(items=len(shard), wall_seconds=10.0 + index), path)
+                ExtractionCache(shard_path(cache_path, index, 3)).put(f"key-{index}", {"shard": index})
+            with open(shard_path(output, 0, 3), "a") as f:
+                f.write('{"id": "item-1')  # Interrupted mid-write
+            
+            extra = BatchItem(id="never-run", documents=[])
+            report = merge_shards(items + [extra], output, 3, cache_path=cache_path)
+            merged = [json.loads(line) for line in open(output)]
+            assert [record["id"] for record in merged] == [item.id for item in items], "Merged file not in manifest order"
+            assert report.done == 11 and report.failed == 1 and report.missing == 1, f"Wrong totals: {report.summary()}"
+            assert report.tokens_spent == 11 * 100 + 5, "Tokens not totalled from the kept records"
+            assert report.stage_seconds == {"extract": 11.0}, "Stage seconds not totalled"
+            assert report.wall_seconds == 12.0, "Wall time should be the slowest shard's"
+            print(f"✓ Merged report: {report.summary()}")
+            
+            assert len(ExtractionCache(cache_path)) == 3, "Shard caches not merged into the shared cache"
+            assert os.path.exists(os.path.join(folder, "results.report.json")), "Merged report not written"
+            print("✓ Shard caches folded into the shared cache")
+        
+        print("\n✅ TEST 19 PASSED: Sharded batch merge works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 19 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 19 FAILED: {str(e)}")
+        return False
+
+def test_watch_state():
+    """Test 20: Verify watch-folder pickup and at-most-once state tracking"""
+    print_section("TEST 20: Watch-Folder State")
+    
+    try:
+        import tempfile
+        from watch import DONE, INTERRUPTED, FolderWatcher, WatchState
+        
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, "FDA Submission"))
+            briefing = os.path.join(folder, "FDA Submission", "briefing.pdf")
+            with open(briefing, "wb") as f:
+                f.write(b"%PDF-1.4 partial")
+            with open(os.path.join(folder, "notes.txt"), "w") as f:
+                f.write("not a pdf")
+            
+            watcher = FolderWatcher(folder, engine=None, knowledge_base=None)
+            assert watcher.scan() == [], "A file must hold still for one poll before pickup"
+            ready = watcher.scan()
+            assert [name for name, _, _ in ready] == [os.path.join("FDA Submission", "briefing.pdf")], \
+                "Settled PDF not picked up"
+            assert watcher.source_type_of(ready[0][0]) == "FDA Submission", "Subfolder should name the type"
+            assert watcher.source_type_of("press.pdf") == watcher.source_type, "Top-level files use the default"
+            print("✓ Only settled PDFs are picked up, typed by subfolder")
+            
+            name, size, mtime = ready[0]
+            watcher.state.claim(name, "sha-1", size, mtime)
+            watcher.state.finish(name, DONE, asset="BTX-501")
+            watcher.scan()
+            assert watcher.scan() == [], "Processed file picked up again"
+            assert watcher.state.already_claimed(name, "sha-1", size, mtime + 5), "Touched file should be recognized"
+            assert not watcher.state.already_claimed(name, "sha-2", size, mtime), "Changed content must be processed"
+            print("✓ Processed files are skipped; changed content is not")
+            
+            watcher.state.claim("crashed.pdf", "sha-3", 10, 1.0)
+            reloaded = WatchState(watcher.state.path)
+            assert reloaded.files[name]["asset"] == "BTX-501", "State not persisted"
+            assert reloaded.recover() == ["crashed.pdf"], "Interrupted claim not found"
+            assert WatchState(watcher.state.path).files["crashed.pdf"]["status"] == INTERRUPTED, \
+                "Interrupted claim must not be retried"
+            print("✓ Claims survive restarts; interrupted files are not retried")
+
+        with tempfile.TemporaryDirectory() as folder:
+            from pypdf import PdfWriter
+            texts = {
+                "btx.pdf": ["BTX-501 is a small molecule in Phase 2."],
+                "acm.pdf": ["ACM-101 is a monoclonal antibody in Phase 1."],
+                "unknown.pdf": ["Interim safety update from the sponsor."],
+                "a-btx-revised.pdf": ["BTX-501 is a small molecule in Phase 3."],
+            }
+            for age, (file_name, lines) in enumerate(texts.items()):
+                path = os.path.join(folder, file_name)
+                PdfWriter(clone_from=build_pdf([lines])).write(path)
+                os.utime(path, (1_700_000_000 + age, 1_700_000_000 + age))
+
+            watcher = FolderWatcher(folder, engine=None, knowledge_base=None, workers=2)
+            spans, applied = {}, {}
+
+            def update(asset, documents):
+                started = time.perf_counter()
+                time.sleep(0.2 if asset else 0)
+                spans[asset] = (started, time.perf_counter())
+                applied[asset] = [name for name, _ in documents]
+                return []
+
+            watcher._update = update
+            watcher.scan()
+            watcher.ingest(watcher.scan())
+            assert set(spans) == {"BTX-501", "ACM-101", None}, f"Files routed to {sorted(map(str, spans))}"
+            last_named = max(end for asset, (_, end) in spans.items() if asset)
+            assert spans[None][0] >= last_named, "Unidentified files updated while named assets were still updating"
+            print("✓ Unidentified files are applied after every named asset is updated")
+            assert applied["BTX-501"] == ["btx.pdf", "a-btx-revised.pdf"], \
+                f"Files of an asset not applied oldest first: {applied['BTX-501']}"
+            print("✓ Files of one asset are applied in modification-time order, not by name")
+
+        print("\n✅ TEST 20 PASSED: Watch-folder state works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 20 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 20 FAILED: {str(e)}")
+        return False
+
+def test_debate_targets():
+    """Test 21: Verify which agents a debate round invites to rebut"""
+    print_section("TEST 21: Supervisor Debate Targets")
+    
+    try:
+        from scoring import disagrees
+        
+        assert disagrees("clinical_phase", "Phase II", "Phase 1"), "Different phases should disagree"
+        assert not disagrees("clinical_phase", "Phase 2 trial", "phase II"), "Same phase, different wording"
+        assert not disagrees("molecule_type", None, "small molecule"), "Unstated values cannot disagree"
+        print("✓ Field disagreement uses the normalized values")
+        
+        ruling = ScientificAsset(
+            drug_name="BTX-501", molecule_type="Small molecule", clinical_phase="Phase 1",
+            primary_toxicity_finding="Hepatotoxicity in 12% of patients", confidence_score=0.55,
+            conflicts_found=["Phase 2 (Press Release) vs Phase 1 (Clinical Trial Report)"]
+        )
+        press = AgentResponse(
+            drug_name="BTX-501", molecule_type="small molecule kinase inhibitor", clinical_phase="Phase II completed",
+            primary_toxicity_finding=None, reasoning="Press release", source_type="Press Release"
+        )
+        report = AgentResponse(
+            drug_name="BTX 501", molecule_type="Small molecule", clinical_phase="Phase 1",
+            primary_toxicity_finding="hepatotoxicity", reasoning="CSR", source_type="Clinical Trial Report"
+        )
+        assert DiligenceEngine._overruled_fields(press, ruling) == ["clinical_phase"], "Press release overruled on phase only"
+        assert DiligenceEngine._overruled_fields(report, ruling) == [], "Report agrees with the ruling"
+        print("✓ Only the overruled agent (and field) is invited to rebut")
+        
+        cached = DiligenceEngine._supervisor_asset(ruling.model_copy(update={"debate_rounds": 2}).model_dump(), [press, report])
+        assert cached.debate_rounds == 2, "Cached ruling must keep its debate rounds (and not be debated again)"
+        print("✓ Debate rounds survive the reconciliation cache")
+        
+        print("\n✅ TEST 21 PASSED: Debate targets correct")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 21 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 21 FAILED: {str(e)}")
+        return False
+
+def test_evidence_spans():
+    """Test 22: Verify agent quotes resolve to page and offset"""
+    print_section("TEST 22: Evidence Span Index")
+    
+    try:
+        from backend import evidence_quotes, merge_agent_responses
+        from evidence import PageIndex, locate_evidence
+        
+        pages = [
+            "BTX-501 Clinical Study Report\nSponsor: BioTech Corp",
+            "Design: Phase 1 safety study completed with 45 patients.",
+            "Safety findings: 12% of patients experienced\nmild-to-moderate hepatotoxicity.",
+        ]
+        spans = locate_evidence({
+            "clinical_phase": "Phase 1 safety study completed",
+            "primary_toxicity_finding": "“12% of patients experienced mild-to-moderate Hepatotoxicity”",
+            "molecule_type": "a monoclonal antibody",
+        }, pages, "csr.pdf")
+        assert [span.field for span in spans] == ["clinical_phase", "primary_toxicity_finding"], "Unfound quote kept"
+        phase, toxicity = spans
+        assert (phase.page, phase.exact) == (2, True), "Exact quote on the wrong page"
+        assert pages[1][phase.start:phase.end] == "Phase 1 safety study completed", "Offsets do not match the quote"
+        print(f"✓ Exact quote found on page {phase.page} at {phase.start}-{phase.end}")
+        
+        assert toxicity.page == 3 and not toxicity.exact, "Folded quote not found"
+        assert pages[2][toxicity.start:toxicity.end] == "12% of patients experienced\nmild-to-moderate hepatotoxicity", \
+            "Folded match offsets wrong"
+        assert toxicity.before == "Safety findings: " and toxicity.text and toxicity.after == ".", "Context not kept"
+        print("✓ Quotes differing in case, spacing and quote marks still resolve to the original text")
+        
+        index = PageIndex(pages)
+        assert index.find("Sponsor: BioTech ... 45 patients") is not None, "Elided quote not placed"
+        assert index.find("  ") is None and index.find("...") is None, "Empty quote placed"
+        print("✓ Elided and empty quotes handled")
+        
+        assert evidence_quotes({"evidence": {"clinical_phase": "Phase 1", "reasoning": "x", "drug_name": None}}) == \
+            {"clinical_phase": "Phase 1"}, "Malformed evidence not filtered"
+        assert evidence_quotes({"evidence": "Phase 1"}) == {}, "Non-object evidence accepted"
+        chunks = [
+            AgentResponse(clinical_phase="Phase 1", reasoning="a", source_type="CSR", evidence={"clinical_phase": "Phase 1 safety"}),
+            AgentResponse(clinical_phase="Phase 2", reasoning="b", source_type="CSR",
+                          evidence={"clinical_phase": "Phase 2", "drug_name": "BTX-501"}),
+        ]
+        merged = merge_agent_responses(chunks, "CSR")
+        assert merged.evidence == {"clinical_phase": "Phase 1 safety", "drug_name": "BTX-501"}, \
+            "Merged evidence should come from the chunk whose value won"
+        print("✓ Evidence survives malformed replies and chunk merging")
+        
+        print("\n✅ TEST 22 PASSED: Evidence spans resolve correctly")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 22 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 22 FAILED: {str(e)}")
+        return False
+
+def test_normalization():
+    """Test 23: Verify normalization drops layout noise but keeps table numbers"""
+    print_section("TEST 23: PDF Text Normalization")
+    
+    try:
+        from normalize import normalize_page_texts, normalize_pages
+        
+        header = "BioTech Inc. | Confidential Clinical Summary"
+        body = [
+            "BTX-501 Phase 1 safety study enrolled 45 patients. No hepato-\ntoxicity was seen at the starting dose.",
+            "Table 2: Adverse events\nDose (mg)\n200\nPatients\n45\nGrade 3 events\n12\nRate\n4.5%\nSee text",
+            "Safety findings: Grade 3 hepatotoxicity observed in 2 of 45 patients.\nAll rights reserved.",
+        ]
+        pages = [f"{header}\n{text}\nPage {number} of 3" for number, text in enumerate(body, 1)]
+        
+        cleaned, report = normalize_page_texts(pages)
+        assert len(cleaned) == 3, "Page structure not kept"
+        assert report.headers_footers_removed == 6, f"Expected 3 headers and 3 footers, got {report.headers_footers_removed}"
+        assert report.page_numbers_removed == 0, "Table cells counted as page numbers"
+        assert not any(header in page or "of 3" in page for page in cleaned), "Header or page number kept"
+        assert "hepatotoxicity" in cleaned[0] and report.hyphenations_joined == 1, "Hyphenated word not rejoined"
+        assert "All rights reserved" not in cleaned[2] and report.boilerplate_removed == 1, "Boilerplate kept"
+        print(f"✓ Headers, page numbers and boilerplate removed ({report.summary()})")
+        
+        assert cleaned[1].splitlines() == body[1].splitlines(), "Table cells removed as page numbers"
+        print("✓ Bare numbers inside a table are kept")
+        
+        text, report = normalize_pages(["7\nTable 1\nArm\nPatients\nPlacebo\n45\nBTX-501\n12\nDose (mg)\n200\nSource: CSR Table 14.3"])
+        assert report.page_numbers_removed == 1, f"Expected only the leading page number removed, got {report.page_numbers_removed}"
+        assert text.splitlines()[0] == "Table 1" and "\n45\n" in text and "\n12\n" in text, "Table fragment altered"
+        assert "\n200\n" in text, "Dose cell removed"
+        print("✓ Table fragment keeps its counts and doses")
+        
+        print("\n✅ TEST 23 PASSED: Normalization keeps table data")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 23 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 23 FAILED: {str(e)}")
+        return False
+
+def test_page_selection():
+    """Test 24: Verify large submissions keep only relevant sections, by outline or heading scan"""
+    print_section("TEST 24: Page Selection")
+    
+    try:
+        from page_select import MIN_PAGES_FOR_SELECTION, select_relevant_pages
+        
+        body = ["Narrative text continues on this page."]
+        short = build_pdf([["Manufacturing Process"] + body] * 5)
+        selection = select_relevant_pages(short)
+        assert selection.method == "all" and selection.selected == list(range(5)), "Short document not kept whole"
+        print(f"✓ Documents under {MIN_PAGES_FOR_SELECTION} pages are extracted in full")
+        
+        total = 40
+        outline = [("1. Product Description", 0), ("2. Manufacturing and Controls", 5),
+                   ("3. Clinical Studies", 12), ("4. References", 35)]
+        reader = build_pdf([body] * total, outline=outline)
+        selection = select_relevant_pages(reader)
+        assert selection.method == "outline", f"Outline ignored (method {selection.method})"
+        assert selection.selected == list(range(0, 5)) + list(range(12, 35)), f"Wrong pages: {selection.selected}"
+        assert selection.sections == ["1. Product Description", "3. Clinical Studies"], "Wrong sections kept"
+        assert selection.skipped == 12, "Skipped count wrong"
+        print(f"✓ Outline path kept {len(selection.selected)}/{total} pages: {selection.sections}")
+        
+        headings = {0: "Investigational Product Overview", 8: "Stability Data", 20: "Clinical Safety Summary",
+                    30: "Bibliography"}
+        pages = [[headings[index]] + body if index in headings else body for index in range(total)]
+        selection = select_relevant_pages(build_pdf(pages))
+        assert selection.method == "headings", f"Heading scan not used (method {selection.method})"
+        assert selection.selected == list(range(0, 8)) + list(range(20, 30)), f"Wrong pages: {selection.selected}"
+        assert selection.sections == ["Investigational Product Overview", "Clinical Safety Summary"], \
+            "Wrong sections kept"
+        print(f"✓ Heading scan kept {len(selection.selected)}/{total} pages; headings carry over to following pages")
+
+        openings = {0: ["Clinical Safety Summary"],
+                    5: ["Stability of response was maintained in the Phase 2 trial, with"],
+                    6: ["patients with a body mass index above 30 showing grade 2 events"],
+                    30: ["Bibliography"]}
+        pages = [openings.get(index, []) + body for index in range(total)]
+        selection = select_relevant_pages(build_pdf(pages))
+        assert selection.selected == list(range(0, 30)), f"Body text dropped pages: {selection.selected}"
+        assert selection.sections == ["Clinical Safety Summary"], f"Body text taken as a heading: {selection.sections}"
+        print("✓ Body text opening a continuation page ('stability', 'index') keeps the current section")
+        
+        print("\n✅ TEST 24 PASSED: Page selection works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 24 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 24 FAILED: {str(e)}")
+        return False
+
+def test_revision_reextraction():
+    """Test 25: Verify a new document revision re-extracts only the chunks holding changed pages"""
+    print_section("TEST 25: Revision Re-Extraction")
+    
+    try:
+        from budget import chunk_pages
+        from cache import page_hashes
+        
+        pages = [f"Section {index}: study narrative for BTX-501, visit {index * 7} observations." for index in range(40)]
+        groups = chunk_pages(pages, page_hashes(pages), token_limit=100000)
+        assert len(groups) > 2, "Expected several content-defined chunks"
+        assert [index for group in groups for index in group] == list(range(40)), "Chunks must cover every page in order"
+        
+        inserted = pages[:9] + ["Inserted erratum page for the safety table."] + pages[9:]
+        inserted_groups = chunk_pages(inserted, page_hashes(inserted), token_limit=100000)
+        before = {tuple(pages[index] for index in group) for group in groups}
+        after = {tuple(inserted[index] for index in group) for group in inserted_groups}
+        assert len(before - after) == 1, f"Inserting a page changed {len(before - after)} chunks"
+        print(f"✓ {len(groups)} chunks; inserting a page only changes the chunk that holds it")
+        
+        engine, completions = stub_engine(extraction_reply())
+        engine.rule_extraction = False
+        engine.extract_from_pages(pages, "Clinical Trial Report", "Agent A", doc_id="csr.pdf")
+        assert len(completions.prompts) == len(groups), f"Expected {len(groups)} chunk calls, got {len(completions.prompts)}"
+        assert "new document (40 pages)" in " ".join(engine.thought_trace), "First revision not reported as new"
+        
+        revised = list(pages)
+        revised[15] = "Section 15: revised narrative, grade 2 rash resolved without dose change."
+        engine.thought_trace = []
+        response = engine.extract_from_pages(revised, "Clinical Trial Report", "Agent A", doc_id="csr.pdf")
+        trace = " ".join(engine.thought_trace)
+        assert "1 of 40 pages changed since previous revision" in trace, "Revision diff not reported"
+        assert len(completions.prompts) == len(groups) + 1, "Unchanged chunks were sent to the LLM again"
+        assert "revised narrative" in completions.prompts[-1], "Changed chunk not re-extracted"
+        assert f"Reused {len(groups) - 1} of {len(groups)}" in trace, "Cached chunks not reused"
+        assert response.drug_name == "BTX-501", "Merged response lost its fields"
+        print(f"✓ Revision with one edited page: 1 LLM call, {len(groups) - 1} chunks from cache")
+
+        import tempfile
+        from cache import ExtractionCache
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.jsonl")
+            cache = ExtractionCache(path)
+            for index in range(50):
+                cache.put(f"key-{index}", {"value": index})
+            cache.diff_revision("csr.pdf", pages)
+            cache.diff_revision("csr.pdf", revised)
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+            assert len(lines) == 52, f"Writes should append one line each, file has {len(lines)} lines"
+            reloaded = ExtractionCache(path)
+            assert len(reloaded) == 50 and reloaded.get("key-49") == {"value": 49}, "Entries not reloaded"
+            assert reloaded.diff_revision("csr.pdf", revised).changed == [], "Latest revision not reloaded"
+
+            with open(path, "a", encoding="utf-8") as f:
+                f.write('{"key": "torn", "val')
+            assert len(ExtractionCache(path)) == 50, "Line cut short by a crash should be skipped"
+            ExtractionCache(path).put("after-crash", {"value": 1})
+            assert ExtractionCache(path).get("after-crash") == {"value": 1}, "Write after a torn line was lost"
+
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"entries": {"old": {"value": 0}}, "revisions": {}}, f)
+            assert ExtractionCache(path).get("old") == {"value": 0}, "Earlier JSON snapshot not loaded"
+        print("✓ Cache file is an append-only log: one line per write, reloaded and compacted on open")
+
+        print("\n✅ TEST 25 PASSED: Revision re-extraction works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 25 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 25 FAILED: {str(e)}")
+        return False
+
+def test_near_duplicate_reuse():
+    """Test 26: Verify near-duplicate reuse never crosses documents of the same run or contradicting rules"""
+    print_section("TEST 26: Near-Duplicate Reuse Guards")
+    
+    try:
+        from backend import SourceDocument
+        
+        narrative = " ".join(
+            f"In cohort {index} the enrolled patients received dose level {index % 4 + 1} and were followed "
+            f"for {index + 2} weeks with biomarker sampling at each visit." for index in range(25)
+        )
+        phase_2 = f"BTX-501 is a small molecule. This Phase 2 study report summarises the program. {narrative}"
+        phase_3 = phase_2.replace("Phase 2", "Phase 3")
+        
+        def reply(prompt):
+            phase = "Phase 3" if "Phase 3 study" in prompt else "Phase 2" if "Phase 2 study" in prompt else "Phase 1"
+            return extraction_reply(clinical_phase=phase)(prompt)
+        
+        engine, completions = stub_engine(reply)
+        engine.pack_extraction = False
+        responses = engine.extract_documents([SourceDocument(content=phase_2, source_type="Press Release"),
+                                              SourceDocument(content=phase_3, source_type="Clinical Trial Report")])
+        assert len(completions.prompts) == 2, "Second document of the run reused the first one's extraction"
+        assert [response.clinical_phase for response in responses] == ["Phase 2", "Phase 3"], "Phase conflict lost"
+        print("✓ Near-identical documents of one run are extracted independently")
+        
+        run = engine.fork()
+        response, = run.extract_documents([SourceDocument(content=phase_3 + " Media contact: ir@biotech.example",
+                                                          source_type="Press Release")])
+        assert len(completions.prompts) == 2 and response.clinical_phase == "Phase 3", "Reprint in a later run not reused"
+        print("✓ A reprint in a later run reuses the earlier extraction")
+        
+        run = engine.fork()
+        run.extract_documents([SourceDocument(content=phase_2.replace("Phase 2", "Phase 1"), source_type="Abstract")])
+        assert len(completions.prompts) == 3, "Near-duplicate with a different phase was reused"
+        assert any("differs on clinical_phase" in entry for entry in run.thought_trace), "Rule mismatch not reported"
+        print("✓ A near-duplicate whose rule-based phase differs is extracted again")
+        
+        print("\n✅ TEST 26 PASSED: Near-duplicate reuse is guarded")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 26 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 26 FAILED: {str(e)}")
+        return False
+
+def test_asset_grouping():
+    """Test 27: Verify corpus grouping keys documents by the drug, not the targets it mentions"""
+    print_section("TEST 27: Asset Grouping")
+    
+    try:
+        from backend import SourceDocument
+        from clustering import AssetDictionary, cluster_documents, find_entities
+        
+        corpus = {
+            "cd20.pdf": "ACM-101, an anti-CD20 monoclonal antibody, depletes CD20-positive B cells. "
+                        "CD20 expression fell in every patient; CD20 recovery took 9 months.",
+            "il17.pdf": "ACM-101 lowered IL-17 and IL-23 in the psoriasis cohort. IL-17 levels stayed low "
+                        "and IL-17A was undetectable at week 12.",
+            "btx.pdf": "BioTech Corp announces Phase 2 results for BTX-501, a novel small molecule.",
+            "sponsor.pdf": "SynapTech Pharmaceuticals will present at the annual meeting.",
+        }
+        
+        entities = find_entities("cd20.pdf", corpus["cd20.pdf"])
+        assert entities.primary_asset == "ACM-101", f"Target taken for the drug: {entities.assets}"
+        assert "ACM-101" in entities.introduced, "Drug context not detected"
+        print(f"✓ Target mentions ignored: {entities.assets}")
+        
+        groups = {group.asset: group.documents for group in cluster_documents(corpus)}
+        assert groups["ACM-101"] == ["cd20.pdf", "il17.pdf"], f"Asset split across targets: {groups}"
+        assert groups["BTX-501"] == ["btx.pdf"] and groups["sponsor:SynapTech"] == ["sponsor.pdf"]
+        print(f"✓ Groups: {groups}")
+        
+        text = "Lead asset XYZ-12 was compared with ABC-900. ABC-900, a fusion protein, is the subject here. XYZ-12 XYZ-12"
+        assert find_entities("", text).primary_asset == "ABC-900", "Introduced asset should beat bare mentions"
+        dictionary = AssetDictionary({"CD-19": "CD-19"})
+        assert find_entities("", "CD19 is a cell therapy candidate.", dictionary).primary_asset == "CD-19", \
+            "Dictionary entries must override the target filter"
+        print("✓ Drug context outranks bare mentions; dictionary entries are never filtered")
+        
+        engine = DiligenceEngine(api_key="test")
+        for problem, documents in {
+            "missing doc_id": [SourceDocument(content="BTX-501", source_type="Press Release")],
+            "repeated doc_id": [SourceDocument(content="BTX-501", source_type="Press Release", doc_id="a.pdf"),
+                                SourceDocument(content="ACM-101", source_type="Abstract", doc_id="a.pdf")],
+        }.items():
+            try:
+                engine.process_corpus(documents)
+                assert False, f"Corpus with a {problem} accepted"
+            except ValueError:
+                pass
+        print("✓ Missing and repeated doc_ids rejected")
+        
+        print("\n✅ TEST 27 PASSED: Asset grouping works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 27 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 27 FAILED: {str(e)}")
+        return False
+
+def test_knowledge_base_updates():
+    """Test 28: Verify incremental asset updates keep confidence and open conflicts consistent"""
+    print_section("TEST 28: Knowledge Base Updates")
+    
+    try:
+        import tempfile
+        from backend import SourceDocument
+        from knowledge import KnowledgeBase
+        
+        ruling = {}
+        
+        def reply(prompt):
+            if "scientific supervisor" in prompt:
+                return json.dumps(ruling)
+            return extraction_reply()(prompt)
+        
+        with tempfile.TemporaryDirectory() as folder:
+            knowledge_base = KnowledgeBase(os.path.join(folder, "knowledge.db"))
+            engine, completions = stub_engine(reply)
+            
+            def document(name, text):
+                return SourceDocument(content=text, source_type="Clinical Trial Report", doc_id=name)
+            
+            report = "BTX-501 is a small molecule. Phase 1 study; grade 3 hepatotoxicity was observed."
+            asset, _ = engine.update_asset(document("csr.pdf", report), knowledge_base, asset_key="BTX-501")
+            assert asset.confidence_score == 0.5 and knowledge_base.get("btx-501") is not None, "New asset not stored"
+            print(f"✓ First source starts the knowledge base (confidence {asset.confidence_score:.2f})")
+            
+            calls = len(completions.prompts)
+            asset, _ = engine.update_asset(document("abstract.pdf", "In this Phase 1 trial of BTX-501, a small molecule, grade 3 hepatotoxicity occurred."), knowledge_base, "BTX-501")
+            assert len(completions.prompts) == calls + 1, "Agreeing source should need only its extraction call"
+            assert asset.confidence_score == 0.75, f"Confidence should move by the new source's share, got {asset.confidence_score}"
+            assert len(knowledge_base.get("BTX-501").sources) == 2
+            print(f"✓ Agreeing source folded in locally (confidence {asset.confidence_score:.2f})")
+            
+            knowledge = knowledge_base.get("BTX-501")
+            knowledge.profile.confidence_score = 0.4
+            knowledge.profile.conflicts_found = ["clinical_phase: 'Phase 1' vs 'Phase 2' (press release)"]
+            knowledge_base.save(knowledge)
+            ruling.update(drug_name="BTX-501", molecule_type="Small molecule", clinical_phase="Phase 1",
+                          primary_toxicity_finding="Hepatotoxicity", confidence_score=0.8, conflicts_found=[],
+                          source_summary="The new trial report confirms Phase 1")
+            asset, _ = engine.update_asset(document("update.pdf", "Interim update: the BTX-501 Phase 1 cohort continues enrolling."), knowledge_base, "BTX-501")
+            assert "Phase 1' vs 'Phase 2'" in completions.prompts[-1], "Open conflicts not shown to the Supervisor"
+            assert asset.conflicts_found == [] and asset.confidence_score == 0.8, "Supervisor could not clear the conflict"
+            print("✓ Open conflict sent to the Supervisor even though the source agrees, and cleared by its ruling")
+            
+            knowledge = knowledge_base.get("BTX-501")
+            knowledge.profile.conflicts_found = ["clinical_phase: 'Phase 1' vs 'Phase 2' (press release)"]
+            knowledge_base.save(knowledge)
+            ruling.update(confidence_score=0.45, conflicts_found=["clinical_phase: press release still claims Phase 2"])
+            letter = "Investigator letter on the Phase 1 study of BTX-501, an oral small molecule."
+            asset, _ = engine.update_asset(document("letter.pdf", letter), knowledge_base, "BTX-501")
+            assert asset.conflicts_found == ["clinical_phase: press release still claims Phase 2"], \
+                f"Conflicts should be the Supervisor's ruling only, got {asset.conflicts_found}"
+            assert knowledge_base.get("BTX-501").profile.confidence_score == 0.45
+            print("✓ Conflicts the Supervisor keeps are stored without re-appending the old ones")
+            
+            calls = len(completions.prompts)
+            engine.update_asset(document("letter.pdf", letter), knowledge_base, "BTX-501")
+            assert len(completions.prompts) == calls, "Known document extracted again"
+            assert knowledge_base.assets() == ["BTX-501"]
+            print("✓ Known documents are skipped")
+        
+        print("\n✅ TEST 28 PASSED: Knowledge base updates work")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 28 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 28 FAILED: {str(e)}")
+        return False
+
+def test_http_service():
+    """Test 29: Verify the HTTP service accepts, refuses and serves analyses"""
+    print_section("TEST 29: HTTP Service")
+    
+    try:
+        import http.client
+        import tempfile
+        import threading
+        from jobs import JobQueue
+        from service import create_server
+        from store import ResultsStore
+        
+        release = threading.Event()
+        
+        def reply(prompt):
+            release.wait(10)
+            return extraction_reply()(prompt)
+        
+        with tempfile.TemporaryDirectory() as folder:
+            engine, _ = stub_engine(reply)
+            engine.rule_extraction = False
+            queue = JobQueue(ResultsStore(os.path.join(folder, "results.db")), max_workers=1, max_pending=1,
+                             finished_ttl=60, max_finished=1)
+            server = create_server(port=0, engine=engine, queue=queue)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            
+            def request(method, path, body=None, headers=None):
+                connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=15)
+                connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                                   headers=headers or {})
+                response = connection.getresponse()
+                data = json.loads(response.read() or b"{}")
+                connection.close()
+                return response.status, response.getheader("Retry-After"), data
+            
+            try:
+                submission = {"documents": [
+                    {"source_type": "Press Release", "text": "BTX-501 enters Phase 2 as a small molecule."},
+                    {"source_type": "Clinical Trial Report", "text": "BTX-501 Phase 1 study: grade 3 hepatotoxicity."},
+                ]}
+                status, _, job = request("POST", "/analyses", submission)
+                assert status == 202 and job["result_url"] == f"/analyses/{job['job_id']}/result", "Submission not accepted"
+                print(f"✓ POST /analyses → 202 ({job['job_id']})")
+                
+                status, retry_after, body = request("POST", "/analyses", {"documents": [
+                    {"source_type": "Press Release", "pdf_base64": "not base64 at all"},
+                    {"source_type": "Abstract", "pdf_base64": "not base64 at all"},
+                ]})
+                assert status == 429 and retry_after, f"Full queue should answer 429 before reading the body, got {status}"
+                print("✓ Full queue → 429 with Retry-After, before the body is parsed")
+                
+                status, _, body = request("GET", f"{job['result_url']}?wait=0")
+                assert status == 202, "Pending result should answer 202"
+                release.set()
+                status, _, body = request("GET", f"{job['result_url']}?wait=10")
+                assert status == 200 and body["result"]["drug_name"] == "BTX-501", f"Result not served ({status})"
+                assert body["analysis_id"] is not None, "Result not persisted"
+                print(f"✓ GET result → 202 while running, then 200 (analysis {body['analysis_id']})")
+                
+                status, _, body = request("POST", "/analyses", {"documents": [{"source_type": "Abstract", "text": "x"}]})
+                assert status == 400, "Malformed submission should answer 400"
+                for body in ([submission], "documents", 42):
+                    status, _, answer = request("POST", "/analyses", body)
+                    assert status == 400 and "JSON object" in answer["error"], f"Body {body!r} answered {status}"
+                status, _, _ = request("POST", "/analyses", submission, headers={"Content-Length": "lots"})
+                assert status == 400, f"Non-numeric Content-Length answered {status}"
+                status, _, body = request("POST", "/analyses", {"documents": [
+                    {"source_type": "Press Release", "pdf_base64": "bm90IGEgcGRm"},
+                    {"source_type": "Abstract", "text": "BTX-501"},
+                ]})
+                assert status == 202, "PDFs should be parsed by the job, not the handler"
+                status, _, failed = request("GET", f"/analyses/{body['job_id']}/result?wait=10")
+                assert status == 500 and "Document 1" in failed["error"], "Unreadable PDF should fail its job"
+                print("✓ Malformed body, non-object JSON or bad Content-Length → 400; unreadable PDF fails its job")
+                
+                status, _, _ = request("GET", f"/analyses/{job['job_id']}")
+                assert status == 404, "Finished jobs beyond max_finished should be evicted"
+                print("✓ Finished jobs evicted beyond max_finished")
+            finally:
+                release.set()
+                server.shutdown()
+                server.server_close()
+        
+        with tempfile.TemporaryDirectory() as folder:
+            from backend import SourceDocument
+            from jobs import FAILED
+
+            def slow_reply(prompt):
+                time.sleep(0.3)
+                return extraction_reply()(prompt)
+
+            engine, _ = stub_engine(slow_reply)
+            engine.rule_extraction = False
+            queue = JobQueue(ResultsStore(os.path.join(folder, "results.db")), max_workers=1, timeout=0.1)
+            job = queue.submit("api", engine, [
+                SourceDocument(content="BTX-501 enters Phase 2 as a small molecule.", source_type="Press Release"),
+                SourceDocument(content="BTX-501 Phase 1 study: grade 3 hepatotoxicity.", source_type="Abstract"),
+            ], [], "timeout")
+            for _ in range(100):
+                if not queue.get(job.id).active:
+                    break
+                time.sleep(0.05)
+            job = queue.get(job.id)
+            assert job.status == FAILED, f"Timed-out job ended as {job.status}"
+            assert job.error == "Analysis exceeded its 0.1s timeout", f"Timeout reported as {job.error!r}"
+            print("✓ Job past its timeout ends failed with the timeout error")
+
+            class WrappingEngine(DiligenceEngine):
+                """Wraps every error of a step without logging it, as a handler deep in a run might"""
+                def process_documents(self, documents, deadline=None):
+                    try:
+                        time.sleep(0.2)
+                        self.log_thought("Agent A", "Starting extraction from Press Release...")
+                    except Exception as e:
+                        raise RuntimeError(f"Error during extraction: {e}")
+
+            job = queue.submit("api", WrappingEngine(api_key="test"), [], [], "wrapped timeout")
+            for _ in range(100):
+                if not queue.get(job.id).active:
+                    break
+                time.sleep(0.05)
+            job = queue.get(job.id)
+            assert job.status == FAILED and job.error == "Analysis exceeded its 0.1s timeout", \
+                f"Wrapped timeout reported as {job.status}: {job.error!r}"
+            print("✓ Job past its timeout fails with the timeout error, even when the engine wrapped it")
+
+        print("\n✅ TEST 29 PASSED: HTTP service works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 29 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 29 FAILED: {str(e)}")
+        return False
+
 def run_all_tests():
     """Run complete test suite"""
     print("\n" + "🧬" * 35)
@@ -277,6 +1866,30 @@ def run_all_tests():
     latency = test_latency()
     results['Latency Check'] = latency is not None
     results['JSON Robustness'] = test_json_robustness()
+    results['Token Budget Planner'] = test_token_budget_planner()
+    results['Near-Duplicate Detection'] = test_near_duplicate_detection()
+    results['Rule-Based Extraction'] = test_rule_extraction()
+    results['Local Conflict Scoring'] = test_local_conflict_scoring()
+    results['Results Store'] = test_results_store()
+    results['Import Time Budget'] = test_import_time()
+    results['In-Flight Deduplication'] = test_single_flight()
+    results['Request Hedging'] = test_request_hedging()
+    results['Circuit Breaker'] = test_circuit_breaker()
+    results['Deadline Planner'] = test_deadline_planner()
+    results['API Key Pool'] = test_key_pool()
+    results['Packed Extraction'] = test_packed_extraction()
+    results['Batch Manifest'] = test_batch_manifest()
+    results['Batch Sharding'] = test_batch_sharding()
+    results['Watch-Folder State'] = test_watch_state()
+    results['Debate Targets'] = test_debate_targets()
+    results['Evidence Spans'] = test_evidence_spans()
+    results['PDF Text Normalization'] = test_normalization()
+    results['Page Selection'] = test_page_selection()
+    results['Revision Re-Extraction'] = test_revision_reextraction()
+    results['Near-Duplicate Reuse Guards'] = test_near_duplicate_reuse()
+    results['Asset Grouping'] = test_asset_grouping()
+    results['Knowledge Base Updates'] = test_knowledge_base_updates()
+    results['HTTP Service'] = test_http_service()
     
     # Summary
     print_section("TEST SUMMARY")
@@ -219,6 +219,63 @@ def test_ui_components():
         print(f"\n❌ TEST 5 FAILED: {str(e)}")
         return False
 
+def test_trace_viewer():
+    """Test 6: Verify the thought-trace viewer parses incrementally and renders one page"""
+    print_section("TEST 6: Thought Trace Viewer")
+    
+    try:
+        from trace_view import ERROR, INFO, SUCCESS, WARNING, TraceLog, page_count, render_page
+        
+        trace = ["[System] 🚀 Starting 3-document analysis", "[Agent A] ✓ Extraction complete"]
+        log = TraceLog()
+        assert log.extend(trace) == 2, "Initial entries not parsed"
+        trace += ["[Supervisor] ⚠️ CONFLICT DETECTED: phase", "[Agent D] ✗ Error during extraction: <timeout>"]
+        assert log.extend(trace) == 2, "Only the new entries should be parsed"
+        assert log.extend(trace) == 0, "Unchanged trace parsed again"
+        assert [event.level for event in log.events] == [INFO, SUCCESS, WARNING, ERROR], "Levels misclassified"
+        assert log.agents == ["System", "Agent A", "Supervisor", "Agent D"], "Agents not collected in order"
+        print("✓ Growing trace parsed incrementally, levels and agents detected")
+        
+        assert [event.index for event in log.filter(levels=[WARNING, ERROR])] == [2, 3], "Level filter wrong"
+        assert [event.index for event in log.filter(agents=["Agent A"], levels=[SUCCESS])] == [1], "Combined filter wrong"
+        assert len(log.filter()) == 4, "No filter should return every event"
+        print("✓ Agent and level filters")
+        
+        html = render_page(log.events, 1)
+        assert "&lt;timeout&gt;" in html and "<timeout>" not in html, "Messages not escaped"
+        assert 'class="thought-agent-other">[Agent D]' in html, "Extra agents not styled"
+        assert log.extend(["[System] 🚀 Starting dual-document analysis"]) == 1 and len(log.events) == 1, \
+            "A different trace should start the log over"
+
+        first_run = ["[System] 🚀 Starting dual-document analysis", "[Agent A] ✓ Found drug: BTX-501"]
+        second_run = ["[System] 🚀 Starting dual-document analysis", "[Agent A] ✓ Found drug: ACM-101",
+                      "[Supervisor] ⚠️ CONFLICT DETECTED: phase"]
+        log = TraceLog()
+        log.extend(first_run, source="analysis_1")
+        assert log.extend(second_run, source="analysis_2") == 3, "Another analysis should be parsed from the start"
+        assert [event.message for event in log.events] == [entry.split("] ", 1)[1] for entry in second_run], \
+            "Events of two analyses with the same first line were mixed"
+        assert log.extend(second_run, source="analysis_2") == 0, "Same analysis parsed again"
+        print("✓ Loading another analysis starts the log over, even with the same first line")
+
+        big = TraceLog()
+        big.extend([f"[Agent A] step {i}" for i in range(1050)])
+        assert page_count(len(big.events), 100) == 11, "Page count wrong"
+        last = render_page(big.events, 11, 100)
+        assert last.count("<div><span") == 50 and "step 1049" in last and "step 999<" not in last, \
+            "Only the requested page should be rendered"
+        print("✓ Only the selected page is rendered (escaped)")
+        
+        print("\n✅ TEST 6 PASSED: Thought trace viewer works")
+        return True
+        
+    except AssertionError as e:
+        print(f"\n❌ TEST 6 FAILED: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ TEST 6 FAILED: {str(e)}")
+        return False
+
 def provide_launch_instructions():
     """Provide instructions for manual testing"""
     print_section("MANUAL TESTING INSTRUCTIONS")
@@ -291,6 +348,7 @@ def run_all_tests():
     results['Syntax Validation'] = test_app_syntax()
     results['Backend Integration'] = test_backend_integration()
     results['UI Component Configuration'] = test_ui_components()
+    results['Thought Trace Viewer'] = test_trace_viewer()
     
     # Summary
     print_section("TEST SUMMARY")
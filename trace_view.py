@@ -0,0 +1,124 @@
+"""
+Thought Trace Viewer
+Parses thought-trace entries into agent/level events once, as they arrive, and
+renders one filtered page at a time, so traces with thousands of entries stay
+cheap to redraw on every Streamlit rerun
+"""
+
+import html
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+# Entries shown per page
+DEFAULT_PAGE_SIZE = 100
+
+ERROR = "error"
+WARNING = "warning"
+SUCCESS = "success"
+INFO = "info"
+LEVELS = [ERROR, WARNING, SUCCESS, INFO]
+
+# Markers the engine puts at the start of a message (see DiligenceEngine.log_thought callers)
+_LEVEL_MARKERS = [(ERROR, ("✗", "❌")), (WARNING, ("⚠️",)), (SUCCESS, ("✓", "✅"))]
+
+# CSS class of each agent's label; other extraction agents (D, E, ...) share one
+AGENT_CLASSES = {
+    "Agent A": "thought-agent-a",
+    "Agent B": "thought-agent-b",
+    "Supervisor": "thought-supervisor",
+    "System": "thought-system",
+}
+OTHER_AGENT_CLASS = "thought-agent-other"
+
+_ENTRY = re.compile(r"\[([^\]]+)\]\s?(.*)", re.DOTALL)
+
+
+class TraceEvent(BaseModel):
+    """One parsed thought-trace entry"""
+    index: int
+    agent: Optional[str] = None
+    level: str = INFO
+    message: str
+
+
+def parse_entry(index: int, entry: str) -> TraceEvent:
+    """Split "[Agent] message" and classify the message by its leading marker"""
+    match = _ENTRY.match(entry)
+    agent, message = (match.group(1), match.group(2)) if match else (None, entry)
+    level = next(
+        (level for level, markers in _LEVEL_MARKERS if message.lstrip().startswith(markers)),
+        INFO
+    )
+    return TraceEvent(index=index, agent=agent, level=level, message=message)
+
+
+def render_event(event: TraceEvent) -> str:
+    """HTML for one event (message text escaped)"""
+    message = html.escape(event.message)
+    if event.agent is None:
+        return f"<div>{message}</div>"
+    css = AGENT_CLASSES.get(event.agent, OTHER_AGENT_CLASS)
+    return f'<div><span class="{css}">[{html.escape(event.agent)}]</span> {message}</div>'
+
+
+class TraceLog:
+    """
+    Parsed view of a growing thought trace
+
+    extend() parses only entries added since the previous call, so a live
+    trace costs one parse per new entry however often it is redrawn. The log
+    starts over when the trace comes from another source (another analysis
+    or job was loaded); without a source, only a trace that is shorter or
+    starts differently is recognized as a new one.
+    """
+
+    def __init__(self):
+        self.events: List[TraceEvent] = []
+        self.agents: List[str] = []
+        self._first: Optional[str] = None
+        self._source: Optional[str] = None
+
+    def extend(self, trace: List[str], source: Optional[str] = None) -> int:
+        """
+        Bring the log up to date with trace
+
+        Args:
+            trace: Thought trace, possibly still growing
+            source: Identifies the analysis or job the trace belongs to
+
+        Returns:
+            Number of entries parsed
+        """
+        first = trace[0] if trace else None
+        if source != self._source or len(trace) < len(self.events) or first != self._first:
+            self.events, self.agents = [], []
+            self._first, self._source = first, source
+        added = trace[len(self.events):]
+        for offset, entry in enumerate(added, len(self.events)):
+            event = parse_entry(offset, entry)
+            if event.agent is not None and event.agent not in self.agents:
+                self.agents.append(event.agent)
+            self.events.append(event)
+        return len(added)
+
+    def filter(self, agents: Optional[List[str]] = None, levels: Optional[List[str]] = None) -> List[TraceEvent]:
+        """Events of the given agents and levels (None or empty: all)"""
+        if not agents and not levels:
+            return self.events
+        return [
+            event for event in self.events
+            if (not agents or event.agent in agents) and (not levels or event.level in levels)
+        ]
+
+
+def page_count(total: int, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    return max((total + page_size - 1) // page_size, 1)
+
+
+def render_page(events: List[TraceEvent], page: int, page_size: int = DEFAULT_PAGE_SIZE) -> str:
+    """HTML for one page (1-based) of events: only that page's entries are rendered"""
+    start = (page - 1) * page_size
+    rows = "".join(render_event(event) for event in events[start:start + page_size])
+    return f'<div class="thought-trace">{rows}</div>'
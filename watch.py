@@ -0,0 +1,276 @@
+"""
+Watch-Folder Ingestion
+Polls a drop directory for new or changed PDFs, extracts each one as it lands,
+routes it to its asset and folds it into that asset's knowledge base entry, so
+only the assets that received documents are re-reconciled
+
+A document's type comes from the subfolder it is dropped in (e.g.
+inbox/FDA Submission/briefing.pdf), or --source-type for files at the top level.
+Every file is processed at most once per content: it is claimed in the state
+file before processing, and a claim left behind by a crash is not retried.
+
+Run with: python watch.py inbox/
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from backend import DiligenceEngine, SourceDocument, extract_pages_from_pdf, load_environment, normalize_page_texts
+from clustering import AssetDictionary, find_entities
+from knowledge import KnowledgeBase
+from store import ResultsStore, source_record
+
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_SOURCE_TYPE = "Scientific Publication"
+DEFAULT_WORKERS = 2
+STATE_FILE_NAME = ".diligence_watch.json"
+
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+
+class WatchResult(BaseModel):
+    """Outcome of ingesting one dropped file"""
+    path: str
+    asset: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    analysis_id: Optional[int] = None
+
+
+class WatchState:
+    """
+    Processed files of a drop folder, persisted as JSON
+
+    Maps each file's path (relative to the folder) to its size, mtime, content
+    hash and status. Writes go to a temporary file that replaces the state
+    file, so a crash never leaves it half-written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def unchanged(self, name: str, size: int, mtime: float) -> bool:
+        """True if the file looks exactly as when it was last claimed"""
+        with self._lock:
+            entry = self.files.get(name)
+        return entry is not None and entry["size"] == size and entry["mtime"] == mtime
+
+    def already_claimed(self, name: str, sha: str, size: int, mtime: float) -> bool:
+        """True if this content was claimed before; a file only touched since gets its new stat recorded"""
+        with self._lock:
+            entry = self.files.get(name)
+            if entry is None or entry["sha"] != sha:
+                return False
+            entry.update(size=size, mtime=mtime)
+            self._save()
+            return True
+
+    def claim(self, name: str, sha: str, size: int, mtime: float):
+        """Record that processing of this content started (persisted before any work)"""
+        with self._lock:
+            self.files[name] = {
+                "sha": sha, "size": size, "mtime": mtime, "status": PROCESSING,
+                "claimed_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save()
+
+    def finish(self, name: str, status: str, asset: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self.files[name].update(status=status, asset=asset, error=error)
+            self._save()
+
+    def recover(self) -> List[str]:
+        """Mark claims left by a crashed run as interrupted (they are not retried); returns their paths"""
+        with self._lock:
+            interrupted = [name for name, entry in self.files.items() if entry["status"] == PROCESSING]
+            for name in interrupted:
+                self.files[name]["status"] = INTERRUPTED
+            if interrupted:
+                self._save()
+        return interrupted
+
+
+class FolderWatcher:
+    """
+    Polling ingestion of a drop folder
+
+    A file is picked up once its size and mtime hold still across two polls
+    (so half-copied files are not read), and only if its content differs from
+    what was claimed before under the same path. Files are routed to an asset
+    by their drug codes and INN names; the files of one asset are applied one
+    after another, while different assets are updated in parallel. Files naming
+    no asset are applied last, once the named assets are done.
+    """
+
+    def __init__(self, folder: str, engine: DiligenceEngine, knowledge_base: KnowledgeBase,
+                 state_path: Optional[str] = None, store: Optional[ResultsStore] = None,
+                 dictionary: Optional[AssetDictionary] = None, source_type: str = DEFAULT_SOURCE_TYPE,
+                 workers: int = DEFAULT_WORKERS, relevant_only: bool = False):
+        self.folder = folder
+        self.engine = engine
+        self.knowledge_base = knowledge_base
+        self.state = WatchState(state_path or os.path.join(folder, STATE_FILE_NAME))
+        self.store = store
+        self.dictionary = dictionary
+        self.source_type = source_type
+        self.workers = workers
+        self.relevant_only = relevant_only
+        # Files seen changing on the last poll, with the stat they had then
+        self._settling: Dict[str, Tuple[int, float]] = {}
+
+    def scan(self) -> List[Tuple[str, int, float]]:
+        """
+        Files ready to ingest: new or changed, and unchanged since the previous poll
+
+        Returns:
+            List of (path relative to the folder, size, mtime)
+        """
+        ready, settling = [], {}
+        for root, _, files in os.walk(self.folder):
+            for file_name in sorted(files):
+                if not file_name.lower().endswith(".pdf"):
+                    continue
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                name = os.path.relpath(path, self.folder)
+                if self.state.unchanged(name, stat.st_size, stat.st_mtime):
+                    continue
+                if self._settling.get(name) == (stat.st_size, stat.st_mtime):
+                    ready.append((name, stat.st_size, stat.st_mtime))
+                else:
+                    settling[name] = (stat.st_size, stat.st_mtime)
+        self._settling = settling
+        return ready
+
+    def source_type_of(self, name: str) -> str:
+        """Type named by the file's subfolder, or the default for top-level files"""
+        subfolder = os.path.dirname(name)
+        return os.path.basename(subfolder) if subfolder else self.source_type
+
+    def _update(self, asset: Optional[str], documents: List[Tuple[str, SourceDocument]]) -> List[WatchResult]:
+        """Fold one asset's new documents into its knowledge, in the order given (oldest mtime first, see ingest)"""
+        results = []
+        for name, document in documents:
+            engine = self.engine.fork()
+            try:
+                profile, trace = engine.update_asset(document, self.knowledge_base, asset_key=asset)
+                analysis_id = None
+                if self.store is not None:
+                    analysis_id = self.store.save(profile, [
+                        source_record(document.content, document.source_type, document.doc_id)
+                    ], trace, metrics={"tokens_spent": engine.budget.spent})
+                self.state.finish(name, DONE, asset=asset or profile.drug_name)
+                results.append(WatchResult(path=name, asset=asset or profile.drug_name, status=DONE,
+                                           analysis_id=analysis_id))
+            except Exception as e:
+                self.state.finish(name, FAILED, asset=asset, error=str(e))
+                results.append(WatchResult(path=name, asset=asset, status=FAILED, error=str(e)))
+        return results
+
+    def ingest(self, ready: List[Tuple[str, int, float]]) -> List[WatchResult]:
+        """
+        Claim, parse and route the given files, then update each affected asset
+
+        Files are taken oldest modification time first (ties by path), so when one
+        poll picks up several revisions of an asset the newest is applied last.
+
+        Returns:
+            One WatchResult per file processed (files whose content was already claimed are skipped)
+        """
+        results: List[WatchResult] = []
+        by_asset: Dict[Optional[str], List[Tuple[str, SourceDocument]]] = {}
+        # Oldest first, so the latest revision of an asset's documents is applied last
+        for name, size, mtime in sorted(ready, key=lambda entry: (entry[2], entry[0])):
+            path = os.path.join(self.folder, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            sha = hashlib.sha256(data).hexdigest()
+            if self.state.already_claimed(name, sha, size, mtime):
+                continue
+            self.state.claim(name, sha, size, mtime)
+            try:
+                pages = extract_pages_from_pdf(io.BytesIO(data), relevant_only=self.relevant_only)
+                content, _ = normalize_page_texts(pages)
+            except Exception as e:
+                self.state.finish(name, FAILED, error=str(e))
+                results.append(WatchResult(path=name, status=FAILED, error=str(e)))
+                continue
+            document = SourceDocument(content=content, source_type=self.source_type_of(name), doc_id=name)
+            # Unidentified documents share one queue (None); update_asset names them from their extraction
+            asset = find_entities(name, document.text, self.dictionary).primary_asset
+            by_asset.setdefault(asset, []).append((name, document))
+
+        # Unidentified documents are only named once extracted, possibly after an asset updated above,
+        # so they are applied after every named asset instead of racing its read-modify-write
+        unidentified = by_asset.pop(None, [])
+        if by_asset:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for asset_results in pool.map(lambda group: self._update(*group), by_asset.items()):
+                    results.extend(asset_results)
+        if unidentified:
+            results.extend(self._update(None, unidentified))
+        return results
+
+    def poll_once(self) -> List[WatchResult]:
+        return self.ingest(self.scan())
+
+    def run(self, poll_seconds: float = DEFAULT_POLL_SECONDS, stop: Optional[threading.Event] = None):
+        """Poll until stop is set (or forever), printing each file's outcome"""
+        for name in self.state.recover():
+            print(f"⚠️ {name} was interrupted mid-processing in an earlier run and is not retried")
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for result in self.poll_once():
+                if result.status == DONE:
+                    print(f"✅ {result.path} → {result.asset}")
+                else:
+                    print(f"✗ {result.path}: {result.error}")
+            stop.wait(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diligence-Zero watch-folder ingestion")
+    parser.add_argument("folder", help="Drop directory to watch (subfolders name the document type)")
+    parser.add_argument("--state", default=None, help=f"State file (default: <folder>/{STATE_FILE_NAME})")
+    parser.add_argument("--source-type", default=DEFAULT_SOURCE_TYPE, help="Type of files at the top level")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Assets updated in parallel")
+    parser.add_argument("--relevant-only", action="store_true", help="Only parse relevant sections of large PDFs")
+    args = parser.parse_args()
+
+    load_environment()
+    watcher = FolderWatcher(args.folder, DiligenceEngine(), KnowledgeBase(), state_path=args.state,
+                            store=ResultsStore(), source_type=args.source_type, workers=args.workers,
+                            relevant_only=args.relevant_only)
+    print(f"👀 Watching {args.folder} every {args.poll_seconds:g}s")
+    try:
+        watcher.run(args.poll_seconds)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()